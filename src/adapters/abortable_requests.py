@@ -0,0 +1,71 @@
+"""
+Aborting the HTTP responses of a synchronous LLM request from another thread.
+
+A synchronous provider call blocks its thread on the socket until the provider
+sends data, and the generator around it can only be closed once it yields. The
+shared `httpx` client reports every response it opens to the `AbortableRequests`
+active on the calling thread; aborting them shuts down the responses' sockets,
+so the blocked read fails at once and the thread is free again.
+"""
+
+import socket
+import threading
+
+_current = threading.local()
+
+
+class AbortableRequests:
+    """The HTTP responses opened by one thread while it is inside this context."""
+
+    def __init__(self):
+        self.responses = []
+        self.aborted = False
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "AbortableRequests":
+        _current.requests = self
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current.requests = None
+        with self._lock:
+            # Finished responses go back to the connection pool, and must not be shut down anymore
+            self.responses.clear()
+
+    def add(self, response) -> None:
+        with self._lock:
+            if not self.aborted:
+                self.responses.append(response)
+                return
+        shutdown_response(response)
+
+    def abort(self) -> None:
+        """Shuts down the open responses, and any response opened from now on."""
+        with self._lock:
+            self.aborted = True
+            responses, self.responses = self.responses, []
+        for response in responses:
+            shutdown_response(response)
+
+
+def track_response(response) -> None:
+    """`httpx` response hook adding the response to the calling thread's `AbortableRequests`."""
+    requests = getattr(_current, "requests", None)
+    if requests is not None:
+        requests.add(response)
+
+
+def shutdown_response(response) -> None:
+    """Shuts down the socket of an open HTTP/1.1 response, failing any read blocked on it."""
+    # An HTTP/2 connection carries other requests' streams too
+    if response.is_closed or response.http_version != "HTTP/1.1":
+        return
+    network_stream = response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is None:
+        return
+    try:
+        # The plain socket shutdown: SSLSocket's also drops the TLS state under the reading thread
+        socket.socket.shutdown(sock, socket.SHUT_RDWR)
+    except OSError:
+        pass
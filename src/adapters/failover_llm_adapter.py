@@ -0,0 +1,643 @@
+"""
+Composite LLM client with an ordered provider fallback chain, hedged requests
+and per-provider circuit breakers.
+
+Requests go to the first provider whose circuit breaker is closed. If it has not
+produced its first token (or, for `invoke`, its response) by a deadline taken
+from a percentile of its recent latencies, the same request is also sent to the
+next provider; the first to answer wins and the other is cancelled. Hedging at
+a high percentile only duplicates the slowest requests, and `max_hedge_ratio`
+caps the share of hedged requests, so the tail latency drops without doubling
+the spend. A provider that fails is skipped and the request fails over to the
+next one; errors and rate limits (429) open its circuit breaker for a while.
+
+Once a streamed answer has started, the stream is not switched to another
+provider: the partial answer was already shown, so an error is raised instead.
+A losing synchronous stream has its HTTP response shut down (for the clients on
+the shared `httpx` pool), so it does not hold a hedge thread until the provider
+answers.
+"""
+
+import time
+import queue
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Iterator, Optional
+from adapters.abortable_requests import AbortableRequests
+from adapters.llm_client_adapter import LLMClientAdapter, AsyncLLMClientAdapter
+from adapters.provider_errors import is_rate_limit_error, retry_after_seconds
+from app_code.micro_batching import percentile
+from app_code.telemetry import label_key, metrics
+from app_code.logger import logger
+
+# Circuit breaker states, exported as a gauge
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+
+class ProvidersUnavailableError(RuntimeError):
+    """Raised when every provider of the fallback chain has an open circuit breaker."""
+
+
+class CircuitBreaker:
+    """Stops sending requests to a failing provider for a while.
+
+    The breaker opens after `failure_threshold` consecutive errors, or at once on
+    a rate limit (for the Retry-After delay when the provider sends one). Once
+    the open period is over, a single trial request is let through (half-open):
+    its success closes the breaker, its failure opens it again.
+
+    Args:
+        name: Provider name, for logs and metrics.
+        failure_threshold: Consecutive errors that open the breaker.
+        reset_timeout_s: How long the breaker stays open after errors.
+        rate_limit_cooldown_s: How long it stays open after a rate limit without Retry-After.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+        rate_limit_cooldown_s: float = 10.0,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.rate_limit_cooldown_s = rate_limit_cooldown_s
+        self.state = CLOSED
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now. In half-open state, only one trial is let through."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.open_until:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Circuit breaker of '{self.name}' closed.")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self, error: BaseException) -> None:
+        with self._lock:
+            self.failures += 1
+            if is_rate_limit_error(error):
+                cooldown = retry_after_seconds(error)
+                cooldown = self.rate_limit_cooldown_s if cooldown is None else cooldown
+                metrics.increment("rag_llm_rate_limited_total", provider=self.name)
+            elif self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                cooldown = self.reset_timeout_s
+            else:
+                return
+            self.state = OPEN
+            self.open_until = time.monotonic() + cooldown
+        metrics.increment("rag_llm_circuit_opened_total", provider=self.name)
+        logger.warning(f"Circuit breaker of '{self.name}' opened for {cooldown:.1f}s after: {error}")
+
+    def release_trial(self) -> None:
+        """Let another trial through when the half-open trial was cancelled without an outcome."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self.open_until = 0.0
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, **params) -> CircuitBreaker:
+    """Get the process-wide circuit breaker of a provider, shared by every client of it.
+
+    Args:
+        params: `CircuitBreaker` settings, also applied to an existing breaker.
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, **params)
+        breaker = _breakers[name]
+    for param, value in params.items():
+        setattr(breaker, param, value)
+    return breaker
+
+
+def collect_breaker_metrics() -> dict[str, dict[tuple, float]]:
+    """Circuit breaker states (0 closed, 1 half-open, 2 open), exported as a gauge labeled by provider."""
+    with _breakers_lock:
+        return {
+            "rag_llm_circuit_state": {label_key(provider=name): breaker.state for name, breaker in _breakers.items()}
+        }
+
+
+metrics.register_collector(collect_breaker_metrics)
+
+
+class LatencyTracker:
+    """Recent latencies of a provider, giving the hedging deadline.
+
+    Args:
+        window: Number of recent latencies kept.
+    """
+
+    def __init__(self, window: int = 200):
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def deadline(self, q: float, min_samples: int, initial_s: float, min_s: float, max_s: float) -> float:
+        """The q-th percentile latency, clamped to [min_s, max_s], or initial_s until there are enough samples."""
+        with self._lock:
+            latencies = list(self.latencies)
+        if len(latencies) < min_samples:
+            return initial_s
+        return min(max_s, max(min_s, percentile(latencies, q)))
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def get_hedge_executor(max_workers: int = 16) -> ThreadPoolExecutor:
+    """Get the threads running the concurrent provider calls of the synchronous API.
+
+    Args:
+        max_workers: Number of threads, used by the first call.
+    """
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-hedge")
+    return _hedge_executor
+
+
+class FailoverLLMClientAdapter:
+    """Uniform invoke/stream API over an ordered chain of LLM client adapters.
+
+    Args:
+        clients: (provider name, client adapter) pairs, primary first.
+        hedging: Whether to send a duplicate request to the next provider when the first is slow.
+        hedge_percentile: Latency percentile (0-100) of a provider after which the request is hedged.
+        hedge_min_samples: Latencies recorded before the percentile is used.
+        hedge_initial_delay_s: Hedging deadline until then.
+        hedge_min_delay_s: Lower bound of the hedging deadline.
+        hedge_max_delay_s: Upper bound of the hedging deadline.
+        max_hedge_ratio: Largest share of requests that may be hedged.
+        max_workers: Threads running the provider calls of the synchronous API, shared by the process.
+        failure_threshold: Consecutive errors that open a provider's circuit breaker.
+        reset_timeout_s: How long a circuit breaker stays open after errors.
+        rate_limit_cooldown_s: How long it stays open after a rate limit without Retry-After.
+    """
+
+    def __init__(
+        self,
+        clients: list[tuple[str, LLMClientAdapter]],
+        hedging: bool = True,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        hedge_initial_delay_s: float = 2.0,
+        hedge_min_delay_s: float = 0.3,
+        hedge_max_delay_s: float = 5.0,
+        max_hedge_ratio: float = 0.1,
+        max_workers: int = 16,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+        rate_limit_cooldown_s: float = 10.0,
+    ):
+        if not clients:
+            raise ValueError("The fallback chain needs at least one LLM client")
+        self.clients = clients
+        self.hedging = hedging and len(clients) > 1
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_initial_delay_s = hedge_initial_delay_s
+        self.hedge_min_delay_s = hedge_min_delay_s
+        self.hedge_max_delay_s = hedge_max_delay_s
+        self.max_hedge_ratio = max_hedge_ratio
+        self.max_workers = max_workers
+        # Provider health is shared with the other clients of the process, e.g. after the LLM is changed
+        self.breakers = {
+            name: get_circuit_breaker(
+                name,
+                failure_threshold=failure_threshold,
+                reset_timeout_s=reset_timeout_s,
+                rate_limit_cooldown_s=rate_limit_cooldown_s,
+            )
+            for name, _ in clients
+        }
+        # Invoke latency is the whole response, stream latency the first token
+        self.latencies = {
+            (name, kind): LatencyTracker() for name, _ in clients for kind in ("response", "first_token")
+        }
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+        primary = clients[0][1]
+        self.provider = clients[0][0]
+        self.model_name = primary.model_name
+        self.temperature = primary.temperature
+
+    def next_client(self, start: int) -> Optional[int]:
+        """Index of the first client from `start` on whose circuit breaker lets a request through."""
+        for index in range(start, len(self.clients)):
+            if self.breakers[self.clients[index][0]].allow_request():
+                return index
+        return None
+
+    def unavailable_error(self) -> ProvidersUnavailableError:
+        retry_in = min(max(0.0, breaker.open_until - time.monotonic()) for breaker in self.breakers.values())
+        return ProvidersUnavailableError(
+            f"All LLM providers ({', '.join(self.breakers)}) are unavailable, retry in {retry_in:.1f}s."
+        )
+
+    def start_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def hedge_deadline(self, index: int, kind: str) -> Optional[float]:
+        """Seconds after which a request to client `index` is hedged, or None if it must not be."""
+        if not self.hedging or index + 1 >= len(self.clients):
+            return None
+        with self._lock:
+            if self.hedges >= self.max_hedge_ratio * self.requests:
+                return None
+        return self.latencies[(self.clients[index][0], kind)].deadline(
+            self.hedge_percentile,
+            self.hedge_min_samples,
+            self.hedge_initial_delay_s,
+            self.hedge_min_delay_s,
+            self.hedge_max_delay_s,
+        )
+
+    def record_hedge(self, name: str) -> None:
+        with self._lock:
+            self.hedges += 1
+        metrics.increment("rag_llm_hedged_total", provider=name)
+        logger.debug(f"'{name}' is slow, hedging the request.")
+
+    def record_outcome(self, name: str, kind: str, start_time: float, error: Optional[BaseException]) -> None:
+        """Feeds a finished attempt to the provider's circuit breaker and latency tracker."""
+        if error is None:
+            self.breakers[name].record_success()
+            self.latencies[(name, kind)].observe(time.perf_counter() - start_time)
+        else:
+            self.breakers[name].record_failure(error)
+            metrics.increment("rag_llm_failures_total", provider=name)
+            logger.warning(f"LLM provider '{name}' failed: {error}")
+
+    def record_winner(self, name: str, hedged: bool) -> None:
+        if hedged:
+            metrics.increment("rag_llm_hedge_wins_total", provider=name)
+        if name != self.provider:
+            metrics.increment("rag_llm_failovers_total", provider=name)
+
+    def invoke(self, prompt: Any, **kwargs) -> Any:
+        self.start_request()
+        executor = get_hedge_executor(self.max_workers)
+        attempts: dict[Future, str] = {}
+        index, last_error, hedged = -1, None, False
+
+        def run(name: str, client: LLMClientAdapter) -> Any:
+            start_time = time.perf_counter()
+            try:
+                response = client.invoke(prompt, **kwargs)
+            except Exception as e:
+                self.record_outcome(name, "response", start_time, e)
+                raise
+            self.record_outcome(name, "response", start_time, None)
+            return response
+
+        def finished(name: str, future: Future) -> None:
+            # A request cancelled before it started has no outcome
+            if future.cancelled():
+                self.breakers[name].release_trial()
+
+        def launch() -> bool:
+            nonlocal index
+            next_index = self.next_client(index + 1)
+            if next_index is None:
+                return False
+            index = next_index
+            name, client = self.clients[index]
+            future = executor.submit(run, name, client)
+            future.add_done_callback(lambda done: finished(name, done))
+            attempts[future] = name
+            return True
+
+        if not launch():
+            raise self.unavailable_error()
+        deadline = self.hedge_deadline(index, "response")
+        launched_at = time.perf_counter()
+        while attempts:
+            timeout = None if deadline is None else max(0.0, deadline - (time.perf_counter() - launched_at))
+            done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # The primary is slow: race it against the next provider
+                deadline = None
+                hedged_name = self.clients[index][0]
+                if launch():
+                    hedged = True
+                    self.record_hedge(hedged_name)
+                continue
+            for future in done:
+                name = attempts.pop(future)
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                # A running provider call cannot be interrupted, its response is discarded
+                for loser in attempts:
+                    loser.cancel()
+                self.record_winner(name, hedged)
+                return future.result()
+            if not attempts and launch():
+                deadline = self.hedge_deadline(index, "response")
+                launched_at = time.perf_counter()
+        raise last_error if last_error is not None else self.unavailable_error()
+
+    def stream(self, prompt: Any, usage: Optional[dict] = None, **kwargs) -> Iterator[str]:
+        """Yield the response text of the first provider to start answering.
+
+        Args:
+            usage: Filled with the winning provider's token usage once the stream ends, if it reports any.
+        """
+        self.start_request()
+        executor = get_hedge_executor(self.max_workers)
+        events = queue.Queue()
+        cancelled: dict[int, threading.Event] = {}
+        requests: dict[int, AbortableRequests] = {}
+        index, last_error = -1, None
+
+        def run(attempt: int, name: str, client: LLMClientAdapter, cancel: threading.Event) -> None:
+            start_time = time.perf_counter()
+            first_token = True
+            # Each attempt has its own usage, only the winner's is reported
+            attempt_usage = {}
+            chunks = client.stream(prompt, usage=attempt_usage, **kwargs)
+            try:
+                with requests[attempt]:
+                    for text in chunks:
+                        if cancel.is_set():
+                            return
+                        if first_token:
+                            self.latencies[(name, "first_token")].observe(time.perf_counter() - start_time)
+                            first_token = False
+                        events.put((attempt, "token", text))
+                self.breakers[name].record_success()
+                events.put((attempt, "done", attempt_usage))
+            except Exception as e:
+                # An aborted loser did not fail
+                if cancel.is_set():
+                    return
+                self.record_outcome(name, "first_token", start_time, e)
+                events.put((attempt, "error", e))
+            finally:
+                # Closing the generator closes the provider's HTTP stream
+                chunks.close()
+                if cancel.is_set() and first_token:
+                    self.breakers[name].release_trial()
+
+        def cancel(attempt: int) -> None:
+            cancelled[attempt].set()
+            # Frees the thread of an attempt still waiting for its first token
+            requests[attempt].abort()
+
+        def launch() -> bool:
+            nonlocal index
+            next_index = self.next_client(index + 1)
+            if next_index is None:
+                return False
+            index = next_index
+            name, client = self.clients[index]
+            cancelled[index] = threading.Event()
+            requests[index] = AbortableRequests()
+            executor.submit(run, index, name, client, cancelled[index])
+            return True
+
+        if not launch():
+            raise self.unavailable_error()
+        running = {index}
+        hedged = False
+        deadline = self.hedge_deadline(index, "first_token")
+        launched_at = time.perf_counter()
+        winner = None
+        try:
+            while winner is None:
+                timeout = None if deadline is None else max(0.0, deadline - (time.perf_counter() - launched_at))
+                try:
+                    attempt, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    deadline = None
+                    hedged_name = self.clients[index][0]
+                    if launch():
+                        running.add(index)
+                        hedged = True
+                        self.record_hedge(hedged_name)
+                    continue
+                if kind == "error":
+                    running.discard(attempt)
+                    last_error = value
+                    if not running:
+                        if not launch():
+                            raise last_error
+                        running.add(index)
+                        deadline = self.hedge_deadline(index, "first_token")
+                        launched_at = time.perf_counter()
+                    continue
+                winner = attempt
+                for loser in running - {winner}:
+                    cancel(loser)
+                self.record_winner(self.clients[winner][0], hedged)
+                if kind == "done":
+                    if usage is not None:
+                        usage.update(value)
+                    return
+                yield value
+
+            while True:
+                attempt, kind, value = events.get()
+                if attempt != winner:
+                    continue
+                if kind == "token":
+                    yield value
+                elif kind == "done":
+                    if usage is not None:
+                        usage.update(value)
+                    return
+                else:
+                    raise value
+        finally:
+            for attempt in cancelled:
+                cancel(attempt)
+
+
+class AsyncFailoverLLMClientAdapter(FailoverLLMClientAdapter):
+    """Failover client exposing the async API (`ainvoke`/`astream`), where losing requests are cancelled."""
+
+    async def ainvoke(self, prompt: Any, **kwargs) -> Any:
+        self.start_request()
+        attempts: dict[asyncio.Task, str] = {}
+        index, last_error, hedged = -1, None, False
+
+        async def run(name: str, client: AsyncLLMClientAdapter) -> Any:
+            start_time = time.perf_counter()
+            try:
+                response = await client.ainvoke(prompt, **kwargs)
+            except asyncio.CancelledError:
+                self.breakers[name].release_trial()
+                raise
+            except Exception as e:
+                self.record_outcome(name, "response", start_time, e)
+                raise
+            self.record_outcome(name, "response", start_time, None)
+            return response
+
+        def launch() -> bool:
+            nonlocal index
+            next_index = self.next_client(index + 1)
+            if next_index is None:
+                return False
+            index = next_index
+            name, client = self.clients[index]
+            attempts[asyncio.create_task(run(name, client))] = name
+            return True
+
+        if not launch():
+            raise self.unavailable_error()
+        deadline = self.hedge_deadline(index, "response")
+        launched_at = time.perf_counter()
+        try:
+            while attempts:
+                timeout = None if deadline is None else max(0.0, deadline - (time.perf_counter() - launched_at))
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    deadline = None
+                    hedged_name = self.clients[index][0]
+                    if launch():
+                        hedged = True
+                        self.record_hedge(hedged_name)
+                    continue
+                for task in done:
+                    name = attempts.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    self.record_winner(name, hedged)
+                    return task.result()
+                if not attempts and launch():
+                    deadline = self.hedge_deadline(index, "response")
+                    launched_at = time.perf_counter()
+            raise last_error if last_error is not None else self.unavailable_error()
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def astream(self, prompt: Any, usage: Optional[dict] = None, **kwargs) -> AsyncIterator[str]:
+        """Yield the response text of the first provider to start answering.
+
+        Args:
+            usage: Filled with the winning provider's token usage once the stream ends, if it reports any.
+        """
+        self.start_request()
+        events = asyncio.Queue()
+        tasks: dict[int, asyncio.Task] = {}
+        index, last_error = -1, None
+
+        async def run(attempt: int, name: str, client: AsyncLLMClientAdapter) -> None:
+            start_time = time.perf_counter()
+            first_token = True
+            attempt_usage = {}
+            try:
+                async for text in client.astream(prompt, usage=attempt_usage, **kwargs):
+                    if first_token:
+                        self.latencies[(name, "first_token")].observe(time.perf_counter() - start_time)
+                        first_token = False
+                    events.put_nowait((attempt, "token", text))
+                self.breakers[name].record_success()
+                events.put_nowait((attempt, "done", attempt_usage))
+            except asyncio.CancelledError:
+                if first_token:
+                    self.breakers[name].release_trial()
+                raise
+            except Exception as e:
+                self.record_outcome(name, "first_token", start_time, e)
+                events.put_nowait((attempt, "error", e))
+
+        def launch() -> bool:
+            nonlocal index
+            next_index = self.next_client(index + 1)
+            if next_index is None:
+                return False
+            index = next_index
+            name, client = self.clients[index]
+            tasks[index] = asyncio.create_task(run(index, name, client))
+            return True
+
+        if not launch():
+            raise self.unavailable_error()
+        running = {index}
+        hedged = False
+        deadline = self.hedge_deadline(index, "first_token")
+        launched_at = time.perf_counter()
+        winner = None
+        try:
+            while winner is None:
+                timeout = None if deadline is None else max(0.0, deadline - (time.perf_counter() - launched_at))
+                try:
+                    attempt, kind, value = await asyncio.wait_for(events.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    deadline = None
+                    hedged_name = self.clients[index][0]
+                    if launch():
+                        running.add(index)
+                        hedged = True
+                        self.record_hedge(hedged_name)
+                    continue
+                if kind == "error":
+                    running.discard(attempt)
+                    last_error = value
+                    if not running:
+                        if not launch():
+                            raise last_error
+                        running.add(index)
+                        deadline = self.hedge_deadline(index, "first_token")
+                        launched_at = time.perf_counter()
+                    continue
+                winner = attempt
+                for loser in running - {winner}:
+                    tasks[loser].cancel()
+                self.record_winner(self.clients[winner][0], hedged)
+                if kind == "done":
+                    if usage is not None:
+                        usage.update(value)
+                    return
+                yield value
+
+            while True:
+                attempt, kind, value = await events.get()
+                if attempt != winner:
+                    continue
+                if kind == "token":
+                    yield value
+                elif kind == "done":
+                    if usage is not None:
+                        usage.update(value)
+                    return
+                else:
+                    raise value
+        finally:
+            for task in tasks.values():
+                task.cancel()
@@ -1,14 +1,178 @@
-from typing import Any
+from typing import Any, AsyncIterator, Iterator, Optional
+from app_code.response_cache import cacheable_key, get_response_cache
 
 class LLMClientAdapter:
-    def __init__(self, llm_client):
+    """Uniform invoke/stream API over a LangChain chat client.
+
+    Temperature-0 calls are answered from the persistent LLM response cache when
+    the same prompt was sent to the same provider and model before.
+
+    Args:
+        llm_client: The provider's chat client.
+        provider: Provider name for the cache key. Defaults to the client's LangChain type.
+        model_name: Model name for the cache key. Defaults to the client's model attribute.
+        temperature: Sampling temperature. Defaults to the client's temperature attribute.
+    """
+
+    def __init__(
+        self,
+        llm_client,
+        provider: Optional[str] = None,
+        model_name: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ):
         self.llm_client = llm_client
+        self.provider = provider or getattr(llm_client, "_llm_type", type(llm_client).__name__)
+        self.model_name = model_name or getattr(llm_client, "model_name", None) or getattr(llm_client, "model", None)
+        self.temperature = temperature if temperature is not None else getattr(llm_client, "temperature", None)
+
+    def cache_key(self, prompt: Any, kwargs: dict) -> Optional[str]:
+        return cacheable_key(self.provider, self.model_name, self.temperature, prompt, kwargs)
 
     def invoke(self, prompt: str, **kwargs) -> Any:
+        key = self.cache_key(prompt, kwargs)
+        if key is not None:
+            cached = get_response_cache().get(key)
+            if cached is not None:
+                return cached_message(cached)
+
         # Try to call the client's invoke method with the prompt
         try:
             # For clients that expect 'input' or 'prompt'
-            return self.llm_client.invoke(prompt, **kwargs)
+            response = self.llm_client.invoke(prompt, **kwargs)
         except TypeError:
             # For clients that expect 'input' as a named argument
-            return self.llm_client.invoke(input=prompt, **kwargs)
\ No newline at end of file
+            response = self.llm_client.invoke(input=prompt, **kwargs)
+
+        if key is not None and chunk_text(response):
+            get_response_cache().put(key, chunk_text(response))
+        return response
+
+    def stream(self, prompt: str, usage: Optional[dict] = None, **kwargs) -> Iterator[str]:
+        """Yield the response text piece by piece as the provider generates it.
+
+        Args:
+            usage: Filled with the provider's token usage once the stream ends, if it reports any.
+        """
+        key = self.cache_key(prompt, kwargs)
+        if key is not None:
+            cached = get_response_cache().get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        try:
+            chunks = self.llm_client.stream(prompt, **kwargs)
+        except TypeError:
+            chunks = self.llm_client.stream(input=prompt, **kwargs)
+
+        texts, stream_usage = [], None
+        for chunk in chunks:
+            # Providers usually report usage on the last chunk, which has no text
+            stream_usage = add_chunk_usage(stream_usage, chunk)
+            text = chunk_text(chunk)
+            if text:
+                texts.append(text)
+                yield text
+        if usage is not None and stream_usage:
+            usage.update(stream_usage)
+        # Only a fully streamed response is cached
+        if key is not None and texts:
+            get_response_cache().put(key, "".join(texts))
+
+
+class AsyncLLMClientAdapter(LLMClientAdapter):
+    """Adapter exposing the async LangChain API (`ainvoke`/`astream`) of a client.
+
+    The SQLite response cache is read and written in the retrieval executor, so a
+    busy database never blocks the event loop.
+    """
+
+    async def cache_get(self, key: str) -> Optional[str]:
+        # Imported here: async_rag imports this module
+        from app_code.async_rag import run_blocking
+
+        return await run_blocking(get_response_cache().get, key)
+
+    async def cache_put(self, key: str, text: str) -> None:
+        from app_code.async_rag import run_blocking
+
+        await run_blocking(get_response_cache().put, key, text)
+
+    async def ainvoke(self, prompt: str, **kwargs) -> Any:
+        key = self.cache_key(prompt, kwargs)
+        if key is not None:
+            cached = await self.cache_get(key)
+            if cached is not None:
+                return cached_message(cached)
+
+        try:
+            response = await self.llm_client.ainvoke(prompt, **kwargs)
+        except TypeError:
+            response = await self.llm_client.ainvoke(input=prompt, **kwargs)
+
+        if key is not None and chunk_text(response):
+            await self.cache_put(key, chunk_text(response))
+        return response
+
+    async def astream(self, prompt: str, usage: Optional[dict] = None, **kwargs) -> AsyncIterator[str]:
+        """Yield the response text piece by piece without blocking the event loop.
+
+        Args:
+            usage: Filled with the provider's token usage once the stream ends, if it reports any.
+        """
+        key = self.cache_key(prompt, kwargs)
+        if key is not None:
+            cached = await self.cache_get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        try:
+            chunks = self.llm_client.astream(prompt, **kwargs)
+        except TypeError:
+            chunks = self.llm_client.astream(input=prompt, **kwargs)
+
+        texts, stream_usage = [], None
+        async for chunk in chunks:
+            stream_usage = add_chunk_usage(stream_usage, chunk)
+            text = chunk_text(chunk)
+            if text:
+                texts.append(text)
+                yield text
+        if usage is not None and stream_usage:
+            usage.update(stream_usage)
+        if key is not None and texts:
+            await self.cache_put(key, "".join(texts))
+
+
+def cached_message(text: str) -> Any:
+    """Wrap a cached response text like a provider's response message."""
+    # langchain_core is slow to import, and already loaded once a provider is used
+    from langchain_core.messages import AIMessage
+
+    return AIMessage(content=text)
+
+
+def add_chunk_usage(usage: Optional[dict], chunk: Any) -> Optional[dict]:
+    """Add the token usage of a streamed message chunk, if any, to the usage so far."""
+    chunk_usage = getattr(chunk, "usage_metadata", None)
+    if not chunk_usage:
+        return usage
+    if not usage:
+        return dict(chunk_usage)
+    from langchain_core.messages.ai import add_usage
+
+    return dict(add_usage(usage, chunk_usage))
+
+
+def chunk_text(chunk: Any) -> str:
+    """Extract the text of a streamed message chunk."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, list):
+        # Some providers (e.g. Gemini) stream a list of content blocks
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+        )
+    return content or ""
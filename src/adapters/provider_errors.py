@@ -0,0 +1,33 @@
+"""
+Helpers classifying the errors raised by the provider SDKs, shared by the
+failover chain and the rate limiter.
+"""
+
+from typing import Optional
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """HTTP status code of a provider SDK error, if it carries one."""
+    for candidate in (error, getattr(error, "response", None)):
+        status_code = getattr(candidate, "status_code", None) or getattr(candidate, "code", None)
+        if isinstance(status_code, int):
+            return status_code
+    return None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether a provider error is a rate limit (HTTP 429 / resource exhausted)."""
+    name = type(error).__name__
+    return error_status_code(error) == 429 or "RateLimit" in name or name == "ResourceExhausted"
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds to wait before retrying, from the Retry-After header of a provider error."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,159 @@
+"""
+Asyncio version of the RAG query pipeline.
+
+Embedding and Chroma calls are CPU-bound and blocking, so they run in a small,
+bounded thread pool. LLM calls use the providers' native async API, letting one
+event loop keep many requests in flight without a thread per request.
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Callable, Optional
+from adapters.llm_client_adapter import AsyncLLMClientAdapter
+from app_code.chroma_db_rag import build_rag_prompt, retrieve_relevant_documents
+from app_code.telemetry import StackSampler, query_stage, query_trace, record_stage, record_llm_tokens, sampled_thread
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get or create the bounded executor used for blocking retrieval work."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = load_yaml_config(APP_CONFIG_FPATH).get("async_pipeline") or {}
+                max_workers = config.get("executor_workers", 4)
+                logger.debug(f"Starting retrieval executor with {max_workers} workers")
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="rag-retrieval"
+                )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    """Shut down the retrieval executor, if it was started."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking function in the retrieval executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
+
+
+def profiled(sampler: Optional[StackSampler], func: Callable) -> Callable:
+    """Wraps a blocking function so the query's stack sampler follows it into the executor thread."""
+
+    def run(*args, **kwargs):
+        with sampled_thread(sampler):
+            return func(*args, **kwargs)
+
+    return run
+
+
+async def aretrieve_relevant_documents(
+    query: str,
+    n_results: int = 5,
+    threshold: float = 0.3,
+) -> list[str]:
+    """
+    Async version of `chroma_db_rag.retrieve_relevant_documents`.
+    """
+    return await run_blocking(
+        retrieve_relevant_documents, query, n_results=n_results, threshold=threshold
+    )
+
+
+async def respond_to_query(
+    prompt_config: dict,
+    query: str,
+    llm: AsyncLLMClientAdapter,
+    n_results: int = 5,
+    threshold: float = 0.3,
+) -> str:
+    """
+    Respond to a query using the ChromaDB database without blocking the event loop.
+    """
+    # The event loop serves other queries too, so only the executor thread doing this one is sampled
+    with query_trace(query, profile=False) as sampler:
+        rag_assistant_prompt = await run_blocking(
+            profiled(sampler, build_rag_prompt),
+            prompt_config,
+            query,
+            n_results=n_results,
+            threshold=threshold,
+            model_name=llm.model_name,
+        )
+
+        with query_stage("llm"):
+            response = await llm.ainvoke(rag_assistant_prompt)
+        record_llm_tokens(rag_assistant_prompt, response.content, getattr(response, "usage_metadata", None))
+    return response.content
+
+
+async def respond_to_query_stream(
+    prompt_config: dict,
+    query: str,
+    llm: AsyncLLMClientAdapter,
+    n_results: int = 5,
+    threshold: float = 0.3,
+) -> AsyncIterator[str]:
+    """
+    Respond to a query using the ChromaDB database, yielding the response as it is generated.
+    """
+    with query_trace(query, profile=False) as sampler:
+        rag_assistant_prompt = await run_blocking(
+            profiled(sampler, build_rag_prompt),
+            prompt_config,
+            query,
+            n_results=n_results,
+            threshold=threshold,
+            model_name=llm.model_name,
+        )
+
+        start_time = time.perf_counter()
+        tokens, usage = [], {}
+        async for token in llm.astream(rag_assistant_prompt, usage=usage):
+            if not tokens:
+                record_stage("llm_first_token", time.perf_counter() - start_time)
+            tokens.append(token)
+            yield token
+        record_stage("llm", time.perf_counter() - start_time)
+        record_llm_tokens(rag_assistant_prompt, "".join(tokens), usage)
+
+
+async def respond_to_queries(
+    prompt_config: dict,
+    queries: list[str],
+    llm: AsyncLLMClientAdapter,
+    n_results: int = 5,
+    threshold: float = 0.3,
+    max_concurrency: Optional[int] = None,
+) -> list[str]:
+    """
+    Answer several queries concurrently on the current event loop.
+
+    Args:
+        max_concurrency (int): Maximum number of queries in flight. Defaults to no limit
+    """
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def respond(query: str) -> str:
+        if semaphore is None:
+            return await respond_to_query(prompt_config, query, llm, n_results, threshold)
+        async with semaphore:
+            return await respond_to_query(prompt_config, query, llm, n_results, threshold)
+
+    return await asyncio.gather(*(respond(query) for query in queries))
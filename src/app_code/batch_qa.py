@@ -0,0 +1,284 @@
+"""
+Batch question answering from a JSONL file.
+
+Run from the `src` directory:
+
+    python -m app_code.batch_qa --input questions.jsonl --output outputs/answers.jsonl
+
+Each input line is a JSON object with a `question` (or `query`) and an optional
+`id` (defaults to a hash of the question, which stays the same when the file is
+edited). Malformed lines are logged and skipped. Questions are retrieved in batches of
+`batch_qa.batch_size`: the batch is embedded in one pass and sent to the vector
+store in one query, then the LLM calls of the batch run concurrently, at most
+`batch_qa.max_concurrency` at a time, while the next batch is retrieved.
+
+Each answer is appended to the output JSONL as soon as it is ready, with its
+sources and per-item timings. A run can be interrupted and started again with
+the same output file: the ids already answered are skipped, failed ones are
+retried.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import Iterator, Optional
+from adapters.llm_client_adapter import AsyncLLMClientAdapter
+from app_code.async_rag import run_blocking, shutdown_executor
+from app_code.chroma_db_rag import build_rag_prompt, retrieve_relevant_chunks_batch, retrieval_params
+from app_code.db_manager import shutdown
+from app_code.initialize_llm import create_llm_client
+from app_code.micro_batching import percentile
+from app_code.telemetry import record_llm_tokens, record_stage
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, OUTPUTS_DIR, PROMPT_CONFIG_FPATH
+
+
+def load_completed_ids(output_path: str) -> set[str]:
+    """
+    Ids answered without error in a previous run of the same output file.
+
+    A line cut short by an interruption is removed, so the file stays valid JSONL.
+    """
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, "r+", encoding="utf-8") as f:
+        valid_end = 0
+        for line in iter(f.readline, ""):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if not line.endswith("\n"):
+                break
+            valid_end = f.tell()
+            if record.get("error") is None:
+                completed.add(str(record["id"]))
+        if valid_end != os.path.getsize(output_path):
+            logger.warning(f"Removing an incomplete last line from {output_path}")
+            f.truncate(valid_end)
+    return completed
+
+
+def question_id(question: str) -> str:
+    """Default id of a question without one, stable across runs and edits of the input file."""
+    return hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+
+
+def read_questions(input_path: str, skip: set[str]) -> Iterator[dict]:
+    """Yields the {id, question} items of a JSONL file, leaving out the ids in `skip`."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Skipping line {line_number} of {input_path}: invalid JSON ({e})")
+                continue
+            question = (item.get("question") or item.get("query")) if isinstance(item, dict) else None
+            if not question:
+                logger.warning(f"Skipping line {line_number} of {input_path}: no question")
+                continue
+            item_id = item["id"] if item.get("id") is not None else question_id(question)
+            if str(item_id) in skip:
+                continue
+            # Also skips an id repeated further down the file
+            skip.add(str(item_id))
+            yield {"id": item_id, "question": question}
+
+
+def iter_batches(items: Iterator[dict], batch_size: int) -> Iterator[list[dict]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def answer_question(
+    item: dict,
+    chunks: list[tuple[str, str]],
+    prompt_config: dict,
+    llm: AsyncLLMClientAdapter,
+    semaphore: asyncio.Semaphore,
+    timings: dict,
+    batch_started_at: float,
+) -> dict:
+    """Builds the prompt of a retrieved question, asks the LLM and returns the output record."""
+    record = {"id": item["id"], "question": item["question"], "answer": None, "error": None}
+    record["sources"] = [chunk_id for chunk_id, _ in chunks]
+    timings = dict(timings)
+    try:
+        start_time = time.perf_counter()
+        prompt = await run_blocking(
+            build_rag_prompt, prompt_config, item["question"], model_name=llm.model_name, relevant_chunks=chunks
+        )
+        timings["build_prompt"] = (time.perf_counter() - start_time) * 1000
+
+        start_time = time.perf_counter()
+        async with semaphore:
+            timings["llm_wait"] = (time.perf_counter() - start_time) * 1000
+            start_time = time.perf_counter()
+            response = await llm.ainvoke(prompt)
+        llm_time = time.perf_counter() - start_time
+        timings["llm"] = llm_time * 1000
+        record_stage("llm", llm_time)
+        record_llm_tokens(prompt, response.content, getattr(response, "usage_metadata", None))
+        record["answer"] = response.content
+    except Exception as e:
+        logger.warning(f"Question {item['id']} failed: {e}")
+        record["error"] = f"{type(e).__name__}: {e}"
+    timings["total"] = (time.perf_counter() - batch_started_at) * 1000
+    record["timings_ms"] = {stage: round(ms, 2) for stage, ms in timings.items()}
+    return record
+
+
+async def run_batch_qa(
+    input_path: str,
+    output_path: str,
+    llm: AsyncLLMClientAdapter,
+    prompt_config: dict,
+    batch_size: int = 64,
+    max_concurrency: int = 8,
+    n_results: int = 5,
+    threshold: float = 0.3,
+) -> dict:
+    """
+    Answer every question of a JSONL file not already answered in `output_path`.
+
+    Args:
+        input_path (str): JSONL file of {"id": ..., "question": ...} objects, the id being optional
+        output_path (str): JSONL file the answers are appended to
+        llm (AsyncLLMClientAdapter): The LLM client
+        prompt_config (dict): The RAG assistant prompt config
+        batch_size (int): Questions retrieved together
+        max_concurrency (int): LLM calls in flight
+
+    Returns:
+        dict: Counts of answered, failed and skipped questions, and latency percentiles
+    """
+    completed = load_completed_ids(output_path)
+    if completed:
+        logger.info(f"Resuming: {len(completed)} questions of {output_path} are already answered.")
+    skipped = len(completed)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pending = set()
+    totals, failed = [], 0
+    start_time = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "a", encoding="utf-8") as output:
+
+        def write(task: asyncio.Task) -> None:
+            nonlocal failed
+            if task.cancelled() or output.closed:
+                return
+            record = task.result()
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Flushed per answer, so an interruption loses at most the answers in flight
+            output.flush()
+            totals.append(record["timings_ms"]["total"])
+            failed += record["error"] is not None
+
+        for batch in iter_batches(read_questions(input_path, skip=completed), batch_size):
+            batch_started_at = time.perf_counter()
+            chunks = await run_blocking(
+                retrieve_relevant_chunks_batch,
+                [item["question"] for item in batch],
+                n_results=n_results,
+                threshold=threshold,
+            )
+            timings = {"retrieval": (time.perf_counter() - batch_started_at) * 1000}
+            for item, item_chunks in zip(batch, chunks):
+                task = asyncio.create_task(
+                    answer_question(item, item_chunks, prompt_config, llm, semaphore, timings, batch_started_at)
+                )
+                task.add_done_callback(write)
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            # Retrieve the next batch while this one is answered, but no further ahead
+            while len(pending) > batch_size:
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            logger.info(f"Answered {len(totals) - failed} questions, {failed} failed, {len(pending)} in flight...")
+        if pending:
+            await asyncio.wait(pending)
+
+    elapsed = time.perf_counter() - start_time
+    summary = {
+        "answered": len(totals) - failed,
+        "failed": failed,
+        "skipped": skipped,
+        "elapsed_seconds": round(elapsed, 2),
+        "questions_per_second": round(len(totals) / elapsed, 2) if elapsed else 0.0,
+        "total_ms": {f"p{q}": round(percentile(totals, q), 2) for q in (50, 95, 99)},
+    }
+    return summary
+
+
+async def amain(args: argparse.Namespace) -> dict:
+    app_config = load_yaml_config(APP_CONFIG_FPATH)
+    batch_config = app_config.get("batch_qa") or {}
+    prompt_config = load_yaml_config(PROMPT_CONFIG_FPATH)["rag_assistant_prompt"]
+    vectordb_params = retrieval_params(app_config["vectordb"])
+    if args.n_results is not None:
+        vectordb_params["n_results"] = args.n_results
+    if args.threshold is not None:
+        vectordb_params["threshold"] = args.threshold
+
+    provider_name = args.provider or batch_config.get("provider", "groq")
+    model_name = args.model or batch_config.get("model_name") or app_config.get("default_llm_models", {}).get(provider_name)
+    temperature = batch_config.get("temperature", 0.0)
+    # Created in the running event loop, which owns its async HTTP connections
+    llm = create_llm_client(provider_name, model_name, temperature, asynchronous=True, app_config=app_config)
+    logger.info(f"Answering {args.input} with '{provider_name}' model '{model_name}' into {args.output}.")
+    try:
+        return await run_batch_qa(
+            args.input,
+            args.output,
+            llm,
+            prompt_config,
+            batch_size=args.batch_size or batch_config.get("batch_size", 64),
+            max_concurrency=args.max_concurrency or batch_config.get("max_concurrency", 8),
+            **vectordb_params,
+        )
+    finally:
+        shutdown_executor()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Answer the questions of a JSONL file")
+    parser.add_argument("--input", required=True, help="JSONL file of {\"id\": ..., \"question\": ...} objects")
+    parser.add_argument(
+        "--output", default=os.path.join(OUTPUTS_DIR, "batch_answers.jsonl"),
+        help="JSONL file the answers are appended to; answered ids are skipped when it already exists",
+    )
+    parser.add_argument("--batch-size", type=int, default=None, help="Questions retrieved together")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="LLM calls in flight")
+    parser.add_argument("--provider", default=None)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--n-results", type=int, default=None)
+    parser.add_argument("--threshold", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    try:
+        summary = asyncio.run(amain(args))
+    finally:
+        shutdown()
+    logger.info(
+        f"Batch done in {summary['elapsed_seconds']}s: {summary['answered']} answered, {summary['failed']} failed, "
+        f"{summary['skipped']} already answered ({summary['questions_per_second']} questions/sec, "
+        f"total p50 {summary['total_ms']['p50']}ms / p95 {summary['total_ms']['p95']}ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+On-disk BM25 inverted index over the chunks of the vector database.
+
+The index uses the same chunk ids as the Chroma collection and is stored in
+SQLite next to it in `outputs/vector_db`. Postings are rows clustered by term,
+so ingestion updates only the chunks it adds or removes and a query reads only
+the postings of its terms, at most `bm25_max_postings_per_term` of the highest
+impact per term. It complements dense retrieval with exact matches on
+identifiers, acronyms and author names.
+"""
+
+import os
+import re
+import math
+import heapq
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterable, Optional
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, BM25_INDEX_FPATH
+
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-]\w+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or "
+    "that the this to was what when where which who why with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases and splits text into terms.
+
+    Compound tokens such as `gpt-3.5` or `all-MiniLM-L6-v2` are kept whole and
+    also split into their parts, so both exact identifiers and parts match.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if "-" in token or "." in token:
+            terms.extend(part for part in re.split(r"[.\-]", token) if part)
+    return terms
+
+
+def tokenize_query(query: str) -> list[str]:
+    """Tokenizes a query, dropping stopwords that would match almost every chunk."""
+    return [term for term in tokenize(query) if term not in STOPWORDS]
+
+
+class BM25Index:
+    """An incrementally updatable BM25 index keyed by chunk id, stored in SQLite.
+
+    Each posting also stores its BM25 term weight ("impact") computed with the
+    average chunk length at the time it was added. Queries score only the top
+    `max_postings_per_term` postings of each term by impact, which bounds the
+    cost of common terms, and rescore them with the current statistics.
+
+    Args:
+        db_path: SQLite database file.
+        k1: Term frequency saturation.
+        b: Document length normalization.
+        max_postings_per_term: Postings scored per query term.
+    """
+
+    def __init__(
+        self,
+        db_path: str = BM25_INDEX_FPATH,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_postings_per_term: int = 2000,
+    ):
+        self.db_path = db_path
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = max_postings_per_term
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        connection = self._connection()
+        # WAL lets queries read while ingestion writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                length INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                doc INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                impact REAL NOT NULL,
+                PRIMARY KEY (doc, term)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_term ON postings (term, impact DESC, tf);
+            CREATE TABLE IF NOT EXISTS stats (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            """
+        )
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, so lookups from several threads run in parallel."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.db_path, timeout=30)
+        return connection
+
+    def _stats(self, connection: sqlite3.Connection) -> tuple[int, int]:
+        """Number of chunks and their total length."""
+        values = dict(connection.execute("SELECT key, value FROM stats"))
+        return values.get("n_docs", 0), values.get("total_length", 0)
+
+    def _set_stats(self, connection: sqlite3.Connection, n_docs: int, total_length: int) -> None:
+        connection.executemany(
+            "INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+            [("n_docs", n_docs), ("total_length", total_length)],
+        )
+
+    def __len__(self) -> int:
+        return self._stats(self._connection())[0]
+
+    def add(self, chunk_ids: Iterable[str], documents: Iterable[str]) -> None:
+        """Adds or replaces chunks in the index, in one transaction."""
+        chunks = dict(zip(chunk_ids, documents))
+        with self._lock:
+            connection = self._connection()
+            with connection:
+                self._remove(connection, list(chunks))
+                n_docs, total_length = self._stats(connection)
+                postings, document_frequencies = [], Counter()
+                for chunk_id, document in chunks.items():
+                    term_counts = Counter(tokenize(document))
+                    length = sum(term_counts.values())
+                    doc = connection.execute(
+                        "INSERT INTO docs (chunk_id, length) VALUES (?, ?)", (chunk_id, length)
+                    ).lastrowid
+                    n_docs += 1
+                    total_length += length
+                    norm = self.k1 * (1 - self.b + self.b * length / (total_length / n_docs))
+                    postings.extend(
+                        (doc, term, tf, tf * (self.k1 + 1) / (tf + norm)) for term, tf in term_counts.items()
+                    )
+                    document_frequencies.update(term_counts.keys())
+                connection.executemany(
+                    "INSERT INTO postings (doc, term, tf, impact) VALUES (?, ?, ?, ?)", postings
+                )
+                connection.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+                    document_frequencies.items(),
+                )
+                self._set_stats(connection, n_docs, total_length)
+
+    def remove(self, chunk_ids: Iterable[str]) -> None:
+        """Removes chunks from the index, ignoring unknown ids."""
+        with self._lock:
+            connection = self._connection()
+            with connection:
+                self._remove(connection, list(chunk_ids))
+
+    def _remove(self, connection: sqlite3.Connection, chunk_ids: list[str]) -> None:
+        n_docs, total_length = self._stats(connection)
+        removed, removed_terms = 0, Counter()
+        for chunk_id in chunk_ids:
+            row = connection.execute("SELECT doc, length FROM docs WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            doc, length = row
+            removed_terms.update(term for term, in connection.execute("SELECT term FROM postings WHERE doc = ?", (doc,)))
+            connection.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+            connection.execute("DELETE FROM docs WHERE doc = ?", (doc,))
+            removed += 1
+            n_docs -= 1
+            total_length -= length
+        if removed_terms:
+            connection.executemany("UPDATE terms SET df = df - ? WHERE term = ?", [(count, term) for term, count in removed_terms.items()])
+            connection.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", [(term,) for term in removed_terms])
+        # Chunks without any token have no postings, but still count in the stats
+        if removed:
+            self._set_stats(connection, n_docs, total_length)
+
+    def clear(self) -> None:
+        """Removes every chunk from the index."""
+        with self._lock:
+            connection = self._connection()
+            with connection:
+                for table in ("postings", "terms", "docs", "stats"):
+                    connection.execute(f"DELETE FROM {table}")
+
+    def search(self, query: str, n_results: int = 10) -> list[tuple[str, float]]:
+        """Returns the top (chunk id, BM25 score) pairs for a query."""
+        terms = set(tokenize_query(query))
+        connection = self._connection()
+        n_docs, total_length = self._stats(connection)
+        if not terms or not n_docs:
+            return []
+        avg_length = total_length / n_docs
+        scores, chunk_ids = {}, {}
+        for term in terms:
+            row = connection.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                continue
+            df = row[0]
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            postings = connection.execute(
+                """
+                SELECT p.doc, p.tf, d.length, d.chunk_id FROM postings p JOIN docs d ON d.doc = p.doc
+                WHERE p.term = ? ORDER BY p.impact DESC LIMIT ?
+                """,
+                (term, self.max_postings_per_term),
+            )
+            for doc, tf, length, chunk_id in postings:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                chunk_ids[doc] = chunk_id
+        top = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+        return [(chunk_ids[doc], score) for doc, score in top]
+
+
+_index = None
+_index_file = None
+_index_lock = threading.Lock()
+
+
+def _file_id(path: str) -> Optional[tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino
+    except OSError:
+        return None
+
+
+def load_hybrid_search_config() -> dict:
+    """Loads the `hybrid_search` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("hybrid_search") or {}
+
+
+def get_bm25_index() -> BM25Index:
+    """Gets the process-wide BM25 index, reopening it if another process recreated the database."""
+    global _index, _index_file
+    file_id = _file_id(BM25_INDEX_FPATH)
+    if _index is None or (file_id is not None and file_id != _index_file):
+        with _index_lock:
+            if _index is None or (file_id is not None and file_id != _index_file):
+                config = load_hybrid_search_config()
+                _index = BM25Index(
+                    BM25_INDEX_FPATH,
+                    k1=config.get("bm25_k1", 1.5),
+                    b=config.get("bm25_b", 0.75),
+                    max_postings_per_term=config.get("bm25_max_postings_per_term", 2000),
+                )
+                _index_file = _file_id(BM25_INDEX_FPATH)
+                logger.debug(f"Opened BM25 index with {len(_index)} chunks")
+    return _index
+
+
+def reset_bm25_index() -> None:
+    """Drops the open index, e.g. after the vector database was deleted."""
+    global _index, _index_file
+    with _index_lock:
+        _index = None
+        _index_file = None
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """Merges ranked id lists by reciprocal rank fusion.
+
+    Args:
+        rankings: Lists of ids, each ordered best first.
+        k: RRF constant damping the weight of top ranks.
+
+    Returns:
+        (id, fused score) pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -1,29 +1,50 @@
 import os
-import torch
-import chromadb
+import json
+import time
+import queue
+import threading
+import multiprocessing
 import shutil
 import numpy as np
-from paths import VECTOR_DB_DIR
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app_code.utils import load_all_publications
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+from paths import VECTOR_DB_DIR, DATA_DIR, APP_CONFIG_FPATH, INGEST_MANIFEST_FPATH
+from app_code.utils import (
+    load_yaml_config,
+    load_publication,
+    list_publication_ids,
+    iter_json_publications,
+    hash_text,
+)
 from app_code.logger import logger
-from app_code.db_manager import get_client, shutdown
+from app_code.db_manager import shutdown
+from app_code.vector_store import VectorStore, open_vector_store
+from app_code.flat_vector_store import FlatVectorStore, quantization_report
+from app_code.embedding_service import get_embedding_service
+from app_code.retrieval_cache import mark_collection_changed
+from app_code.telemetry import INGEST_STAGE_SECONDS, ingest_stage, log_stage_summary
+from app_code.bm25_index import (
+    get_bm25_index,
+    reset_bm25_index,
+    load_hybrid_search_config,
+)
 
 def initialize_db(
     persist_directory: str = VECTOR_DB_DIR,
     collection_name: str = "publications",
     delete_existing: bool = False,
-) -> chromadb.Collection:
+) -> VectorStore:
     """
-    Initialize a ChromaDB instance and persist it to disk.
+    Initialize the configured vector store and persist it to disk.
 
     Args:
-        persist_directory (str): The directory where ChromaDB will persist data. Defaults to "./vector_db"
+        persist_directory (str): The directory where the vector store persists data. Defaults to "./vector_db"
         collection_name (str): The name of the collection to create/get. Defaults to "publications"
         delete_existing (bool): Whether to delete the existing database if it exists. Defaults to False
     Returns:
-        chromadb.Collection: The ChromaDB collection instance
+        VectorStore: The vector store, open for writing
     """
     if os.path.exists(persist_directory) and delete_existing:
         # First ensure no client is connected
@@ -32,6 +53,8 @@ def initialize_db(
         try:
             shutil.rmtree(persist_directory)
             logger.info(f"Successfully deleted existing database at {persist_directory}")
+            mark_collection_changed(persist=True)
+            reset_bm25_index()
         except PermissionError as e:
             logger.error("\033[1;31mFailed to delete vector_db directory. Make sure no process is using chroma.sqlite3.\033[0m")
             logger.error(e)
@@ -41,32 +64,15 @@ def initialize_db(
     os.makedirs(persist_directory, exist_ok=True)
 
     # Get a fresh client after potential deletion
-    client = get_client()
+    collection = open_vector_store(collection_name, create=True)
 
-    # Create or get a collection
-    try:
-        # Try to get existing collection first
-        collection = client.get_collection(name=collection_name)
-        logger.debug(f"Retrieved existing collection: {collection_name}")
-    except Exception:
-        # If collection doesn't exist, create it
-        collection = client.create_collection(
-            name=collection_name,
-            metadata={
-                "hnsw:space": "cosine",
-                "hnsw:batch_size": 10000,
-            },  # Use cosine distance for semantic search
-        )
-        logger.debug(f"Created new collection: {collection_name}")
-
-    logger.debug(f"ChromaDB initialized with persistent storage at: {persist_directory}")
+    logger.debug(f"Vector store initialized with persistent storage at: {persist_directory}")
 
     return collection
 
 def get_db_collection(collection_name="publications"):
     """Get a collection from the database."""
-    from app_code.db_manager import get_collection
-    return get_collection(collection_name)
+    return open_vector_store(collection_name)
 
 def chunk_publication(
     publication: str, chunk_size: int = 1000, chunk_overlap: int = 200
@@ -74,6 +80,8 @@ def chunk_publication(
     """
     Chunk the publication into smaller documents.
     """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
@@ -83,59 +91,662 @@ def chunk_publication(
 
 def embed_documents(documents: list[str]) -> list[list[float]]:
     """
-    Embed documents using a model.
+    Embed documents using the shared embedding model.
+    """
+    with ingest_stage("embed"):
+        return get_embedding_service().embed_documents(documents)
+
+
+def embed_query(query: str) -> list[float]:
+    """
+    Embed a single query using the shared embedding model.
+    """
+    return get_embedding_service().embed_query(query)
+
+
+def make_chunk_id(publication_id: str, chunk_index: int, chunk: str) -> str:
+    """
+    Build a stable chunk id from the publication id, chunk position and chunk content.
+
+    The id only depends on the document itself, so re-ingesting the same file
+    always yields the same ids regardless of ingestion order.
+    """
+    return f"{publication_id}:{chunk_index}:{hash_text(chunk)[:16]}"
+
+
+def parse_chunk_id(chunk_id: str) -> tuple[str, Optional[int]]:
+    """
+    Split a chunk id built by `make_chunk_id` into its publication id and chunk position.
+
+    Ids in another format are returned whole with no position.
+    """
+    parts = chunk_id.rsplit(":", 2)
+    if len(parts) == 3 and parts[1].isdigit():
+        return parts[0], int(parts[1])
+    return chunk_id, None
+
+
+@dataclass
+class IngestStats:
+    """Counters and throughput of an ingestion run."""
+
+    documents: int = 0
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.documents / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def load_ingestion_config() -> dict:
+    """
+    Load the `ingestion` section of the app config.
     """
-    device = (
-        "cuda"
-        if torch.cuda.is_available()
-        else "mps" if torch.backends.mps.is_available() else "cpu"
+    return load_yaml_config(APP_CONFIG_FPATH).get("ingestion") or {}
+
+
+def read_publications(
+    publication_ids: Iterable[str], publication_dir: str = DATA_DIR
+) -> Iterator[tuple[str, str]]:
+    """
+    Reader stage: lazily yield (publication id, text) one file at a time.
+    """
+    for publication_id in publication_ids:
+        yield publication_id, load_publication(publication_id, publication_dir)
+
+
+def chunk_publications(
+    publications: Iterable[tuple[str, str]],
+    chunk_ids: Optional[dict[str, list[str]]] = None,
+    stats: Optional[IngestStats] = None,
+) -> Iterator[tuple[str, str, dict]]:
+    """
+    Chunker stage: yield (chunk id, chunk text, metadata) for each publication.
+
+    Args:
+        publications: (publication id, text) pairs
+        chunk_ids: Optional dict filled with the chunk ids produced per publication
+        stats: Optional stats whose document counter is updated
+    """
+    for publication_id, publication in publications:
+        ids = []
+        with ingest_stage("chunk"):
+            chunks = chunk_publication(publication)
+        for i, chunk in enumerate(chunks):
+            chunk_id = make_chunk_id(publication_id, i, chunk)
+            ids.append(chunk_id)
+            yield chunk_id, chunk, {"source": publication_id, "chunk_index": i}
+        if chunk_ids is not None:
+            chunk_ids[publication_id] = ids
+        if stats is not None:
+            stats.documents += 1
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """
+    Group an iterable into lists of at most `batch_size` items.
+    """
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+_END_OF_STREAM = object()
+
+
+def _put(q: queue.Queue, item, stop_event: threading.Event) -> bool:
+    """Put an item on a bounded queue, giving up if the pipeline is stopping."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(q: queue.Queue, stop_event: threading.Event) -> Iterator:
+    """Yield items from a queue until the end-of-stream marker or a stop."""
+    while not stop_event.is_set():
+        try:
+            item = q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is _END_OF_STREAM:
+            return
+        yield item
+
+
+def _run_stage(target, out_queue: queue.Queue, stop_event: threading.Event, errors: list):
+    """Run a pipeline stage in a thread, recording failures and closing its output."""
+    try:
+        target()
+    except BaseException as e:  # Surface the failure to the writer thread
+        errors.append(e)
+        stop_event.set()
+    finally:
+        _put(out_queue, _END_OF_STREAM, stop_event)
+
+
+class ChunkWriter:
+    """
+    Single writer that buffers embedded chunks and upserts them to the vector store in bulk.
+    """
+
+    def __init__(self, collection: VectorStore, write_batch_size: int, stats: IngestStats):
+        self.collection = collection
+        self.write_batch_size = min(write_batch_size, collection.max_batch_size)
+        self.stats = stats
+        self.lexical_index = get_bm25_index() if hybrid_search_enabled() else None
+        self._reset()
+
+    def _reset(self):
+        self.ids, self.documents, self.metadatas, self.embeddings = [], [], [], []
+
+    def add(self, chunks: list[tuple[str, str, dict]], embeddings) -> None:
+        """Buffer (chunk id, text, metadata) triples with their embeddings, flushing full batches."""
+        for (chunk_id, chunk, metadata), embedding in zip(chunks, embeddings):
+            self.ids.append(chunk_id)
+            self.documents.append(chunk)
+            self.metadatas.append(metadata)
+            self.embeddings.append(embedding)
+            if len(self.ids) >= self.write_batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Upsert everything buffered so far."""
+        if not self.ids:
+            return
+        with ingest_stage("write"):
+            self.collection.upsert(
+                ids=self.ids,
+                documents=self.documents,
+                metadatas=self.metadatas,
+                embeddings=np.array(self.embeddings, dtype=np.float32),
+            )
+        if self.lexical_index is not None:
+            with ingest_stage("lexical_index"):
+                self.lexical_index.add(self.ids, self.documents)
+        self.stats.chunks += len(self.ids)
+        self._reset()
+        mark_collection_changed()
+
+
+def log_ingest_stats(stats: IngestStats) -> None:
+    """Log the throughput of an ingestion run."""
+    logger.info(
+        f"Ingested {stats.documents} documents / {stats.chunks} chunks in "
+        f"{stats.elapsed_seconds:.2f}s ({stats.docs_per_sec:.1f} docs/sec, "
+        f"{stats.chunks_per_sec:.1f} chunks/sec)."
     )
-    model = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={"device": device},
+
+
+def run_ingest_pipeline(
+    collection: VectorStore,
+    publications: Iterable[tuple[str, str]],
+    embed_batch_size: Optional[int] = None,
+    write_batch_size: Optional[int] = None,
+    queue_size: Optional[int] = None,
+) -> tuple[dict[str, list[str]], IngestStats]:
+    """
+    Stream publications through the chunk, embed and write stages.
+
+    The chunker and embedder each run in their own thread and hand work on through
+    bounded queues, so embedding of batch N+1 overlaps with writing batch N and at
+    most `queue_size` batches are held in memory per stage, regardless of corpus size.
+
+    Args:
+        collection (VectorStore): The collection to upsert chunks into
+        publications: (publication id, text) pairs, typically from `read_publications`
+        embed_batch_size (int): Chunks per embedding call. Defaults to `ingestion.embed_batch_size`
+        write_batch_size (int): Chunks per vector store upsert. Defaults to `ingestion.write_batch_size`
+        queue_size (int): Batches buffered between stages. Defaults to `ingestion.queue_size`
+
+    Returns:
+        tuple: The chunk ids written per publication id, and the run's IngestStats
+    """
+    ingestion_config = load_ingestion_config()
+    embed_batch_size = embed_batch_size or ingestion_config.get("embed_batch_size", 256)
+    write_batch_size = write_batch_size or ingestion_config.get("write_batch_size", 4096)
+    queue_size = queue_size or ingestion_config.get("queue_size", 4)
+
+    chunk_ids = {}
+    stats = IngestStats()
+    stop_event = threading.Event()
+    errors = []
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    embedded_queue = queue.Queue(maxsize=queue_size)
+
+    def chunk_stage():
+        chunks = chunk_publications(publications, chunk_ids=chunk_ids, stats=stats)
+        for batch in batched(chunks, embed_batch_size):
+            if not _put(chunk_queue, batch, stop_event):
+                return
+
+    def embed_stage():
+        for batch in _drain(chunk_queue, stop_event):
+            embeddings = embed_documents([chunk for _, chunk, _ in batch])
+            if not _put(embedded_queue, (batch, embeddings), stop_event):
+                return
+
+    threads = [
+        threading.Thread(
+            target=_run_stage,
+            args=(stage, out_queue, stop_event, errors),
+            name=f"ingest-{stage.__name__}",
+            daemon=True,
+        )
+        for stage, out_queue in ((chunk_stage, chunk_queue), (embed_stage, embedded_queue))
+    ]
+
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    # Writer stage: the calling thread is the only one touching the collection
+    writer = ChunkWriter(collection, write_batch_size, stats)
+    try:
+        for batch, embeddings in _drain(embedded_queue, stop_event):
+            writer.add(batch, embeddings)
+        if not errors:
+            writer.flush()
+    except BaseException:
+        stop_event.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+    stats.elapsed_seconds = time.perf_counter() - start_time
+    log_ingest_stats(stats)
+    return chunk_ids, stats
+
+
+def _init_ingest_worker(torch_threads: int) -> None:
+    """
+    Process pool initializer: set the worker's torch thread budget and load its model once.
+    """
+    import torch
+
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    torch.set_num_threads(torch_threads)
+    get_embedding_service()
+
+
+def _chunk_and_embed(
+    publications: list[tuple[str, str]],
+) -> tuple[dict[str, list[str]], list[tuple[str, str, dict]], np.ndarray]:
+    """
+    Process pool task: chunk and embed a group of publications.
+
+    Returns:
+        tuple: Chunk ids per publication, the (chunk id, text, metadata) triples and their embeddings
+    """
+    chunk_ids = {}
+    chunks = list(chunk_publications(publications, chunk_ids=chunk_ids))
+    embeddings = embed_documents([chunk for _, chunk, _ in chunks])
+    return chunk_ids, chunks, np.array(embeddings, dtype=np.float32)
+
+
+def run_parallel_ingest_pipeline(
+    collection: VectorStore,
+    publications: Iterable[tuple[str, str]],
+    workers: Optional[int] = None,
+    torch_threads: Optional[int] = None,
+    publications_per_task: Optional[int] = None,
+    write_batch_size: Optional[int] = None,
+) -> tuple[dict[str, list[str]], IngestStats]:
+    """
+    Chunk and embed publications across a process pool, writing from a single writer.
+
+    Each worker loads the embedding model once and gets its own torch thread budget.
+    Only the calling process touches the vector store. Chunk ids do not
+    depend on processing order, so the resulting collection is identical to a serial run.
+
+    Args:
+        collection (VectorStore): The collection to upsert chunks into
+        publications: (publication id, text) pairs, typically from `read_publications`
+        workers (int): Number of worker processes. Defaults to `ingestion.parallel_workers`
+        torch_threads (int): Torch threads per worker. Defaults to the CPU count split across workers
+        publications_per_task (int): Publications sent to a worker per task
+        write_batch_size (int): Chunks per vector store upsert
+
+    Returns:
+        tuple: The chunk ids written per publication id, and the run's IngestStats
+    """
+    ingestion_config = load_ingestion_config()
+    workers = workers or ingestion_config.get("parallel_workers") or os.cpu_count() or 1
+    torch_threads = (
+        torch_threads
+        or ingestion_config.get("torch_threads_per_worker")
+        or max(1, (os.cpu_count() or 1) // workers)
     )
+    publications_per_task = publications_per_task or ingestion_config.get("publications_per_task", 8)
+    write_batch_size = write_batch_size or ingestion_config.get("write_batch_size", 4096)
+
+    chunk_ids = {}
+    stats = IngestStats()
+    writer = ChunkWriter(collection, write_batch_size, stats)
+    # Bound the number of in-flight tasks so memory stays flat on large corpora
+    max_in_flight = workers * 2
+    tasks = batched(publications, publications_per_task)
+
+    start_time = time.perf_counter()
+    # Spawn rather than fork: the parent already holds torch and Chroma threads
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_ingest_worker,
+        initargs=(torch_threads,),
+    ) as executor:
+        in_flight = set()
+        try:
+            while True:
+                for task in islice(tasks, max_in_flight - len(in_flight)):
+                    in_flight.add(executor.submit(_chunk_and_embed, task))
+                if not in_flight:
+                    break
+                with ingest_stage("wait_for_workers"):
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_chunk_ids, chunks, embeddings = future.result()
+                    chunk_ids.update(task_chunk_ids)
+                    stats.documents += len(task_chunk_ids)
+                    writer.add(chunks, embeddings)
+            writer.flush()
+        except BaseException:
+            for future in in_flight:
+                future.cancel()
+            raise
 
-    embeddings = model.embed_documents(documents)
-    return embeddings
+    stats.elapsed_seconds = time.perf_counter() - start_time
+    logger.info(f"Parallel ingestion used {workers} workers x {torch_threads} torch threads.")
+    log_ingest_stats(stats)
+    return chunk_ids, stats
 
 
-def insert_publications(collection: chromadb.Collection, publications: list[str]):
+def ingest_publications(
+    collection: VectorStore,
+    publications: Iterable[tuple[str, str]],
+    parallel: Optional[bool] = None,
+) -> tuple[dict[str, list[str]], IngestStats]:
     """
-    Insert documents into a ChromaDB collection.
+    Ingest (publication id, text) pairs with the serial or parallel pipeline.
 
     Args:
-        collection (chromadb.Collection): The collection to insert documents into
-        documents (list[str]): The documents to insert
+        collection (VectorStore): The collection to upsert chunks into
+        publications: (publication id, text) pairs
+        parallel (bool): Use the process pool. Defaults to `ingestion.parallel_workers` > 1
 
     Returns:
-        None
-    """
-    next_id = collection.count()
-
-    for publication in publications:
-        chunked_publication = chunk_publication(publication)
-        embeddings = embed_documents(chunked_publication)
-        embeddings = np.array(embeddings, dtype=np.float32)  # Convert to NumPy array
-        ids = list(range(next_id, next_id + len(chunked_publication)))
-        ids = [f"document_{id}" for id in ids]
-        collection.add(
-            embeddings=embeddings,
-            ids=ids,
-            documents=chunked_publication,
-        )
-        next_id += len(chunked_publication)
+        tuple: The chunk ids written per publication id, and the run's IngestStats
+    """
+    if parallel is None:
+        parallel = (load_ingestion_config().get("parallel_workers") or 0) > 1
+    if parallel:
+        return run_parallel_ingest_pipeline(collection, publications)
+    return run_ingest_pipeline(collection, publications)
+
+
+def insert_publications(
+    collection: VectorStore,
+    publications: list[str],
+    publication_ids: Optional[list[str]] = None,
+) -> dict[str, list[str]]:
+    """
+    Insert documents into the vector store.
+
+    Args:
+        collection (VectorStore): The collection to insert documents into
+        publications (list[str]): The publication texts to insert
+        publication_ids (list[str]): Ids of the publications. Defaults to a hash of each publication's content
+
+    Returns:
+        dict[str, list[str]]: The chunk ids written for each publication id
+    """
+    if publication_ids is None:
+        publication_ids = [hash_text(publication) for publication in publications]
+
+    chunk_ids, _ = ingest_publications(collection, zip(publication_ids, publications))
+    return chunk_ids
+
+
+def load_manifest(manifest_path: str = INGEST_MANIFEST_FPATH) -> dict:
+    """
+    Load the ingestion manifest, or return an empty one if it does not exist.
+    """
+    if not os.path.exists(manifest_path):
+        return {"embedding_model": None, "files": {}}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable ingest manifest at {manifest_path}: {e}")
+        return {"embedding_model": None, "files": {}}
+    manifest.setdefault("files", {})
+    return manifest
+
+
+def save_manifest(manifest: dict, manifest_path: str = INGEST_MANIFEST_FPATH) -> None:
+    """
+    Atomically write the ingestion manifest to disk.
+    """
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def hybrid_search_enabled() -> bool:
+    """
+    Whether the BM25 index used by hybrid search should be maintained.
+    """
+    return load_hybrid_search_config().get("enabled", True)
+
+
+def rebuild_lexical_index(collection: VectorStore, batch_size: int = 4096) -> None:
+    """
+    Rebuild the BM25 index from the chunks stored in the collection.
+    """
+    lexical_index = get_bm25_index()
+    lexical_index.clear()
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        batch = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        lexical_index.add(batch["ids"], batch["documents"])
+    logger.info(f"Rebuilt BM25 index over {len(lexical_index)} chunks.")
+
+
+def delete_chunks(collection: VectorStore, chunk_ids: list[str]) -> None:
+    """
+    Delete chunks from the collection by id.
+    """
+    if chunk_ids:
+        with ingest_stage("delete"):
+            collection.delete(ids=chunk_ids)
+            if hybrid_search_enabled():
+                get_bm25_index().remove(chunk_ids)
+        mark_collection_changed()
+
+
+def sync_publications(
+    collection: VectorStore,
+    publication_dir: str = DATA_DIR,
+    manifest_path: str = INGEST_MANIFEST_FPATH,
+    publications: Optional[Iterable[tuple[str, str]]] = None,
+    source: Optional[str] = None,
+    complete: bool = True,
+) -> dict[str, int]:
+    """
+    Incrementally sync the collection with a publication source.
+
+    Only new or changed publications (by content hash) are chunked and embedded,
+    chunks of publications removed from the source are deleted and unchanged
+    publications are left alone. The source is read in a single streaming pass.
+
+    Each publication is tracked with the source it was last read from, so syncing
+    one source (e.g. the data directory) never deletes what another one (e.g. a
+    JSON dump) ingested, and removals are only applied after a complete pass.
+
+    Args:
+        collection (VectorStore): The collection to sync
+        publication_dir (str): Directory containing the publication markdown files
+        manifest_path (str): Path to the manifest tracking publication hashes and chunk ids
+        publications: (publication id, text) pairs to sync instead of the markdown files
+            in `publication_dir`, e.g. from `iter_json_publications`
+        source (str): Path `publications` are read from. Defaults to `publication_dir`
+        complete (bool): Whether `publications` is the whole source rather than a slice of
+            it; publications of the source that were not read are only deleted if so
+
+    Returns:
+        dict[str, int]: Number of added, updated, removed and unchanged publications
+    """
+    manifest = load_manifest(manifest_path)
+    embedding_model = get_embedding_service().model_name
+    tracked_files = manifest["files"]
+
+    if tracked_files and (
+        manifest.get("embedding_model") != embedding_model or collection.count() == 0
+    ):
+        logger.info("Ingest manifest is out of date with the collection, re-embedding all files.")
+        for entry in tracked_files.values():
+            delete_chunks(collection, entry.get("chunk_ids", []))
+        tracked_files = {}
+    elif not tracked_files and collection.count() > 0:
+        # Collection was built without a manifest (e.g. by an older version), so
+        # its chunk ids cannot be matched to files
+        logger.info("Collection has untracked chunks, re-embedding all files.")
+        delete_chunks(collection, collection.get(include=[])["ids"])
+
+    if publications is None:
+        publications = read_publications(list_publication_ids(publication_dir), publication_dir)
+        source = publication_dir
+    source = os.path.abspath(source or publication_dir)
+
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    seen_ids = set()
+    content_hashes = {}
+
+    def read_changed():
+        for publication_id, publication in publications:
+            seen_ids.add(publication_id)
+            content_hash = hash_text(publication)
+            entry = tracked_files.get(publication_id)
+            if entry and entry.get("hash") == content_hash:
+                entry["source"] = source
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if entry else "added"] += 1
+            content_hashes[publication_id] = content_hash
+            yield publication_id, publication
+
+    chunk_ids, _ = ingest_publications(collection, read_changed())
+
+    # Stale chunks are deleted only after the new ones are written, since a chunk
+    # that did not change keeps its id
+    for publication_id, new_chunk_ids in chunk_ids.items():
+        old_chunk_ids = tracked_files.get(publication_id, {}).get("chunk_ids", [])
+        delete_chunks(collection, sorted(set(old_chunk_ids) - set(new_chunk_ids)))
+        tracked_files[publication_id] = {
+            "hash": content_hashes[publication_id],
+            "chunk_ids": new_chunk_ids,
+            "source": source,
+        }
+
+    # A publication missing from a slice of the source may just not have been read
+    removed_ids = [
+        publication_id
+        for publication_id, entry in tracked_files.items()
+        if complete and publication_id not in seen_ids and entry.get("source") == source
+    ]
+    for publication_id in removed_ids:
+        delete_chunks(collection, tracked_files.pop(publication_id).get("chunk_ids", []))
+        stats["removed"] += 1
+
+    # Publish the writes before the manifest refers to them
+    with ingest_stage("persist"):
+        collection.persist()
+    manifest = {"embedding_model": embedding_model, "files": tracked_files}
+    with ingest_stage("save_manifest"):
+        save_manifest(manifest, manifest_path)
+
+    changed = stats["added"] or stats["updated"] or stats["removed"]
+    if hybrid_search_enabled():
+        # The index commits its own updates; it only needs rebuilding when it is missing
+        # or was built while hybrid search was disabled
+        if len(get_bm25_index()) != collection.count():
+            with ingest_stage("rebuild_lexical_index"):
+                rebuild_lexical_index(collection)
+            changed = True
+    if changed:
+        # Let other processes serving queries drop their cached results
+        mark_collection_changed(persist=True)
+
+    logger.info(
+        f"Ingestion sync: {stats['added']} added, {stats['updated']} updated, "
+        f"{stats['removed']} removed, {stats['unchanged']} unchanged."
+    )
+    return stats
+
+
+def main(
+    incremental: Optional[bool] = None,
+    json_path: Optional[str] = None,
+    num_entries_to_process: Optional[int] = None,
+):
+    """
+    Ingest the data directory, or a JSON publication dump, into the vector database.
+
+    Args:
+        incremental (bool): Sync only changed publications instead of rebuilding the database.
+            Defaults to `ingestion.incremental` in config.yaml
+        json_path (str): Stream publications straight from this JSON file instead of the
+            markdown files in the data directory
+        num_entries_to_process (int): Maximum number of JSON entries to ingest. Defaults to all
+    """
+    ingestion_config = load_ingestion_config()
+    if incremental is None:
+        incremental = ingestion_config.get("incremental", True)
 
-def main():
     collection = initialize_db(
         persist_directory=VECTOR_DB_DIR,
         collection_name="publications",
-        delete_existing=True,
+        delete_existing=not incremental,
+    )
+
+    publications = None
+    if json_path:
+        markdown_dir = DATA_DIR if ingestion_config.get("export_markdown", False) else None
+        publications = iter_json_publications(
+            json_path,
+            num_entries_to_process=num_entries_to_process,
+            markdown_dir=markdown_dir,
+        )
+    # A slice of the JSON entries adds and updates publications without removing the rest
+    sync_publications(
+        collection, publications=publications, source=json_path, complete=num_entries_to_process is None
     )
-    publications = load_all_publications()
-    insert_publications(collection, publications)
+    log_stage_summary(INGEST_STAGE_SECONDS)
 
     logger.debug(f"Total documents in collection: {collection.count()}")
+    if isinstance(collection, FlatVectorStore) and collection.quantization:
+        report = quantization_report(collection)
+        if report:
+            logger.info(
+                f"{report['quantization']} index: recall@5 {report['recall@5']:.3f} vs float32, "
+                f"{report['scan_bytes_per_chunk']} bytes/chunk scanned "
+                f"(float32: {report['float32_bytes_per_chunk']})."
+            )
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,54 +1,291 @@
 import os
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
 from adapters.llm_client_adapter import LLMClientAdapter
 from app_code.utils import load_yaml_config
-from app_code.prompt_builder import build_prompt_from_config
-from app_code.chroma_db_ingest import get_db_collection, embed_documents
+from app_code.prompt_builder import get_compiled_prompt
+from app_code.chroma_db_ingest import get_db_collection, embed_query
+from app_code.context_packing import chunk_blocks, format_context, load_context_packing_config, pack_context
+from app_code.embedding_service import get_embedding_service, warm_up as warm_up_embeddings
+from app_code.retrieval_cache import (
+    get_query_embedding,
+    get_query_embeddings,
+    results_cache_key,
+    get_cached_results,
+    cache_results,
+    get_cache_stats,
+)
+from app_code.micro_batching import MicroBatcher
+from app_code.bm25_index import get_bm25_index, load_hybrid_search_config, reciprocal_rank_fusion
+from app_code.reranker import Reranker, get_reranker, load_rerank_config
+from app_code.response_cache import get_response_cache
+from app_code.conversation_memory import ConversationMemory, create_memory
+from app_code.telemetry import (
+    metrics,
+    query_stage,
+    query_trace,
+    record_stage,
+    record_llm_tokens,
+    record_prompt_prefix,
+    log_stage_summary,
+)
 from app_code.initialize_llm import main as initialize_llm
 from app_code.logger import logger
-from app_code.db_manager import get_collection
-from paths import APP_CONFIG_FPATH, PROMPT_CONFIG_FPATH, OUTPUTS_DIR
+from app_code.vector_store import open_vector_store
+from paths import APP_CONFIG_FPATH, PROMPT_CONFIG_FPATH, OUTPUTS_DIR, METRICS_FPATH
 
 # To avoid tokenizer parallelism warning from huggingface
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-# collection = get_db_collection(collection_name="publications")
-collection = get_collection(collection_name="publications")
+# Opened on first use rather than at import, so importing this module stays cheap
+collection = None
+_collection_lock = threading.Lock()
 
-def retrieve_relevant_documents(
+def get_rag_collection():
+    """Get the publications vector store, opening it on first use and retrying until it exists."""
+    global collection
+    if collection is None:
+        with _collection_lock:
+            if collection is None:
+                collection = open_vector_store(collection_name="publications")
+    return collection
+
+_embedding_batcher = None
+_query_batcher = None
+_batchers_loaded = False
+_batchers_lock = threading.Lock()
+_hybrid_search_config = None
+_rerank_config = None
+_context_packing_config = None
+_lexical_executor = None
+
+
+def _query_collection_batch(items: list[tuple[list[float], int]]) -> list[dict]:
+    """
+    Run one vector store query for a group of (query embedding, n_results) items.
+
+    The group is queried with the largest n_results and each item's results are
+    cut back to its own n_results.
+    """
+    collection = get_rag_collection()
+    if collection is None:
+        return [None] * len(items)
+    results = collection.query(
+        query_embeddings=[embedding for embedding, _ in items],
+        n_results=max(n_results for _, n_results in items),
+        include=["documents", "distances"],
+    )
+    return [
+        {
+            key: [results[key][i][:n_results]]
+            for key in ("ids", "documents", "distances")
+        }
+        for i, (_, n_results) in enumerate(items)
+    ]
+
+
+def get_batchers() -> tuple[Optional[MicroBatcher], Optional[MicroBatcher]]:
+    """Get the query embedding and collection query micro-batchers, or (None, None) if disabled."""
+    global _embedding_batcher, _query_batcher, _batchers_loaded
+    if not _batchers_loaded:
+        with _batchers_lock:
+            if not _batchers_loaded:
+                config = load_yaml_config(APP_CONFIG_FPATH).get("micro_batching") or {}
+                if config.get("enabled", False):
+                    batch_kwargs = {
+                        "max_batch_size": config.get("max_batch_size", 32),
+                        "max_wait_ms": config.get("max_wait_ms", 5),
+                    }
+                    _query_batcher = MicroBatcher(
+                        _query_collection_batch, name="query-batcher", **batch_kwargs
+                    )
+                    _embedding_batcher = MicroBatcher(
+                        lambda queries: get_embedding_service().embed_documents(queries),
+                        name="embedding-batcher",
+                        **batch_kwargs,
+                    )
+                _batchers_loaded = True
+    return _embedding_batcher, _query_batcher
+
+
+def get_batcher_stats() -> dict:
+    """Return batch size and queueing delay metrics of the micro-batchers."""
+    embedding_batcher, query_batcher = get_batchers()
+    if embedding_batcher is None:
+        return {}
+    return {
+        "embedding": embedding_batcher.metrics.stats(),
+        "query": query_batcher.metrics.stats(),
+    }
+
+
+def collect_cache_metrics() -> dict[str, float]:
+    """Cache hit ratios and micro-batcher sizes, exported as gauges with the query metrics."""
+    gauges = {}
+    caches = dict(get_cache_stats())
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        caches["llm_response"] = response_cache.stats()
+    for cache_name, stats in caches.items():
+        gauges[f"rag_{cache_name}_cache_hits"] = stats["hits"]
+        gauges[f"rag_{cache_name}_cache_misses"] = stats["misses"]
+        gauges[f"rag_{cache_name}_cache_hit_ratio"] = stats["hit_ratio"]
+        gauges[f"rag_{cache_name}_cache_entries"] = stats["entries"]
+    for batcher_name, stats in get_batcher_stats().items():
+        gauges[f"rag_{batcher_name}_batcher_mean_batch_size"] = stats["mean_batch_size"]
+    return gauges
+
+
+metrics.register_collector(collect_cache_metrics)
+
+
+def embed_query_batched(query: str) -> list[float]:
+    """Embed a query, sharing a forward pass with concurrent queries when micro-batching is enabled."""
+    embedding_batcher, _ = get_batchers()
+    if embedding_batcher is None:
+        return embed_query(query)
+    return embedding_batcher(query)
+
+
+def query_collection(query_embedding: list[float], n_results: int) -> Optional[dict]:
+    """Query the collection for one embedding, batched with concurrent queries when enabled."""
+    _, query_batcher = get_batchers()
+    if query_batcher is not None:
+        return query_batcher((query_embedding, n_results))
+    collection = get_rag_collection()
+    if collection is None:
+        return None
+    return collection.query(
+        query_embeddings=[query_embedding],
+        n_results=n_results,
+        include=["documents", "distances"],
+    )
+
+def get_hybrid_search_config() -> dict:
+    """Get the `hybrid_search` config, loaded once per process."""
+    global _hybrid_search_config
+    if _hybrid_search_config is None:
+        _hybrid_search_config = load_hybrid_search_config()
+    return _hybrid_search_config
+
+
+def get_rerank_config() -> dict:
+    """Get the `vectordb.rerank` config, loaded once per process."""
+    global _rerank_config
+    if _rerank_config is None:
+        _rerank_config = load_rerank_config()
+    return _rerank_config
+
+
+def get_context_packing_config() -> dict:
+    """Get the `context_packing` config, loaded once per process."""
+    global _context_packing_config
+    if _context_packing_config is None:
+        _context_packing_config = load_context_packing_config()
+    return _context_packing_config
+
+
+def retrieval_params(vectordb_config: dict) -> dict:
+    """Pick the per-query retrieval arguments out of the `vectordb` config."""
+    return {
+        key: vectordb_config[key]
+        for key in ("n_results", "threshold")
+        if key in vectordb_config
+    }
+
+
+def get_lexical_executor() -> ThreadPoolExecutor:
+    """Get the thread pool running BM25 lookups alongside vector search."""
+    global _lexical_executor
+    if _lexical_executor is None:
+        with _batchers_lock:
+            if _lexical_executor is None:
+                _lexical_executor = ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="lexical-search"
+                )
+    return _lexical_executor
+
+
+def lexical_search(query: str, n_candidates: int) -> list[tuple[str, float]]:
+    """Run the BM25 lookup of a query, timed as its own stage."""
+    with query_stage("lexical_search"):
+        return get_bm25_index().search(query, n_candidates)
+
+
+def fuse_with_lexical_results(
+    relevant_results: dict,
+    lexical_hits: list[tuple[str, float]],
+    n_results: int,
+    rrf_k: int = 60,
+) -> tuple[list[str], list[str]]:
+    """
+    Merge thresholded vector hits with BM25 hits by reciprocal rank fusion.
+
+    Returns:
+        tuple: The ids and documents of the top `n_results` fused hits
+    """
+    lexical_ids = [chunk_id for chunk_id, _ in lexical_hits]
+    fused = reciprocal_rank_fusion([relevant_results["ids"], lexical_ids], k=rrf_k)[:n_results]
+
+    documents_by_id = dict(zip(relevant_results["ids"], relevant_results["documents"]))
+    missing_ids = [chunk_id for chunk_id, _ in fused if chunk_id not in documents_by_id]
+    if missing_ids:
+        lexical_only = get_rag_collection().get(ids=missing_ids, include=["documents"])
+        documents_by_id.update(zip(lexical_only["ids"], lexical_only["documents"]))
+
+    fused_ids = [chunk_id for chunk_id, _ in fused if chunk_id in documents_by_id]
+    return fused_ids, [documents_by_id[chunk_id] for chunk_id in fused_ids]
+
+
+def retrieval_plan(n_results: int) -> tuple[dict, Optional[Reranker], int, int]:
+    """
+    Work out how many candidates to retrieve for `n_results` chunks.
+
+    Returns:
+        tuple: The `hybrid_search` config, the reranker (or None), the number of
+        candidates to retrieve and the number of chunks to keep after reranking
+    """
+    hybrid_config = get_hybrid_search_config()
+    reranker = get_reranker()
+    top_k = n_results
+    if reranker is not None:
+        rerank_config = get_rerank_config()
+        top_k = min(n_results, rerank_config.get("top_k") or n_results)
+        n_results = max(n_results, rerank_config.get("candidate_pool", 20))
+    return hybrid_config, reranker, n_results, top_k
+
+
+def select_relevant_chunks(
     query: str,
-    n_results: int = 5,
-    threshold: float = 0.3,
-) -> list[str]:
+    results: Optional[dict],
+    lexical_hits: list[tuple[str, float]],
+    n_results: int,
+    top_k: int,
+    threshold: float,
+    hybrid_config: dict,
+    reranker: Optional[Reranker],
+) -> Optional[list[tuple[str, str]]]:
     """
-    Query the ChromaDB database with a string query.
+    Turn the vector store results (and BM25 hits) of a query into its relevant chunks.
 
-    Args:
-        query (str): The search query string
-        n_results (int): Number of results to return (default: 5)
-        threshold (float): Threshold for the cosine similarity score (default: 0.3)
+    The vector hits are filtered by the distance threshold, fused with the BM25 hits
+    when hybrid search is enabled and reranked when a reranker is configured. BM25
+    hits below `hybrid_search.min_bm25_score` are dropped, and when no vector hit
+    passes the threshold only BM25 hits above `hybrid_search.lexical_only_min_score`
+    are kept (none if it is null), so keyword matches alone do not become the context.
 
     Returns:
-        dict: Query results containing ids, documents, distances, and metadata
+        Optional[list[tuple[str, str]]]: The (chunk id, document) pairs of the relevant chunks, best first,
+        or None if neither retriever found anything
     """
-    logger.debug(f"Retrieving relevant documents for query: {query}")
     relevant_results = {
         "ids": [],
         "documents": [],
         "distances": [],
     }
-    # Embed the query using the same model used for documents
-    logger.debug("Embedding query...")
-    query_embedding = embed_documents([query])[0]  # Get the first (and only) embedding
-
-    logger.info("Querying collection...")
-    # Query the collection
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=n_results,
-        include=["documents", "distances"],
-    )
-
     if (
         results is None or
         results.get("ids") is None or
@@ -58,43 +295,232 @@ def retrieve_relevant_documents(
         not results["documents"] or
         not results["distances"]
     ):
-        logger.warning("No results found.")
-        return []
+        if not lexical_hits:
+            logger.warning("No results found.")
+            return None
+        results = {"ids": [[]], "documents": [[]], "distances": [[]]}
 
     logger.debug("Filtering results...")
-    keep_item = [False] * len(results["ids"][0])
-    for i, distance in enumerate(results["distances"][0]):
-        if distance < threshold:
-            keep_item[i] = True
+    with query_stage("threshold_filter"):
+        keep_item = [False] * len(results["ids"][0])
+        for i, distance in enumerate(results["distances"][0]):
+            if distance < threshold:
+                keep_item[i] = True
 
-    for i, keep in enumerate(keep_item):
-        if keep:
-            relevant_results["ids"].append(results["ids"][0][i])
-            relevant_results["documents"].append(results["documents"][0][i])
-            relevant_results["distances"].append(results["distances"][0][i])
+        for i, keep in enumerate(keep_item):
+            if keep:
+                relevant_results["ids"].append(results["ids"][0][i])
+                relevant_results["documents"].append(results["documents"][0][i])
+                relevant_results["distances"].append(results["distances"][0][i])
 
-    return relevant_results["documents"]
+    if hybrid_config.get("enabled", True):
+        min_score = hybrid_config.get("min_bm25_score", 0.0)
+        if not relevant_results["ids"]:
+            lexical_only_min_score = hybrid_config.get("lexical_only_min_score")
+            min_score = float("inf") if lexical_only_min_score is None else max(min_score, lexical_only_min_score)
+        lexical_hits = [(chunk_id, score) for chunk_id, score in lexical_hits if score >= min_score]
+        with query_stage("fusion"):
+            ids, documents = fuse_with_lexical_results(
+                relevant_results, lexical_hits, n_results, hybrid_config.get("rrf_k", 60)
+            )
+    else:
+        ids, documents = relevant_results["ids"], relevant_results["documents"]
 
-def respond_to_query(
-    prompt_config: dict,
+    if reranker is not None:
+        logger.debug(f"Reranking {len(ids)} candidates...")
+        with query_stage("rerank"):
+            ids, documents = reranker.rerank(query, ids, documents, top_k)
+
+    return list(zip(ids, documents))
+
+
+def retrieve_relevant_chunks(
     query: str,
-    llm: LLMClientAdapter,
     n_results: int = 5,
     threshold: float = 0.3,
-) -> str:
+) -> list[tuple[str, str]]:
     """
-    Respond to a query using the ChromaDB database.
+    Query the ChromaDB database with a string query.
+
+    When hybrid search is enabled, a BM25 lookup runs in parallel with the vector
+    search and both rankings are merged by reciprocal rank fusion. When reranking
+    is enabled, a larger candidate pool is retrieved and a cross-encoder keeps the
+    best `vectordb.rerank.top_k` chunks.
+
+    Args:
+        query (str): The search query string
+        n_results (int): Number of results to return (default: 5)
+        threshold (float): Threshold for the cosine similarity score (default: 0.3)
+
+    Returns:
+        list[tuple[str, str]]: The (chunk id, document) pairs of the relevant chunks, best first
     """
+    logger.debug(f"Retrieving relevant documents for query: {query}")
+    # Embed the query using the same model used for documents
+    logger.debug("Embedding query...")
+    with query_stage("embed_query"):
+        query_embedding = get_query_embedding(
+            query, embed_query_batched, model_key=get_embedding_service().model_name
+        )
 
-    relevant_documents = retrieve_relevant_documents(
-        query, n_results=n_results, threshold=threshold
+    hybrid_config, reranker, n_results, top_k = retrieval_plan(n_results)
+    hybrid = hybrid_config.get("enabled", True)
+    cache_key = results_cache_key(query_embedding, n_results, threshold, hybrid, top_k)
+    cached_chunks = get_cached_results(cache_key)
+    if cached_chunks is not None:
+        logger.info("Using cached retrieval results.")
+        return list(cached_chunks)
+
+    logger.info("Querying collection...")
+    # Query the collection
+    lexical_hits = []
+    if hybrid:
+        # Over-fetch from both retrievers so fusion has candidates to choose from
+        n_candidates = max(n_results, hybrid_config.get("n_candidates", 20))
+        lexical_future = get_lexical_executor().submit(lexical_search, query, n_candidates)
+        with query_stage("vector_query"):
+            results = query_collection(query_embedding, n_candidates)
+        with query_stage("lexical_wait"):
+            lexical_hits = lexical_future.result()
+    else:
+        with query_stage("vector_query"):
+            results = query_collection(query_embedding, n_results)
+
+    chunks = select_relevant_chunks(
+        query, results, lexical_hits, n_results, top_k, threshold, hybrid_config, reranker
     )
+    if chunks is None:
+        return []
+    cache_results(cache_key, tuple(chunks))
+    return chunks
+
+
+def retrieve_relevant_chunks_batch(
+    queries: list[str],
+    n_results: int = 5,
+    threshold: float = 0.3,
+) -> list[list[tuple[str, str]]]:
+    """
+    Retrieve the relevant chunks of many queries at once.
+
+    The queries missing from the embedding cache are embedded in one batch and
+    the queries missing from the results cache are sent to the vector store in
+    one query, then each query's hits are filtered, fused and reranked as in
+    `retrieve_relevant_chunks`.
+
+    Args:
+        queries (list[str]): The search query strings
+        n_results (int): Number of results to return per query (default: 5)
+        threshold (float): Threshold for the cosine similarity score (default: 0.3)
+
+    Returns:
+        list[list[tuple[str, str]]]: The (chunk id, document) pairs of each query, best first
+    """
+    embedding_service = get_embedding_service()
+    with query_stage("embed_query"):
+        query_embeddings = get_query_embeddings(
+            queries, embedding_service.embed_documents, model_key=embedding_service.model_name
+        )
+
+    hybrid_config, reranker, n_results, top_k = retrieval_plan(n_results)
+    hybrid = hybrid_config.get("enabled", True)
+    cache_keys = [
+        results_cache_key(query_embedding, n_results, threshold, hybrid, top_k)
+        for query_embedding in query_embeddings
+    ]
+    chunks = [get_cached_results(cache_key) for cache_key in cache_keys]
+    chunks = [list(cached) if cached is not None else None for cached in chunks]
+    misses = [i for i, cached in enumerate(chunks) if cached is None]
+    if not misses:
+        return chunks
+
+    n_candidates = max(n_results, hybrid_config.get("n_candidates", 20)) if hybrid else n_results
+    lexical_futures = {}
+    if hybrid:
+        lexical_futures = {
+            i: get_lexical_executor().submit(lexical_search, queries[i], n_candidates) for i in misses
+        }
+    with query_stage("vector_query"):
+        results = _query_collection_batch([(query_embeddings[i], n_candidates) for i in misses])
+    for i, query_results in zip(misses, results):
+        with query_stage("lexical_wait"):
+            lexical_hits = lexical_futures[i].result() if hybrid else []
+        query_chunks = select_relevant_chunks(
+            queries[i], query_results, lexical_hits, n_results, top_k, threshold, hybrid_config, reranker
+        )
+        if query_chunks is not None:
+            cache_results(cache_keys[i], tuple(query_chunks))
+        chunks[i] = query_chunks or []
+    return chunks
+
+
+def retrieve_relevant_documents(
+    query: str,
+    n_results: int = 5,
+    threshold: float = 0.3,
+) -> list[str]:
+    """
+    Query the ChromaDB database with a string query, returning only the documents.
+    """
+    return [
+        document
+        for _, document in retrieve_relevant_chunks(query, n_results=n_results, threshold=threshold)
+    ]
+
+def build_context(
+    chunks: list[tuple[str, str]], model_name: Optional[str] = None
+) -> str:
+    """
+    Turn retrieved (chunk id, document) pairs into the context section of the prompt.
+
+    With `context_packing.enabled`, duplicate chunks are dropped, adjacent chunks
+    are merged and the context is cut to the model's token budget.
+    """
+    config = get_context_packing_config()
+    if config.get("enabled", True):
+        with query_stage("pack_context"):
+            blocks = pack_context(chunks, model_name=model_name, config=config)
+    else:
+        blocks = chunk_blocks(chunks)
+    return format_context(blocks)
+
+
+def build_rag_prompt(
+    prompt_config: dict,
+    query: str,
+    n_results: int = 5,
+    threshold: float = 0.3,
+    model_name: Optional[str] = None,
+    memory: Optional[ConversationMemory] = None,
+    relevant_chunks: Optional[list[tuple[str, str]]] = None,
+) -> list[tuple[str, str]]:
+    """
+    Retrieve the documents relevant to a query and build the RAG assistant prompt.
+
+    The prompt is a static system message, identical for every query so providers
+    can cache it, then the recent conversation, then a user message with the
+    conversation summary, the documents and the question.
+
+    Args:
+        model_name (str): Model the prompt is for, selecting its context token budget
+        memory (ConversationMemory): The conversation the query belongs to, if any
+        relevant_chunks (list[tuple[str, str]]): Chunks already retrieved for the query, e.g. in a batch
+
+    Returns:
+        list[tuple[str, str]]: The (role, content) messages to send to the LLM
+    """
+
+    if relevant_chunks is None:
+        with query_stage("retrieve"):
+            relevant_chunks = retrieve_relevant_chunks(
+                query, n_results=n_results, threshold=threshold
+            )
+    context = build_context(relevant_chunks, model_name=model_name)
 
     logger.debug("-" * 100)
     logger.debug("Relevant documents: \n")
-    for doc in relevant_documents:
-        logger.debug(doc)
-        logger.debug("-" * 100)
+    logger.debug(context)
+    logger.debug("-" * 100)
     logger.debug("")
 
     logger.debug("User's question:")
@@ -103,36 +529,164 @@ def respond_to_query(
     logger.debug("-" * 100)
     logger.debug("")
     input_data = (
-        f"Relevant documents:\n\n{relevant_documents}\n\nUser's question:\n\n{query}"
+        f"Relevant documents:\n\n{context}\n\nUser's question:\n\n{query}"
     )
 
-    rag_assistant_prompt = build_prompt_from_config(
-        prompt_config, input_data=input_data
-    )
+    with query_stage("build_prompt"):
+        history = []
+        if memory is not None:
+            summary, history = memory.context()
+            if summary:
+                input_data = f"Summary of the earlier conversation:\n\n{summary}\n\n{input_data}"
+        compiled_prompt = get_compiled_prompt(prompt_config)
+        system_message, user_message = compiled_prompt.render(input_data)
+        rag_assistant_prompt = [system_message, *history, user_message]
+    record_prompt_prefix(compiled_prompt.prefix_hash)
 
     logger.debug(f"RAG assistant prompt: {rag_assistant_prompt}")
     logger.debug("")
+    return rag_assistant_prompt
 
-    response = llm.invoke(rag_assistant_prompt)
+def respond_to_query(
+    prompt_config: dict,
+    query: str,
+    llm: LLMClientAdapter,
+    n_results: int = 5,
+    threshold: float = 0.3,
+    memory: Optional[ConversationMemory] = None,
+) -> str:
+    """
+    Respond to a query using the ChromaDB database.
+
+    Args:
+        memory (ConversationMemory): The conversation to continue and to store the turn in, if any
+    """
+    with query_trace(query):
+        rag_assistant_prompt = build_rag_prompt(
+            prompt_config,
+            query,
+            n_results=n_results,
+            threshold=threshold,
+            model_name=llm.model_name,
+            memory=memory,
+        )
+
+        with query_stage("llm"):
+            response = llm.invoke(rag_assistant_prompt)
+        record_llm_tokens(rag_assistant_prompt, response.content, getattr(response, "usage_metadata", None))
+    if memory is not None:
+        memory.add_turn(query, response.content)
     return response.content
 
+def respond_to_query_stream(
+    prompt_config: dict,
+    query: str,
+    llm: LLMClientAdapter,
+    n_results: int = 5,
+    threshold: float = 0.3,
+    memory: Optional[ConversationMemory] = None,
+) -> Iterator[str]:
+    """
+    Respond to a query using the ChromaDB database, yielding the response as it is generated.
+
+    Args:
+        memory (ConversationMemory): The conversation to continue and to store the turn in, if any
+    """
+    with query_trace(query):
+        rag_assistant_prompt = build_rag_prompt(
+            prompt_config,
+            query,
+            n_results=n_results,
+            threshold=threshold,
+            model_name=llm.model_name,
+            memory=memory,
+        )
+
+        start_time = time.perf_counter()
+        first_token = True
+        tokens, usage = [], {}
+        for token in llm.stream(rag_assistant_prompt, usage=usage):
+            if first_token:
+                time_to_first_token = time.perf_counter() - start_time
+                record_stage("llm_first_token", time_to_first_token)
+                logger.debug(f"Time to first token: {time_to_first_token:.3f}s")
+                first_token = False
+            tokens.append(token)
+            yield token
+        generation_time = time.perf_counter() - start_time
+        record_stage("llm", generation_time)
+        logger.debug(f"Total generation time: {generation_time:.3f}s")
+        record_llm_tokens(rag_assistant_prompt, "".join(tokens), usage)
+    if memory is not None:
+        memory.add_turn(query, "".join(tokens))
+
+def warm_up() -> None:
+    """Open the collection and load the embedding model ahead of the first query."""
+    start_time = time.perf_counter()
+    get_rag_collection()
+    warm_up_embeddings()
+    logger.debug(f"Warm-up took {time.perf_counter() - start_time:.2f}s")
+
 def main():
     app_config = load_yaml_config(APP_CONFIG_FPATH)
     prompt_config = load_yaml_config(PROMPT_CONFIG_FPATH)
 
     rag_assistant_prompt = prompt_config["rag_assistant_prompt"]
-    vectordb_params = app_config["vectordb"]
+    vectordb_params = retrieval_params(app_config["vectordb"])
+    # Load the collection and embedding model while the user picks the LLM
+    warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    warm_up_thread.start()
     llm_client = initialize_llm()
+    warm_up_thread.join()
+    memory = create_memory(summarizer=llm_client)
 
     exit_app = False
     while not exit_app:
         query = input(
-            "Enter a question, 'config' to change the parameters, 'llm' to change the LLM, or 'exit' to quit: "
+            "Enter a question, 'new' to start a new conversation, 'config' to change the parameters, 'llm' to change the LLM, 'stats' to show cache stats, 'metrics' to show stage latencies, or 'exit' to quit: "
         )
         if query == "exit":
             exit_app = True
             exit()
 
+        elif query == "stats":
+            for cache_name, stats in get_cache_stats().items():
+                logger.info(
+                    f"{cache_name} cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_ratio']:.0%} hit ratio), {stats['entries']} entries, "
+                    f"~{stats['memory_bytes'] / 1024:.1f} KiB"
+                )
+            response_cache = get_response_cache()
+            if response_cache is not None:
+                stats = response_cache.stats()
+                logger.info(
+                    f"LLM response cache: {stats['hits']} hits, {stats['misses']} misses "
+                    f"({stats['hit_ratio']:.0%} hit ratio), {stats['entries']} entries, "
+                    f"~{stats['memory_bytes'] / 1024:.1f} KiB"
+                )
+            prefix_requests = metrics.counter_total("rag_prompt_prefix_total")
+            if prefix_requests:
+                provider_prompt_tokens = metrics.counter_total("rag_llm_tokens_total", kind="prompt", source="provider")
+                cached_prompt_tokens = metrics.counter_total("rag_llm_tokens_total", kind="prompt_cached")
+                logger.info(
+                    f"Prompt prefix: {metrics.counter_total('rag_prompt_prefix_total', prefix='repeat'):.0f} of "
+                    f"{prefix_requests:.0f} requests reused the system prompt, {cached_prompt_tokens:.0f} of "
+                    f"{provider_prompt_tokens:.0f} provider-reported prompt tokens were cached"
+                )
+            for batcher_name, stats in get_batcher_stats().items():
+                logger.info(
+                    f"{batcher_name} batcher: {stats['batches']} batches, mean size "
+                    f"{stats['mean_batch_size']:.1f}, queue delay p50 "
+                    f"{stats['queue_delay_ms']['p50']:.2f}ms / p95 {stats['queue_delay_ms']['p95']:.2f}ms"
+                )
+            continue
+
+        elif query == "metrics":
+            log_stage_summary()
+            metrics.write_json(METRICS_FPATH)
+            logger.info(f"Metrics written to {METRICS_FPATH}")
+            continue
+
         elif query == "config":
             threshold = float(input("Enter the retrieval threshold: "))
             n_results = int(input("Enter the Top K value: "))
@@ -143,17 +697,32 @@ def main():
             continue
         elif query == "llm":
             llm_client = initialize_llm()
+            if memory is not None:
+                memory.summarizer = llm_client
+            continue
+
+        elif query == "new":
+            memory = create_memory(summarizer=llm_client)
+            logger.info("Started a new conversation.")
             continue
 
-        response = respond_to_query(
-            prompt_config=rag_assistant_prompt,
-            query=query,
-            llm=llm_client,
-            **vectordb_params,
-        )
         logger.info("-" * 100)
         logger.info("LLM response:")
-        logger.info(response + "\n\n")
+        response_tokens = []
+        try:
+            for token in respond_to_query_stream(
+                prompt_config=rag_assistant_prompt,
+                query=query,
+                llm=llm_client,
+                memory=memory,
+                **vectordb_params,
+            ):
+                print(token, end="", flush=True)
+                response_tokens.append(token)
+        except Exception as e:
+            logger.error(f"The LLM failed to answer: {e}. Try again, or enter 'llm' to change the LLM.")
+        print("\n\n")
+        logger.debug("".join(response_tokens))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,250 @@
+"""
+Assembles retrieved chunks into the context section of the RAG prompt.
+
+Chunks are cut with a 200 character overlap, so neighbouring hits from the same
+publication repeat text, and the same passage can be stored under several
+publications. Before the prompt is built, hits are de-duplicated, adjacent
+chunks of a publication are merged back into one passage with the overlap
+removed, passages are ordered by their best retrieval rank and packed into the
+model's token budget.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+from app_code.chroma_db_ingest import parse_chunk_id
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class ContextBlock:
+    """A passage of the prompt context: one chunk or a run of adjacent chunks of a publication."""
+
+    source: str
+    chunk_indexes: list[int]
+    text: str
+    rank: int
+    chunk_ids: list[str] = field(default_factory=list)
+
+
+class TokenCounter:
+    """Counts tokens with a tiktoken encoding, caching the count of each text.
+
+    Falls back to an estimate of ~4 characters per token when tiktoken or the
+    encoding is unavailable (e.g. offline, before the encoding was downloaded).
+
+    Args:
+        encoding_name: tiktoken encoding, e.g. `cl100k_base`.
+        cache_size: Number of texts whose token counts are cached.
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base", cache_size: int = 8192):
+        self.encoding_name = encoding_name
+        self.encoding = None
+        try:
+            import tiktoken
+
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning(f"Tokenizer {encoding_name} unavailable, estimating token counts: {e}")
+        # Retrieved chunks repeat across queries, so most counts are cache hits
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cuts text down to at most `max_tokens` tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            return text[: max_tokens * 4]
+        tokens = self.encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else self.encoding.decode(tokens[:max_tokens])
+
+
+_token_counters = {}
+_token_counters_lock = threading.Lock()
+
+
+def get_token_counter(encoding_name: str = "cl100k_base") -> TokenCounter:
+    """Gets the process-wide token counter of an encoding, loading it once."""
+    if encoding_name not in _token_counters:
+        with _token_counters_lock:
+            if encoding_name not in _token_counters:
+                _token_counters[encoding_name] = TokenCounter(encoding_name)
+    return _token_counters[encoding_name]
+
+
+def load_context_packing_config() -> dict:
+    """Loads the `context_packing` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("context_packing") or {}
+
+
+def shingles(text: str, size: int = 3) -> frozenset:
+    """Lowercased word n-grams of a text, for near-duplicate detection."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def drop_near_duplicates(
+    hits: list[tuple[str, str]], threshold: float = 0.9
+) -> list[tuple[str, str]]:
+    """
+    Drop hits whose text is a near-duplicate of a better ranked hit.
+
+    Args:
+        hits: (chunk id, text) pairs, best first
+        threshold: Word 3-gram Jaccard similarity at or above which two chunks are duplicates
+    """
+    kept, kept_shingles = [], []
+    for chunk_id, text in hits:
+        text_shingles = shingles(text)
+        if any(jaccard(text_shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append((chunk_id, text))
+        kept_shingles.append(text_shingles)
+    return kept
+
+
+def merge_overlapping(first: str, second: str, min_overlap_chars: int = 20) -> str:
+    """
+    Join two consecutive chunks, removing the text the second repeats from the end of the first.
+    """
+    max_overlap = min(len(first), len(second))
+    for size in range(max_overlap, min_overlap_chars - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n{second}"
+
+
+def chunk_blocks(hits: list[tuple[str, str]]) -> list[ContextBlock]:
+    """One block per (chunk id, text) hit, in retrieval order."""
+    blocks = []
+    for rank, (chunk_id, text) in enumerate(hits):
+        source, chunk_index = parse_chunk_id(chunk_id)
+        blocks.append(ContextBlock(source, [chunk_index], text, rank, [chunk_id]))
+    return blocks
+
+
+def merge_adjacent_chunks(
+    hits: list[tuple[str, str]], min_overlap_chars: int = 20
+) -> list[ContextBlock]:
+    """
+    Merge hits that are consecutive chunks of the same publication into single blocks.
+
+    Each block keeps the best rank of its chunks and blocks are returned best first.
+    Hits whose id does not follow the ingestion id format are kept as they are.
+    """
+    by_source = {}
+    for chunk in chunk_blocks(hits):
+        by_source.setdefault(chunk.source, []).append(chunk)
+
+    blocks = []
+    for chunks in by_source.values():
+        chunks.sort(key=lambda chunk: (chunk.chunk_indexes[0] is None, chunk.chunk_indexes[0] or 0))
+        block = None
+        for chunk in chunks:
+            chunk_index = chunk.chunk_indexes[0]
+            if (
+                block is not None
+                and chunk_index is not None
+                and block.chunk_indexes[-1] is not None
+                and chunk_index == block.chunk_indexes[-1] + 1
+            ):
+                block.text = merge_overlapping(block.text, chunk.text, min_overlap_chars)
+                block.chunk_indexes.append(chunk_index)
+                block.chunk_ids.extend(chunk.chunk_ids)
+                block.rank = min(block.rank, chunk.rank)
+                continue
+            block = chunk
+            blocks.append(block)
+    return sorted(blocks, key=lambda block: block.rank)
+
+
+def format_block(number: int, block: ContextBlock) -> str:
+    return f"[{number}] (source: {block.source})\n{block.text}"
+
+
+def pack_blocks(
+    blocks: list[ContextBlock], max_tokens: int, token_counter: TokenCounter
+) -> list[ContextBlock]:
+    """
+    Keep the best ranked blocks that fit into `max_tokens`.
+
+    The best block is truncated if it does not fit on its own. Any other block that
+    does not fit is skipped, so smaller, lower ranked blocks can still use the
+    remaining budget.
+    """
+    packed, used = [], 0
+    for block in blocks:
+        tokens = token_counter.count(format_block(len(packed) + 1, block))
+        if used + tokens <= max_tokens:
+            packed.append(block)
+            used += tokens
+        elif not packed:
+            header_tokens = token_counter.count(format_block(1, ContextBlock(block.source, [], "", 0)))
+            block.text = token_counter.truncate(block.text, max_tokens - header_tokens)
+            packed.append(block)
+            used = max_tokens
+    return packed
+
+
+def get_context_budget(model_name: Optional[str] = None, config: Optional[dict] = None) -> int:
+    """Token budget of the retrieved context for a model, from `context_packing.model_budgets`."""
+    config = config if config is not None else load_context_packing_config()
+    model_budgets = config.get("model_budgets") or {}
+    return model_budgets.get(model_name) or config.get("max_context_tokens", 3000)
+
+
+def pack_context(
+    hits: list[tuple[str, str]],
+    model_name: Optional[str] = None,
+    config: Optional[dict] = None,
+) -> list[ContextBlock]:
+    """
+    De-duplicate, merge and pack retrieved chunks into the token budget of a model.
+
+    Args:
+        hits: (chunk id, text) pairs, best first
+        model_name: Model the prompt is sent to, to pick its token budget
+        config: The `context_packing` config. Defaults to the app config
+
+    Returns:
+        list[ContextBlock]: The blocks to put in the prompt, best first
+    """
+    config = config if config is not None else load_context_packing_config()
+    token_counter = get_token_counter(config.get("tokenizer", "cl100k_base"))
+    max_tokens = get_context_budget(model_name, config)
+
+    unique_hits = drop_near_duplicates(hits, config.get("near_duplicate_threshold", 0.9))
+    blocks = merge_adjacent_chunks(unique_hits, config.get("min_overlap_chars", 20))
+    packed = pack_blocks(blocks, max_tokens, token_counter)
+    logger.debug(
+        f"Packed {len(hits)} chunks ({len(hits) - len(unique_hits)} duplicates) into "
+        f"{len(packed)} of {len(blocks)} blocks within {max_tokens} tokens."
+    )
+    return packed
+
+
+def format_context(blocks: list[ContextBlock]) -> str:
+    """Render packed blocks as the numbered context section of the prompt."""
+    if not blocks:
+        return "No relevant documents were found."
+    return "\n\n".join(format_block(number, block) for number, block in enumerate(blocks, start=1))
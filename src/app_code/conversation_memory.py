@@ -0,0 +1,321 @@
+"""
+Multi-turn conversation memory, persisted to SQLite under `outputs/`.
+
+Every question and answer is stored, but only a bounded part of the history is
+sent with the next question, set by `memory_strategies.strategy`:
+
+- `trimming`: the last `trimming_window_size` messages.
+- `summarization`: a rolling summary of older turns plus the recent messages.
+  Once the unsummarized messages exceed `summarization_max_tokens`, the older
+  ones are folded into the summary in a background thread, so the user's turn
+  never waits for it. Until the summary catches up, the recent messages are
+  still capped by the trimming window, and the prompt notes how many messages
+  in between are left out. One summarization runs per session at a time, and
+  a summary only replaces the one it was built on.
+
+Either way the prompt size, and so the LLM latency, stays flat however long
+the conversation gets.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app_code.context_packing import get_token_counter, load_context_packing_config
+from app_code.prompt_builder import build_prompt_from_config
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, CHAT_HISTORY_DB_FPATH, PROMPT_CONFIG_FPATH
+
+STRATEGIES = ("trimming", "summarization", "none")
+
+
+class ConversationStore:
+    """SQLite store of conversation sessions, their messages and rolling summaries.
+
+    Args:
+        db_path: SQLite database file.
+    """
+
+    def __init__(self, db_path: str = CHAT_HISTORY_DB_FPATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized_through INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+            """
+        )
+        self._connection.commit()
+
+    def create_session(self, session_id: Optional[str] = None) -> str:
+        """Creates a session, or does nothing if it already exists, and returns its id."""
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at) VALUES (?, ?)",
+                (session_id, time.time()),
+            )
+            self._connection.commit()
+        return session_id
+
+    def append(self, session_id: str, role: str, content: str, tokens: int) -> int:
+        """Stores a message and returns its id."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO messages (session_id, role, content, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, role, content, tokens, time.time()),
+            )
+            self._connection.commit()
+            return cursor.lastrowid
+
+    def messages_after(self, session_id: str, message_id: int = 0, limit: Optional[int] = None) -> list[tuple]:
+        """
+        Returns (id, role, content, tokens) of the messages after `message_id`, oldest first.
+
+        Args:
+            limit: Only return the most recent `limit` of them
+        """
+        with self._lock:
+            if limit is None:
+                return self._connection.execute(
+                    "SELECT id, role, content, tokens FROM messages WHERE session_id = ? AND id > ? ORDER BY id",
+                    (session_id, message_id),
+                ).fetchall()
+            rows = self._connection.execute(
+                "SELECT id, role, content, tokens FROM messages WHERE session_id = ? AND id > ? ORDER BY id DESC LIMIT ?",
+                (session_id, message_id, limit),
+            ).fetchall()
+        return rows[::-1]
+
+    def count_messages_between(self, session_id: str, after_id: int, before_id: int) -> int:
+        """Returns the number of messages with an id strictly between `after_id` and `before_id`."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ? AND id > ? AND id < ?",
+                (session_id, after_id, before_id),
+            ).fetchone()[0]
+
+    def get_summary(self, session_id: str) -> tuple[str, int]:
+        """Returns the session's summary and the id of the last message it covers."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary, summarized_through FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row if row is not None else ("", 0)
+
+    def set_summary(self, session_id: str, summary: str, summarized_through: int, previous_through: int) -> bool:
+        """
+        Replaces the session's summary, unless it no longer covers up to `previous_through`.
+
+        Returns:
+            bool: Whether the summary was replaced
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "UPDATE sessions SET summary = ?, summarized_through = ? WHERE session_id = ? AND summarized_through = ?",
+                (summary, summarized_through, session_id, previous_through),
+            )
+            self._connection.commit()
+            return cursor.rowcount > 0
+
+
+def load_memory_config() -> dict:
+    """Loads the `memory_strategies` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("memory_strategies") or {}
+
+
+_summary_executor = None
+_summary_executor_lock = threading.Lock()
+
+# Sessions being summarized, whichever memory of the session started it
+_pending_summaries: set[str] = set()
+_pending_summaries_lock = threading.Lock()
+
+
+def get_summary_executor() -> ThreadPoolExecutor:
+    """Get the single thread that summarizes conversations in the background."""
+    global _summary_executor
+    if _summary_executor is None:
+        with _summary_executor_lock:
+            if _summary_executor is None:
+                _summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-summary")
+    return _summary_executor
+
+
+class ConversationMemory:
+    """The bounded history of one conversation session.
+
+    Args:
+        store: Where messages and summaries are persisted.
+        session_id: Session to continue. Defaults to a new session.
+        strategy: One of `trimming`, `summarization` or `none`.
+        window_size: Number of recent messages sent verbatim.
+        summarization_max_tokens: Unsummarized history size that triggers summarization.
+        summarizer: LLM client used to summarize. Required for the summarization strategy.
+    """
+
+    def __init__(
+        self,
+        store: ConversationStore,
+        session_id: Optional[str] = None,
+        strategy: str = "trimming",
+        window_size: int = 6,
+        summarization_max_tokens: int = 1000,
+        summarizer=None,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown memory strategy '{strategy}', expected one of {STRATEGIES}")
+        if strategy == "summarization" and summarizer is None:
+            raise ValueError("The summarization memory strategy needs a summarizer LLM client")
+        self.store = store
+        self.session_id = store.create_session(session_id)
+        self.strategy = strategy
+        self.window_size = window_size
+        self.summarization_max_tokens = summarization_max_tokens
+        self.summarizer = summarizer
+        self.token_counter = get_token_counter(load_context_packing_config().get("tokenizer", "cl100k_base"))
+
+    def context(self) -> tuple[str, list[tuple[str, str]]]:
+        """
+        The conversation to send before the next question.
+
+        Returns:
+            tuple: The rolling summary of the turns no longer sent verbatim (or an
+                empty string), noting the messages it does not cover yet, and the
+                recent (role, content) messages, oldest first
+        """
+        if self.strategy == "none":
+            return "", []
+        summary, summarized_through = "", 0
+        if self.strategy == "summarization":
+            summary, summarized_through = self.store.get_summary(self.session_id)
+        recent = self.store.messages_after(self.session_id, summarized_through, limit=self.window_size)
+        if self.strategy == "summarization" and recent:
+            # Messages the summary has not caught up with yet, older than the window
+            omitted = self.store.count_messages_between(self.session_id, summarized_through, recent[0][0])
+            if omitted:
+                note = f"({omitted} earlier messages are not summarized yet and are left out.)"
+                summary = f"{summary}\n\n{note}" if summary else note
+        return summary, [(role, content) for _, role, content, _ in recent]
+
+    def add_turn(self, question: str, answer: str) -> None:
+        """Stores a question and its answer, summarizing older turns in the background if needed."""
+        self.store.append(self.session_id, "human", question, self.token_counter.count(question))
+        self.store.append(self.session_id, "ai", answer, self.token_counter.count(answer))
+        if self.strategy == "summarization" and not self.summary_pending():
+            _, summarized_through = self.store.get_summary(self.session_id)
+            unsummarized = self.store.messages_after(self.session_id, summarized_through)
+            if sum(tokens for *_, tokens in unsummarized) > self.summarization_max_tokens:
+                with _pending_summaries_lock:
+                    if self.session_id in _pending_summaries:
+                        return
+                    _pending_summaries.add(self.session_id)
+                get_summary_executor().submit(self._summarize)
+
+    def summary_pending(self) -> bool:
+        """Whether the session is being summarized in the background."""
+        with _pending_summaries_lock:
+            return self.session_id in _pending_summaries
+
+    def _summarize(self) -> None:
+        """Fold everything but the recent window into the rolling summary."""
+        try:
+            summary, summarized_through = self.store.get_summary(self.session_id)
+            unsummarized = self.store.messages_after(self.session_id, summarized_through)
+            to_fold = unsummarized[: max(0, len(unsummarized) - self.window_size)]
+            if not to_fold:
+                return
+            transcript = "\n\n".join(f"{role}: {content}" for _, role, content, _ in to_fold)
+            input_data = (
+                f"Summary so far:\n\n{summary or '(empty)'}\n\nNew messages:\n\n{transcript}"
+            )
+            prompt = build_prompt_from_config(get_summary_prompt_config(), input_data=input_data)
+            start_time = time.perf_counter()
+            new_summary = self.summarizer.invoke(prompt).content.strip()
+            # Another process may have summarized the session meanwhile
+            if not self.store.set_summary(self.session_id, new_summary, to_fold[-1][0], summarized_through):
+                logger.debug(f"The summary of session {self.session_id} moved on, discarding this one.")
+                return
+            logger.debug(
+                f"Summarized {len(to_fold)} messages of session {self.session_id} "
+                f"in {time.perf_counter() - start_time:.2f}s."
+            )
+        except Exception as e:
+            logger.warning(f"Conversation summarization failed, keeping the trimmed history: {e}")
+        finally:
+            with _pending_summaries_lock:
+                _pending_summaries.discard(self.session_id)
+
+    def wait_for_summary(self, timeout: Optional[float] = None) -> bool:
+        """Wait until no background summarization of the session is running. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.summary_pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+def get_summary_prompt_config() -> dict:
+    return load_yaml_config(PROMPT_CONFIG_FPATH)["conversation_summary_prompt"]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Gets the process-wide conversation store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore()
+    return _store
+
+
+def create_memory(summarizer=None, session_id: Optional[str] = None) -> Optional[ConversationMemory]:
+    """
+    Create the memory of a conversation session from the `memory_strategies` config.
+
+    Args:
+        summarizer: LLM client used by the summarization strategy
+        session_id: Session to continue. Defaults to a new session
+
+    Returns:
+        ConversationMemory: The session's memory, or None if the history cannot be stored
+    """
+    config = load_memory_config()
+    try:
+        return ConversationMemory(
+            get_conversation_store(),
+            session_id=session_id,
+            strategy=config.get("strategy", "trimming"),
+            window_size=config.get("trimming_window_size", 6),
+            summarization_max_tokens=config.get("summarization_max_tokens", 1000),
+            summarizer=summarizer,
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Conversation memory disabled, could not open {CHAT_HISTORY_DB_FPATH}: {e}")
+        return None
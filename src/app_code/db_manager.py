@@ -1,4 +1,3 @@
-import chromadb
 from paths import VECTOR_DB_DIR
 from app_code.logger import logger
 
@@ -8,6 +7,9 @@ def get_client():
     """Get or create a ChromaDB client singleton."""
     global _client
     if _client is None:
+        # chromadb is slow to import, so it is only loaded when the Chroma backend is used
+        import chromadb
+
         logger.debug(f"Initializing ChromaDB client at {VECTOR_DB_DIR}")
         _client = chromadb.PersistentClient(path=VECTOR_DB_DIR)
     return _client
@@ -0,0 +1,171 @@
+"""
+Process-wide embedding model registry.
+
+Loading a sentence-transformers model is by far the most expensive step of both
+ingestion and retrieval, so models are loaded once per process and shared by
+every caller through `get_embedding_service`.
+"""
+
+import threading
+from typing import Optional
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_BATCH_SIZE = 32
+
+_services = {}
+_default_service = None
+_services_lock = threading.Lock()
+
+
+def resolve_device(device: Optional[str] = None) -> str:
+    """Resolves the torch device to run the embedding model on.
+
+    Args:
+        device: Explicit device name, or None/"auto" to pick the best available one.
+
+    Returns:
+        The device name ("cuda", "mps" or "cpu").
+    """
+    if device and device != "auto":
+        return device
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def load_embedding_config() -> dict:
+    """Loads the `embeddings` section of the app config, or an empty dict."""
+    try:
+        return load_yaml_config(APP_CONFIG_FPATH).get("embeddings") or {}
+    except FileNotFoundError:
+        return {}
+
+
+class EmbeddingService:
+    """A loaded embedding model with a thread-safe embedding API."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        device: str = "cpu",
+        normalize_embeddings: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.normalize_embeddings = normalize_embeddings
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+
+        # Imported with the first model: it pulls in torch and transformers
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        logger.debug(f"Loading embedding model '{model_name}' on {device}")
+        self.model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": device},
+            encode_kwargs={
+                "normalize_embeddings": normalize_embeddings,
+                "batch_size": batch_size,
+            },
+        )
+
+    def embed_documents(
+        self, documents: list[str], batch_size: Optional[int] = None
+    ) -> list[list[float]]:
+        """Embeds a list of documents.
+
+        Args:
+            documents: Texts to embed.
+            batch_size: Encoder batch size for this call. Defaults to the service's batch size.
+
+        Returns:
+            One embedding per document.
+        """
+        if not documents:
+            return []
+        with self._lock:
+            self.model.encode_kwargs["batch_size"] = batch_size or self.batch_size
+            return self.model.embed_documents(documents)
+
+    def embed_query(self, query: str) -> list[float]:
+        """Embeds a single query string."""
+        with self._lock:
+            self.model.encode_kwargs["batch_size"] = self.batch_size
+            return self.model.embed_query(query)
+
+
+def get_embedding_service(
+    model_name: Optional[str] = None,
+    device: Optional[str] = None,
+    normalize_embeddings: Optional[bool] = None,
+    batch_size: Optional[int] = None,
+) -> EmbeddingService:
+    """Gets or creates the shared embedding service for the given settings.
+
+    Arguments left as None fall back to the `embeddings` section of config.yaml.
+    Services are keyed by (model name, device, normalization), so each distinct
+    model is loaded only once per process. The configured default service is
+    remembered, so the per-query lookup does not re-read config.yaml.
+
+    Returns:
+        The shared EmbeddingService instance.
+    """
+    global _default_service
+    use_default = model_name is None and device is None and normalize_embeddings is None and batch_size is None
+    if use_default and _default_service is not None:
+        return _default_service
+
+    config = load_embedding_config()
+    model_name = model_name or config.get("model_name", DEFAULT_MODEL_NAME)
+    device = resolve_device(device or config.get("device"))
+    if normalize_embeddings is None:
+        normalize_embeddings = bool(config.get("normalize_embeddings", False))
+    batch_size = batch_size or config.get("batch_size", DEFAULT_BATCH_SIZE)
+
+    key = (model_name, device, normalize_embeddings)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = EmbeddingService(
+                model_name=model_name,
+                device=device,
+                normalize_embeddings=normalize_embeddings,
+                batch_size=batch_size,
+            )
+            _services[key] = service
+        if use_default:
+            _default_service = service
+        return service
+
+
+def warm_up(force: bool = False) -> Optional[EmbeddingService]:
+    """Loads the default embedding model ahead of the first query.
+
+    Args:
+        force: Warm up even if `embeddings.warm_up_on_start` is disabled.
+
+    Returns:
+        The warmed service, or None if warm-up is disabled.
+    """
+    if not force and not load_embedding_config().get("warm_up_on_start", True):
+        return None
+    service = get_embedding_service()
+    service.embed_query("warm up")
+    logger.debug(f"Embedding model '{service.model_name}' warmed up on {service.device}")
+    return service
+
+
+def clear_registry() -> None:
+    """Drops all loaded embedding models."""
+    global _default_service
+    with _services_lock:
+        _services.clear()
+        _default_service = None
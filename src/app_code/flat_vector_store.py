@@ -0,0 +1,618 @@
+"""
+Exact-search vector store backed by memory-mapped NumPy files.
+
+Layout of a store directory:
+
+    meta.json               published generation, row count, capacity, dimension, quantization
+    gen_<N>/embeddings.npy  float32 (capacity, dim) unit vectors, memory-mapped
+    gen_<N>/codes.npy       int8 or float16 (capacity, dim) quantized vectors, if quantized
+    gen_<N>/scales.npy      float32 (dim,) per-dimension int8 scales, if int8
+    gen_<N>/offsets.npy     int64 (capacity + 1, 3) byte offsets into the columns below
+    gen_<N>/ids.bin         UTF-8 chunk ids, concatenated
+    gen_<N>/documents.bin   UTF-8 chunk texts, concatenated
+    gen_<N>/metadatas.bin   JSON chunk metadata, concatenated
+    gen_<N>/alive_<V>.npy   bool (capacity,) mask of rows that are not deleted
+    gen_<N>/id_index_<V>.npy  int64 (live rows, 2) (id hash, row) pairs sorted by hash
+
+Rows are only ever appended: an upsert marks the old row dead and appends a new
+one. `persist` publishes new rows and deletions at once by atomically rewriting
+`meta.json`, and readers only see published rows, reopening the store when
+`meta.json` changes. Several read-only processes can therefore share the files
+through the OS page cache while one writer ingests. Once most rows of a
+generation are dead, `persist` compacts the live rows into the next one.
+
+Queries take a snapshot of the published arrays under the lock and scan it
+outside, so concurrent queries in one process run in parallel. Chunk ids are
+looked up by binary search in the persisted id index, so fetching chunks by id
+needs no pass over the store.
+
+With quantization enabled, queries scan the compact int8/float16 codes for the
+`rescore_candidates` best rows and only rescore those against the float32
+vectors, so the full-precision file stays on disk and mostly out of memory.
+int8 scales are fitted per dimension when a generation is created; vectors
+appended later are clipped to that range and rely on the exact rescoring.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from app_code.logger import logger
+
+META_FNAME = "meta.json"
+COLUMNS = ("ids", "documents", "metadatas")
+INITIAL_CAPACITY = 1024
+QUANTIZATIONS = ("int8", "float16")
+SCAN_BLOCK_ROWS = 16384
+
+
+def _atomic_write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def id_hash(chunk_id: str) -> int:
+    """64-bit hash of a chunk id, the key of the id index."""
+    return int.from_bytes(hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def normalize_embeddings(embeddings) -> np.ndarray:
+    """Returns the embeddings as a 2D float32 array of unit vectors."""
+    vectors = np.array(embeddings, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def fit_int8_scales(vectors: np.ndarray) -> np.ndarray:
+    """Returns per-dimension scales mapping the largest absolute value of each dimension to 127."""
+    scales = np.abs(vectors).max(axis=0) / 127 if len(vectors) else np.ones(vectors.shape[1])
+    return np.maximum(scales, 1e-8).astype(np.float32)
+
+
+def quantize(vectors: np.ndarray, quantization: str, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Encodes float32 vectors as float16, or as int8 with the given per-dimension scales."""
+    if quantization == "float16":
+        return vectors.astype(np.float16)
+    return np.clip(np.rint(vectors / scales), -127, 127).astype(np.int8)
+
+
+@dataclass(frozen=True)
+class StoreSnapshot:
+    """The published rows of a store at one point in time, safe to read without the store lock.
+
+    The arrays are memory mappings that later appends and compactions never
+    change for these rows (or copies, for the writer's in-memory alive mask), and
+    column files are read with `os.pread`, which does not move a shared file offset.
+    """
+
+    n_rows: int
+    n_alive: int
+    embeddings: Optional[np.ndarray]
+    codes: Optional[np.ndarray]
+    scales: Optional[np.ndarray]
+    alive: np.ndarray
+    offsets: np.ndarray
+    files: dict
+    id_index: Optional[np.ndarray]
+
+    def read_column(self, column: str, row: int) -> str:
+        column_index = COLUMNS.index(column)
+        start = int(self.offsets[row, column_index])
+        end = int(self.offsets[row + 1, column_index])
+        return os.pread(self.files[column].fileno(), end - start, start).decode("utf-8")
+
+    def read_row(self, row: int) -> tuple[str, str, Optional[dict]]:
+        return (
+            self.read_column("ids", row),
+            self.read_column("documents", row),
+            json.loads(self.read_column("metadatas", row)),
+        )
+
+    def records(self, rows, include) -> dict:
+        records = [self.read_row(int(row)) for row in rows]
+        results = {"ids": [record[0] for record in records]}
+        if "documents" in include:
+            results["documents"] = [record[1] for record in records]
+        if "metadatas" in include:
+            results["metadatas"] = [record[2] for record in records]
+        return results
+
+    def find_rows(self, ids: list[str]) -> list[int]:
+        """Live rows of chunk ids, by binary search in the id index."""
+        keys = self.id_index[:, 0]
+        rows = []
+        for chunk_id in ids:
+            key = id_hash(chunk_id)
+            start, end = np.searchsorted(keys, key, "left"), np.searchsorted(keys, key, "right")
+            # Rule out hash collisions against the stored id
+            for row in self.id_index[start:end, 1]:
+                if self.read_column("ids", int(row)) == chunk_id:
+                    rows.append(int(row))
+                    break
+        return rows
+
+    def scan(self, queries: np.ndarray) -> np.ndarray:
+        """Scores all published rows against the queries, on the quantized codes if there are any."""
+        if self.codes is None:
+            return queries @ self.embeddings[: self.n_rows].T
+        if self.scales is not None:
+            # (q * s) . c == q . (s * c), so int8 codes never need decoding
+            queries = queries * self.scales
+        similarities = np.empty((len(queries), self.n_rows), dtype=np.float32)
+        for start in range(0, self.n_rows, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, self.n_rows)
+            similarities[:, start:end] = queries @ self.codes[start:end].astype(np.float32).T
+        return similarities
+
+    def top_rows(
+        self, query: np.ndarray, similarities: np.ndarray, k: int, rescore_candidates: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the k best rows for one query, best first, with their exact similarities."""
+        if self.codes is None:
+            rows = np.argpartition(-similarities, k - 1)[:k]
+            scores = similarities[rows]
+        else:
+            n_candidates = min(max(k, rescore_candidates), self.n_alive)
+            # Sorted rows read the full-precision file front to back
+            candidates = np.sort(np.argpartition(-similarities, n_candidates - 1)[:n_candidates])
+            exact = np.asarray(self.embeddings[candidates]) @ query
+            best = np.argpartition(-exact, k - 1)[:k]
+            rows, scores = candidates[best], exact[best]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
+
+
+class FlatVectorStore:
+    """A brute-force cosine index over memory-mapped float32 embeddings.
+
+    Args:
+        directory: Directory holding the store files.
+        writable: Open for ingestion. Only one process should write to a store at a time.
+        quantization: "int8", "float16" or None. Readers use whatever the store was written
+            with; a writer converts the store on its next `persist` if this differs.
+        rescore_candidates: Rows taken from the quantized scan and rescored exactly per query.
+    """
+
+    max_batch_size = 8192
+
+    def __init__(
+        self,
+        directory: str,
+        writable: bool = False,
+        quantization: Optional[str] = None,
+        rescore_candidates: int = 50,
+    ):
+        if quantization not in (None, *QUANTIZATIONS):
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+        self.directory = directory
+        self.writable = writable
+        self.quantization = quantization
+        self.rescore_candidates = rescore_candidates
+        self.meta_path = os.path.join(directory, META_FNAME)
+        self._lock = threading.RLock()
+        self._files = {}
+        self._meta_mtime = None
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+
+    # Opening and persistence
+
+    def _generation_dir(self, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self.meta["generation"]
+        return os.path.join(self.directory, f"gen_{generation}")
+
+    def _open(self) -> None:
+        """Reads `meta.json` and maps the generation it points to."""
+        with self._lock:
+            for attempt in range(3):
+                if os.path.exists(self.meta_path):
+                    with open(self.meta_path, "r", encoding="utf-8") as f:
+                        self.meta = json.load(f)
+                else:
+                    self.meta = {
+                        "generation": 0,
+                        "count": 0,
+                        "capacity": 0,
+                        "dim": None,
+                        "alive_version": 0,
+                        "quantization": self.quantization,
+                    }
+                self._meta_mtime = _file_mtime(self.meta_path)
+                try:
+                    self._load_generation()
+                    return
+                except FileNotFoundError:
+                    # The writer published and cleaned up a newer version while we were reading
+                    if attempt == 2:
+                        raise
+
+    def _load_generation(self) -> None:
+        """Maps the arrays and opens the column files of the generation in `self.meta`."""
+        # The old files are closed once no snapshot refers to them anymore
+        self._files = {}
+        self.n_rows = self.meta["count"]
+        self.dim = self.meta["dim"]
+        self._id_to_row = None
+
+        gen_dir = self._generation_dir()
+        self.codes = None
+        self.scales = None
+        self.id_index = None
+        if not self.meta["capacity"]:
+            self.embeddings = None
+            self.offsets = np.zeros((1, len(COLUMNS)), dtype=np.int64)
+            self.alive = np.zeros(0, dtype=bool)
+            self.n_alive = 0
+            return
+
+        mode = "r+" if self.writable else "r"
+        self.embeddings = np.load(os.path.join(gen_dir, "embeddings.npy"), mmap_mode=mode)
+        self.offsets = np.load(os.path.join(gen_dir, "offsets.npy"), mmap_mode=mode)
+        if self.meta.get("quantization"):
+            self.codes = np.load(os.path.join(gen_dir, "codes.npy"), mmap_mode=mode)
+        if self.meta.get("quantization") == "int8":
+            self.scales = np.load(os.path.join(gen_dir, "scales.npy"))
+        alive_path = os.path.join(gen_dir, f"alive_{self.meta['alive_version']}.npy")
+        # The writer changes its mask in memory and publishes a new file on persist
+        self.alive = np.load(alive_path, mmap_mode=None if self.writable else "r")
+        self.n_alive = int(np.count_nonzero(self.alive[: self.n_rows]))
+        id_index_path = os.path.join(gen_dir, f"id_index_{self.meta['alive_version']}.npy")
+        if not self.writable and os.path.exists(id_index_path):
+            # Stores persisted before the id index existed fall back to `_row_lookup`
+            self.id_index = np.load(id_index_path, mmap_mode="r")
+
+        for column_index, column in enumerate(COLUMNS):
+            path = os.path.join(gen_dir, f"{column}.bin")
+            if self.writable:
+                # Drop anything appended after the last persist, e.g. by an interrupted run
+                with open(path, "r+b") as f:
+                    f.truncate(int(self.offsets[self.n_rows, column_index]))
+            self._files[column] = open(path, "r+b" if self.writable else "rb")
+
+    def refresh(self) -> None:
+        """Reopens a read-only store if another process published changes."""
+        if not self.writable and _file_mtime(self.meta_path) != self._meta_mtime:
+            logger.debug(f"Reloading flat vector store at {self.directory}")
+            self._open()
+
+    def persist(self) -> None:
+        """Publishes appended rows and deletions to readers, compacting the store if needed."""
+        if not self.writable or self.embeddings is None:
+            return
+        with self._lock:
+            if self.n_alive < self.n_rows / 2 or self.meta.get("quantization") != self.quantization:
+                self._compact()
+                return
+
+            gen_dir = self._generation_dir()
+            self.embeddings.flush()
+            self.offsets.flush()
+            if self.codes is not None:
+                self.codes.flush()
+            for f in self._files.values():
+                f.flush()
+                os.fsync(f.fileno())
+
+            old_alive_version = self.meta["alive_version"]
+            self.meta.update(count=self.n_rows, dim=self.dim, alive_version=old_alive_version + 1)
+            np.save(os.path.join(gen_dir, f"alive_{self.meta['alive_version']}.npy"), self.alive)
+            np.save(os.path.join(gen_dir, f"id_index_{self.meta['alive_version']}.npy"), self._build_id_index())
+            _atomic_write_json(self.meta_path, self.meta)
+            self._meta_mtime = _file_mtime(self.meta_path)
+
+            for name in ("alive", "id_index"):
+                old_path = os.path.join(gen_dir, f"{name}_{old_alive_version}.npy")
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+
+    def _build_id_index(self) -> np.ndarray:
+        """(id hash, row) pairs of the live rows, sorted by hash."""
+        lookup = self._row_lookup()
+        id_index = np.empty((len(lookup), 2), dtype=np.int64)
+        for i, (chunk_id, row) in enumerate(lookup.items()):
+            id_index[i] = id_hash(chunk_id), row
+        return id_index[np.argsort(id_index[:, 0], kind="stable")]
+
+    def _compact(self) -> None:
+        """Copies the live rows into a new generation and publishes it."""
+        rows = np.flatnonzero(self.alive[: self.n_rows])
+        snapshot = self._snapshot()
+        records = [snapshot.read_row(int(row)) for row in rows]
+        embeddings = np.array(self.embeddings[rows])
+
+        old_gen_dir = self._generation_dir()
+        generation = self.meta["generation"] + 1
+        capacity = max(INITIAL_CAPACITY, 2 * len(rows))
+        self._create_generation(generation, capacity, embeddings)
+        self.meta.update(
+            generation=generation, count=0, capacity=capacity, alive_version=0, quantization=self.quantization
+        )
+        self._load_generation()
+        if records:
+            chunk_ids, documents, metadatas = (list(column) for column in zip(*records))
+            self._append(chunk_ids, embeddings, documents, metadatas)
+        self.persist()
+
+        # Readers still holding the old generation keep their open files and mappings
+        shutil.rmtree(old_gen_dir, ignore_errors=True)
+        logger.debug(f"Compacted flat vector store to {len(rows)} rows in generation {generation}")
+
+    def _create_generation(self, generation: int, capacity: int, sample: np.ndarray) -> None:
+        """Creates empty files for a generation, fitting int8 scales to the `sample` vectors."""
+        gen_dir = self._generation_dir(generation)
+        os.makedirs(gen_dir, exist_ok=True)
+        arrays = [
+            ("embeddings", np.float32, (capacity, self.dim)),
+            ("offsets", np.int64, (capacity + 1, len(COLUMNS))),
+        ]
+        if self.quantization:
+            arrays.append(("codes", np.dtype(self.quantization), (capacity, self.dim)))
+        if self.quantization == "int8":
+            np.save(os.path.join(gen_dir, "scales.npy"), fit_int8_scales(sample))
+        for name, dtype, shape in arrays:
+            array = np.lib.format.open_memmap(os.path.join(gen_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape)
+            array.flush()
+            del array
+        np.save(os.path.join(gen_dir, "alive_0.npy"), np.zeros(capacity, dtype=bool))
+        for column in COLUMNS:
+            open(os.path.join(gen_dir, f"{column}.bin"), "wb").close()
+
+    def _grow(self, min_capacity: int, sample: np.ndarray) -> None:
+        """Reallocates the fixed-size arrays with room for at least `min_capacity` rows."""
+        capacity = max(INITIAL_CAPACITY, 2 * self.meta["capacity"], min_capacity)
+        if self.embeddings is None:
+            self._create_generation(self.meta["generation"], capacity, sample)
+            self.meta.update(capacity=capacity, dim=self.dim, alive_version=0, quantization=self.quantization)
+            self._load_generation()
+            return
+
+        # Write grown copies and swap them in, so readers keep their mapping of the old files
+        gen_dir = self._generation_dir()
+        arrays = [
+            ("embeddings", self.embeddings, (capacity, self.dim)),
+            ("offsets", self.offsets, (capacity + 1, len(COLUMNS))),
+        ]
+        if self.codes is not None:
+            arrays.append(("codes", self.codes, (capacity, self.dim)))
+        for name, source, shape in arrays:
+            tmp_path = os.path.join(gen_dir, f"{name}.tmp.npy")
+            grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=source.dtype, shape=shape)
+            grown[: len(source)] = source
+            grown.flush()
+            del grown
+            os.replace(tmp_path, os.path.join(gen_dir, f"{name}.npy"))
+
+        self.meta["capacity"] = capacity
+        self.embeddings = np.load(os.path.join(gen_dir, "embeddings.npy"), mmap_mode="r+")
+        self.offsets = np.load(os.path.join(gen_dir, "offsets.npy"), mmap_mode="r+")
+        if self.codes is not None:
+            self.codes = np.load(os.path.join(gen_dir, "codes.npy"), mmap_mode="r+")
+        self.alive = np.concatenate([self.alive, np.zeros(capacity - len(self.alive), dtype=bool)])
+
+    # Reading
+
+    def _snapshot(self) -> StoreSnapshot:
+        """The published rows, for reading outside the lock."""
+        with self._lock:
+            alive = self.alive[: self.n_rows]
+            return StoreSnapshot(
+                n_rows=self.n_rows,
+                n_alive=self.n_alive,
+                embeddings=self.embeddings,
+                codes=self.codes,
+                scales=self.scales,
+                # The writer changes its mask in place
+                alive=alive.copy() if self.writable else alive,
+                offsets=self.offsets,
+                files=dict(self._files),
+                id_index=self.id_index,
+            )
+
+    def _row_lookup(self) -> dict[str, int]:
+        """Maps chunk ids to live rows, built on first use by the writer (or without an id index)."""
+        with self._lock:
+            if self._id_to_row is None:
+                snapshot = self._snapshot()
+                self._id_to_row = {
+                    snapshot.read_column("ids", int(row)): int(row)
+                    for row in np.flatnonzero(snapshot.alive)
+                }
+            return self._id_to_row
+
+    def count(self) -> int:
+        """Returns the number of live chunks."""
+        self.refresh()
+        return self.n_alive
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        include: tuple[str, ...] = ("documents", "metadatas", "distances"),
+    ) -> dict:
+        """Top-k cosine search over all queries at once.
+
+        Returns Chroma-style results: one list per query under each key, with
+        cosine distances (1 - similarity).
+        """
+        self.refresh()
+        snapshot = self._snapshot()
+        queries = normalize_embeddings(query_embeddings)
+        keys = ["ids"] + [key for key in ("documents", "metadatas", "distances") if key in include]
+        results = {key: [] for key in keys}
+        k = min(n_results, snapshot.n_alive)
+        if k == 0:
+            for key in keys:
+                results[key] = [[] for _ in queries]
+            return results
+
+        similarities = snapshot.scan(queries)
+        similarities[:, ~snapshot.alive] = -np.inf
+        for query, query_similarities in zip(queries, similarities):
+            rows, scores = snapshot.top_rows(query, query_similarities, k, self.rescore_candidates)
+            for key, values in snapshot.records(rows, include).items():
+                results[key].append(values)
+            if "distances" in include:
+                results["distances"].append((1.0 - scores).tolist())
+        return results
+
+    def measure_recall(self, query_embeddings, k: int = 5) -> float:
+        """Returns the mean recall@k of `query` results against an exact float32 search over the same rows."""
+        self.refresh()
+        snapshot = self._snapshot()
+        queries = normalize_embeddings(query_embeddings)
+        k = min(k, snapshot.n_alive)
+        if k == 0:
+            return 1.0
+        exact = queries @ snapshot.embeddings[: snapshot.n_rows].T
+        exact[:, ~snapshot.alive] = -np.inf
+        expected = np.argpartition(-exact, k - 1, axis=1)[:, :k]
+        retrieved = self.query(queries, n_results=k, include=())["ids"]
+        lookup = self._row_lookup()
+        hits = [
+            len({lookup[chunk_id] for chunk_id in ids} & set(expected_rows.tolist()))
+            for ids, expected_rows in zip(retrieved, expected)
+        ]
+        return sum(hits) / (k * len(queries))
+
+    def get(
+        self,
+        ids: Optional[list[str]] = None,
+        include: tuple[str, ...] = ("documents", "metadatas"),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> dict:
+        """Returns live chunks by id, or a page of all live chunks in insertion order."""
+        self.refresh()
+        snapshot = self._snapshot()
+        if ids is not None and snapshot.id_index is not None:
+            rows = snapshot.find_rows(ids)
+        elif ids is not None:
+            lookup = self._row_lookup()
+            rows = [lookup[chunk_id] for chunk_id in ids if chunk_id in lookup]
+        else:
+            rows = np.flatnonzero(snapshot.alive)[offset:]
+            if limit is not None:
+                rows = rows[:limit]
+        return snapshot.records(rows, include)
+
+    # Writing
+
+    def _append(self, ids: list[str], vectors: np.ndarray, documents: list[str], metadatas: list) -> None:
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store dimension {self.dim}")
+        if self.n_rows + len(ids) > self.meta["capacity"]:
+            self._grow(self.n_rows + len(ids), vectors)
+
+        start, end = self.n_rows, self.n_rows + len(ids)
+        self.embeddings[start:end] = vectors
+        if self.codes is not None:
+            self.codes[start:end] = quantize(vectors, self.meta["quantization"], self.scales)
+        encoded_columns = (
+            [chunk_id.encode("utf-8") for chunk_id in ids],
+            [document.encode("utf-8") for document in documents],
+            [json.dumps(metadata).encode("utf-8") for metadata in metadatas],
+        )
+        for column_index, (column, values) in enumerate(zip(COLUMNS, encoded_columns)):
+            f = self._files[column]
+            f.seek(int(self.offsets[start, column_index]))
+            f.write(b"".join(values))
+            # Snapshots read the file descriptor directly, not through this buffer
+            f.flush()
+            lengths = np.cumsum([len(value) for value in values], dtype=np.int64)
+            self.offsets[start + 1 : end + 1, column_index] = self.offsets[start, column_index] + lengths
+
+        self.alive[start:end] = True
+        self.n_alive += len(ids)
+        lookup = self._row_lookup()
+        for row, chunk_id in enumerate(ids, start):
+            lookup[chunk_id] = row
+        self.n_rows = end
+
+    def _mark_deleted(self, ids: list[str]) -> None:
+        lookup = self._row_lookup()
+        for chunk_id in ids:
+            row = lookup.pop(chunk_id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.n_alive -= 1
+
+    def upsert(
+        self,
+        ids: list[str],
+        embeddings,
+        documents: list[str],
+        metadatas: Optional[list[dict]] = None,
+    ) -> None:
+        """Adds chunks, replacing any live chunks with the same ids."""
+        if not self.writable:
+            raise PermissionError(f"Flat vector store at {self.directory} is open read-only")
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+        # The last occurrence of an id repeated within the batch wins
+        keep = sorted({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+        vectors = normalize_embeddings(embeddings)[keep]
+        with self._lock:
+            self._mark_deleted([ids[i] for i in keep])
+            self._append(
+                [ids[i] for i in keep],
+                vectors,
+                [documents[i] for i in keep],
+                [metadatas[i] for i in keep],
+            )
+
+    def delete(self, ids: list[str]) -> None:
+        """Deletes chunks by id, ignoring unknown ids."""
+        if not self.writable:
+            raise PermissionError(f"Flat vector store at {self.directory} is open read-only")
+        with self._lock:
+            self._mark_deleted(ids)
+
+
+def quantization_report(store: FlatVectorStore, n_queries: int = 100, k: int = 5, seed: int = 0) -> dict:
+    """
+    Measure how a quantized store compares to exact float32 search.
+
+    Queries are the normalized midpoints of random pairs of stored vectors, so
+    they land between chunks rather than exactly on one.
+
+    Args:
+        store (FlatVectorStore): The store to evaluate
+        n_queries (int): Number of sampled queries
+        k (int): Results per query
+        seed (int): Random seed for the sampled queries
+    Returns:
+        dict: recall@k and the bytes per chunk scanned by queries, quantized and float32
+    """
+    rows = np.flatnonzero(store.alive[: store.n_rows])
+    if not len(rows):
+        return {}
+    rng = np.random.default_rng(seed)
+    pairs = np.sort(rng.choice(rows, size=(n_queries, 2)), axis=1)
+    queries = np.asarray(store.embeddings[pairs[:, 0]]) + np.asarray(store.embeddings[pairs[:, 1]])
+    scan_bytes = store.codes.itemsize if store.codes is not None else store.embeddings.itemsize
+    return {
+        "quantization": store.meta.get("quantization") or "none",
+        f"recall@{k}": store.measure_recall(queries, k=k),
+        "scan_bytes_per_chunk": scan_bytes * store.dim,
+        "float32_bytes_per_chunk": store.embeddings.itemsize * store.dim,
+    }
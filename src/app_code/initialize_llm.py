@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 from adapters.llm_client_adapter import LLMClientAdapter
 from factories.llm_factory import LLMFactory
 from app_code.utils import load_yaml_config
@@ -31,25 +32,101 @@ def get_llm_parameters(provider_name):
     temperature = input("Enter temperature [default: 0.0]: ").strip()
     temperature = float(temperature) if temperature else 0.0
     return model_name, temperature
-    
-def main() -> LLMClientAdapter:
+
+def create_llm_client(
+    provider_name: str,
+    model_name: Optional[str] = None,
+    temperature: float = 0.0,
+    asynchronous: bool = False,
+    app_config: Optional[dict] = None,
+) -> LLMClientAdapter:
+    """
+    Get the (pooled) client of an LLM, wrapped in the fallback chain when `llm_failover` is enabled.
+
+    Args:
+        provider_name: Primary provider
+        model_name: Primary model. Defaults to the provider's default model
+        temperature: Sampling temperature of every provider of the chain
+        asynchronous: Return a client exposing `ainvoke`/`astream`. Must be called in the event loop using it
+        app_config: The app config. Defaults to config.yaml
+
+    Raises:
+        Exception: If the primary provider's client cannot be created (e.g. missing API key)
+    """
+    # Imported here so httpx is only loaded once an LLM is selected
+    from app_code.llm_client_pool import get_llm_client
+
+    app_config = app_config if app_config is not None else load_yaml_config(APP_CONFIG_FPATH)
+    llm = get_llm_client(provider_name, model_name, temperature, asynchronous=asynchronous)
+
+    failover_config = app_config.get("llm_failover") or {}
+    if not failover_config.get("enabled", False):
+        return llm
+
+    clients = [(provider_name, llm)]
+    default_models = app_config.get("default_llm_models", {})
+    for fallback_name in failover_config.get("fallbacks") or []:
+        if fallback_name == provider_name:
+            continue
+        try:
+            clients.append((
+                fallback_name,
+                get_llm_client(fallback_name, default_models.get(fallback_name), temperature, asynchronous=asynchronous),
+            ))
+        except Exception as e:
+            logger.warning(f"Skipping fallback LLM provider '{fallback_name}': {e}")
+    if len(clients) == 1:
+        logger.warning("No fallback LLM provider is available, serving without failover.")
+        return llm
+
+    # Imported here so the failover machinery is only loaded when enabled
+    from adapters.failover_llm_adapter import FailoverLLMClientAdapter, AsyncFailoverLLMClientAdapter
+    from app_code.rate_limiter import without_rate_limit_retries
+
+    # A 429 goes straight to the circuit breaker, which fails over, instead of being retried
+    clients = [(name, without_rate_limit_retries(client)) for name, client in clients]
+
+    hedging = failover_config.get("hedging") or {}
+    breaker = failover_config.get("circuit_breaker") or {}
+    failover_class = AsyncFailoverLLMClientAdapter if asynchronous else FailoverLLMClientAdapter
+    logger.info(f"LLM fallback chain: {' -> '.join(name for name, _ in clients)}")
+    return failover_class(
+        clients,
+        hedging=hedging.get("enabled", True),
+        hedge_percentile=hedging.get("percentile", 95),
+        hedge_min_samples=hedging.get("min_samples", 20),
+        hedge_initial_delay_s=hedging.get("initial_delay_ms", 2000) / 1000,
+        hedge_min_delay_s=hedging.get("min_delay_ms", 300) / 1000,
+        hedge_max_delay_s=hedging.get("max_delay_ms", 5000) / 1000,
+        max_hedge_ratio=hedging.get("max_hedge_ratio", 0.1),
+        max_workers=hedging.get("max_workers", 16),
+        failure_threshold=breaker.get("failure_threshold", 5),
+        reset_timeout_s=breaker.get("reset_timeout_s", 30),
+        rate_limit_cooldown_s=breaker.get("rate_limit_cooldown_s", 10),
+    )
+
+def main(asynchronous: bool = False) -> LLMClientAdapter:
+    """Interactively choose and instantiate an LLM client, asking again until one can be created.
+
+    Args:
+        asynchronous: Return an AsyncLLMClientAdapter exposing `ainvoke`/`astream`.
+    """
     logger.info("Let us initialize the LLM.")
-    provider_name = get_provider_choice()
-    logger.info(f"Selected provider: {provider_name}")
-    model_name, temperature = get_llm_parameters(provider_name)
-    try:
-        llm_provider = LLMFactory.get_llm_provider(provider_name)
-        llm = llm_provider.create_llm(model_name=model_name, temperature=temperature)
-        logger.info(f"Success! Instantiated '{provider_name.capitalize()}' LLM with model '{model_name}' and temperature {temperature}.")
+    while True:
+        provider_name = get_provider_choice()
+        logger.info(f"Selected provider: {provider_name}")
+        model_name, temperature = get_llm_parameters(provider_name)
+        try:
+            llm = create_llm_client(provider_name, model_name, temperature, asynchronous=asynchronous)
+        except Exception as e:
+            logger.error(f"Error instantiating LLM: {e}")
+            continue
         if llm is None:
             logger.error("LLM initialization failed. Please check your configuration and API keys.")
-            exit()
+            continue
+        logger.info(f"Success! Instantiated '{provider_name.capitalize()}' LLM with model '{model_name}' and temperature {temperature}.")
         return llm
-    except Exception as e:
-        logger.error(f"Error instantiating LLM: {e}")
-        exit()        
 
 if __name__ == "__main__":
     main()
-    
 
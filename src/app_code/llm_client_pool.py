@@ -0,0 +1,236 @@
+"""
+Pool of warm LLM clients, reused per (provider, model, temperature).
+
+Creating a LangChain chat client builds a new SDK client with its own HTTP
+connection pool, so the first request after every `llm` command paid DNS, TLS
+and connection setup again. Clients are instead created once and reused, and
+the OpenAI and Groq clients share one tuned keep-alive `httpx` connection pool
+(`llm_client_pool` in config.yaml). The Google client keeps its own pool, with
+the same limits. With `preconnect`, the connection to a provider is opened as
+soon as its client is created, so the first question does not wait for it.
+
+`httpx` clients are thread-safe; async connections belong to an event loop, so
+each loop gets its own async HTTP client and its own async LLM clients.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Optional
+import httpx
+from adapters.abortable_requests import track_response
+from adapters.llm_client_adapter import LLMClientAdapter
+from factories.llm_factory import LLMFactory
+from app_code.rate_limiter import with_rate_limit
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH
+
+# API hosts the shared HTTP clients connect to, unless overridden by `base_urls`
+DEFAULT_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "groq": "https://api.groq.com",
+}
+
+_config = None
+
+
+def load_llm_client_pool_config() -> dict:
+    """Loads the `llm_client_pool` section of the app config, once."""
+    global _config
+    if _config is None:
+        _config = load_yaml_config(APP_CONFIG_FPATH).get("llm_client_pool") or {}
+    return _config
+
+
+def http_client_settings(config: Optional[dict] = None) -> dict:
+    """`httpx` client arguments (limits, timeouts, HTTP/2) from the pool config."""
+    config = config if config is not None else load_llm_client_pool_config()
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.get("max_connections", 20),
+            max_keepalive_connections=config.get("max_keepalive_connections", 10),
+            keepalive_expiry=config.get("keepalive_expiry_s", 60),
+        ),
+        "timeout": httpx.Timeout(config.get("read_timeout_s", 60), connect=config.get("connect_timeout_s", 5)),
+        "http2": config.get("http2", False),
+    }
+
+
+_http_client = None
+_async_http_clients = weakref.WeakKeyDictionary()
+_http_clients_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """Get the keep-alive HTTP client shared by the synchronous provider clients."""
+    global _http_client
+    if _http_client is None:
+        with _http_clients_lock:
+            if _http_client is None:
+                # Failover streams abort a losing request's response through the hook
+                _http_client = httpx.Client(**http_client_settings(), event_hooks={"response": [track_response]})
+    return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Get the keep-alive async HTTP client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _http_clients_lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            client = _async_http_clients[loop] = httpx.AsyncClient(**http_client_settings())
+    return client
+
+
+def http_client_kwargs(provider_name: str, asynchronous: bool) -> dict:
+    """Client constructor arguments that make a provider's client use the pooled connections."""
+    if provider_name in DEFAULT_BASE_URLS:
+        kwargs = {"http_client": get_http_client()}
+        if asynchronous:
+            kwargs["http_async_client"] = get_async_http_client()
+        return kwargs
+    if provider_name == "google":
+        # google-genai builds its own httpx clients from these arguments
+        return {"client_args": http_client_settings()}
+    # ChatOllama sends plain requests to a local server
+    return {}
+
+
+def base_url(provider_name: str) -> Optional[str]:
+    return (load_llm_client_pool_config().get("base_urls") or {}).get(provider_name)
+
+
+def preconnect(provider_name: str) -> None:
+    """Open a keep-alive connection to a provider's API host through the shared HTTP client."""
+    url = base_url(provider_name) or DEFAULT_BASE_URLS.get(provider_name)
+    if url is None:
+        return
+    try:
+        # Any response will do: the connection stays in the pool for the first real request
+        get_http_client().head(url)
+        logger.debug(f"Pre-connected to {url}.")
+    except httpx.HTTPError as e:
+        logger.debug(f"Pre-connecting to {url} failed: {e}")
+
+
+async def apreconnect(provider_name: str) -> None:
+    """Open a keep-alive connection to a provider's API host through the event loop's HTTP client."""
+    url = base_url(provider_name) or DEFAULT_BASE_URLS.get(provider_name)
+    if url is None:
+        return
+    try:
+        await get_async_http_client().head(url)
+        logger.debug(f"Pre-connected to {url}.")
+    except httpx.HTTPError as e:
+        logger.debug(f"Pre-connecting to {url} failed: {e}")
+
+
+class LLMClientPool:
+    """Creates each (provider, model, temperature) client once and hands out the same instance.
+
+    Async clients are kept per event loop, as their connections cannot move
+    between loops.
+
+    Args:
+        config: The `llm_client_pool` config. Defaults to the app config.
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config if config is not None else load_llm_client_pool_config()
+        self.clients = {}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._preconnects = set()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        provider_name: str,
+        model_name: Optional[str] = None,
+        temperature: float = 0.0,
+        asynchronous: bool = False,
+    ) -> LLMClientAdapter:
+        """
+        Get the pooled client of a provider, model and temperature, creating it on first use.
+
+        Raises:
+            Exception: If the provider's client cannot be created (e.g. missing API key)
+        """
+        provider_name = provider_name.lower()
+        key = (provider_name, model_name, temperature)
+        if asynchronous:
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                clients = self._async_clients.setdefault(loop, {})
+        else:
+            clients = self.clients
+
+        client = clients.get(key)
+        if client is None:
+            with self._lock:
+                client = clients.get(key)
+                if client is None:
+                    client = clients[key] = self.create(provider_name, model_name, temperature, asynchronous)
+        return client
+
+    def create(self, provider_name: str, model_name: Optional[str], temperature: float, asynchronous: bool):
+        llm_provider = LLMFactory.get_llm_provider(provider_name)
+        create = llm_provider.create_async_llm if asynchronous else llm_provider.create_llm
+        kwargs = http_client_kwargs(provider_name, asynchronous)
+        if base_url(provider_name):
+            kwargs["base_url"] = base_url(provider_name)
+        client = with_rate_limit(provider_name, create(model_name=model_name, temperature=temperature, **kwargs))
+        logger.debug(f"Created pooled '{provider_name}' client for model '{model_name}', temperature {temperature}.")
+        if self.config.get("preconnect", True):
+            self.start_preconnect(provider_name, asynchronous)
+        return client
+
+    def start_preconnect(self, provider_name: str, asynchronous: bool) -> None:
+        """Pre-connect in the background, so creating a client never waits for the network."""
+        if asynchronous:
+            task = asyncio.get_running_loop().create_task(apreconnect(provider_name))
+            # Keep a reference until it is done, or the task may be garbage collected
+            self._preconnects.add(task)
+            task.add_done_callback(self._preconnects.discard)
+        else:
+            threading.Thread(
+                target=preconnect, args=(provider_name,), name=f"preconnect-{provider_name}", daemon=True
+            ).start()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_client_pool() -> LLMClientPool:
+    """Gets the process-wide LLM client pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = LLMClientPool()
+    return _pool
+
+
+def get_llm_client(
+    provider_name: str,
+    model_name: Optional[str] = None,
+    temperature: float = 0.0,
+    asynchronous: bool = False,
+) -> LLMClientAdapter:
+    """
+    Get a client of an LLM: the pooled one, or a new client when `llm_client_pool.enabled` is false.
+
+    Either way its requests go through the provider's rate limiter (see `app_code.rate_limiter`).
+
+    Args:
+        provider_name: Provider, e.g. `groq`
+        model_name: Model. Defaults to the provider's default model
+        temperature: Sampling temperature
+        asynchronous: Return a client exposing `ainvoke`/`astream`. Must be called in the event loop using it
+    """
+    if load_llm_client_pool_config().get("enabled", True):
+        return get_llm_client_pool().get(provider_name, model_name, temperature, asynchronous)
+    llm_provider = LLMFactory.get_llm_provider(provider_name)
+    create = llm_provider.create_async_llm if asynchronous else llm_provider.create_llm
+    return with_rate_limit(provider_name.lower(), create(model_name=model_name, temperature=temperature))
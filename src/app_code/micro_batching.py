@@ -0,0 +1,150 @@
+"""
+Dynamic micro-batching for work submitted one item at a time by concurrent callers.
+
+Items are collected for up to `max_wait_ms` or until `max_batch_size` items are
+queued, then processed together in one call and each caller's future is resolved
+with its own result.
+"""
+
+import time
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+from app_code.logger import logger
+
+_STOP = object()
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the q-th percentile (0-100) of a list using nearest-rank, or 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class BatchMetrics:
+    """Batch size distribution and queueing delay of a micro-batcher."""
+
+    def __init__(self, window: int = 1000):
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self.queue_delays_ms = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, batch_size: int, queue_delays_ms: list[float]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.items += batch_size
+            self.batch_sizes[batch_size] += 1
+            self.queue_delays_ms.extend(queue_delays_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            delays = list(self.queue_delays_ms)
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_distribution": dict(sorted(self.batch_sizes.items())),
+                "queue_delay_ms": {
+                    "mean": sum(delays) / len(delays) if delays else 0.0,
+                    "p50": percentile(delays, 50),
+                    "p95": percentile(delays, 95),
+                    "max": max(delays, default=0.0),
+                },
+            }
+
+
+class MicroBatcher:
+    """Collects items submitted by concurrent callers and processes them in batches.
+
+    Args:
+        process_batch: Function mapping a list of items to a list of results, in order.
+        max_batch_size: Maximum number of items processed together.
+        max_wait_ms: Maximum time the first item of a batch waits for others to join.
+        name: Name of the background thread.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[list], list],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher",
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.name = name
+        self.metrics = BatchMetrics()
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        """Queues an item and returns a future resolved with its result."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Submits an item and blocks until its result is available."""
+        return self.submit(item).result()
+
+    def shutdown(self) -> None:
+        """Stops the background thread after the queued items are processed."""
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(_STOP)
+                self._thread.join()
+                self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            stopping = False
+            deadline = entry[2] + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch: list) -> None:
+        started = time.perf_counter()
+        self.metrics.record(len(batch), [(started - queued_at) * 1000 for _, _, queued_at in batch])
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"{self.name} failed to process a batch of {len(batch)}: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
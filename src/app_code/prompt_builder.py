@@ -2,7 +2,17 @@
 Prompt template construction functions for building modular prompts.
 """
 
-from typing import Union, List, Optional, Dict, Any
+import os
+import sys
+import json
+import hashlib
+import threading
+import subprocess
+from dataclasses import dataclass
+from typing import Union, List, Optional, Dict, Any, Tuple
+from app_code.logger import logger
+
+FINAL_INSTRUCTION = "Now perform the task as instructed above."
 
 
 def lowercase_first_char(text: str) -> str:
@@ -32,20 +42,14 @@ def format_prompt_section(lead_in: str, value: Union[str, List[str]]) -> str:
         formatted_value = value
     return f"{lead_in}\n{formatted_value}"
 
-def build_prompt_from_config(
-    config: Dict[str, Any],
-    input_data: str = "",
-    app_config: Optional[Dict[str, Any]] = None,
-) -> str:
-    """Builds a complete prompt string based on a config dictionary.
+def build_instruction_sections(config: Dict[str, Any]) -> List[str]:
+    """Builds the static sections of a prompt, from the role to the goal.
 
     Args:
         config: Dictionary specifying prompt components.
-        input_data: Content to be summarized or processed.
-        app_config: Optional app-wide configuration (e.g., reasoning strategies).
 
     Returns:
-        A fully constructed prompt as a string.
+        The prompt sections, in order.
 
     Raises:
         ValueError: If the required 'instruction' field is missing.
@@ -93,22 +97,208 @@ def build_prompt_from_config(
     if goal := config.get("goal"):
         prompt_parts.append(f"Your goal is to achieve the following outcome:\n{goal}")
 
-    if input_data:
-        prompt_parts.append(
-            "Here is the content you need to work with:\n"
-            "<<<BEGIN CONTENT>>>\n"
-            "```\n" + input_data.strip() + "\n```\n<<<END CONTENT>>>"
-        )
+    return prompt_parts
+
+def build_reasoning_section(
+    config: Dict[str, Any], app_config: Optional[Dict[str, Any]] = None
+) -> Optional[str]:
+    """Looks up the text of the prompt's reasoning strategy, if any.
+
+    Args:
+        config: Dictionary specifying prompt components.
+        app_config: Optional app-wide configuration (e.g., reasoning strategies).
 
+    Returns:
+        The reasoning strategy instructions, or None.
+    """
     reasoning_strategy = config.get("reasoning_strategy")
     if reasoning_strategy and reasoning_strategy != "None" and app_config:
         strategies = app_config.get("reasoning_strategies", {})
         if strategy_text := strategies.get(reasoning_strategy):
-            prompt_parts.append(strategy_text.strip())
+            return strategy_text.strip()
+    return None
+
+def format_content_section(input_data: str) -> str:
+    """Wraps the content to work with in delimiters.
+
+    Args:
+        input_data: Content to be summarized or processed.
+
+    Returns:
+        The delimited content section.
+    """
+    return (
+        "Here is the content you need to work with:\n"
+        "<<<BEGIN CONTENT>>>\n"
+        "```\n" + input_data.strip() + "\n```\n<<<END CONTENT>>>"
+    )
+
+def build_prompt_from_config(
+    config: Dict[str, Any],
+    input_data: str = "",
+    app_config: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Builds a complete prompt string based on a config dictionary.
+
+    Args:
+        config: Dictionary specifying prompt components.
+        input_data: Content to be summarized or processed.
+        app_config: Optional app-wide configuration (e.g., reasoning strategies).
+
+    Returns:
+        A fully constructed prompt as a string.
+
+    Raises:
+        ValueError: If the required 'instruction' field is missing.
+    """
+    prompt_parts = build_instruction_sections(config)
+
+    if input_data:
+        prompt_parts.append(format_content_section(input_data))
 
-    prompt_parts.append("Now perform the task as instructed above.")
+    if reasoning := build_reasoning_section(config, app_config):
+        prompt_parts.append(reasoning)
+
+    prompt_parts.append(FINAL_INSTRUCTION)
     return "\n\n".join(prompt_parts)
 
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A prompt template split into a static system message and a per-request user message.
+
+    Everything that does not depend on the request is in the system message, so
+    it is byte-identical across requests and providers can serve it from their
+    prompt prefix cache.
+
+    Attributes:
+        system_message: All static sections of the prompt.
+        prefix_hash: SHA-256 of the system message, to check prefix stability.
+    """
+
+    system_message: str
+    prefix_hash: str
+
+    def render(self, input_data: str = "") -> List[Tuple[str, str]]:
+        """Builds the (role, content) messages of one request.
+
+        Args:
+            input_data: Content to be summarized or processed.
+
+        Returns:
+            The system message followed by the user message.
+        """
+        user_parts = []
+        if input_data:
+            user_parts.append(format_content_section(input_data))
+        user_parts.append(FINAL_INSTRUCTION)
+        return [("system", self.system_message), ("human", "\n\n".join(user_parts))]
+
+def compile_prompt(
+    config: Dict[str, Any], app_config: Optional[Dict[str, Any]] = None
+) -> CompiledPrompt:
+    """Builds the static part of a prompt once, for rendering many requests.
+
+    Args:
+        config: Dictionary specifying prompt components.
+        app_config: Optional app-wide configuration (e.g., reasoning strategies).
+
+    Returns:
+        The compiled prompt.
+
+    Raises:
+        ValueError: If the required 'instruction' field is missing.
+    """
+    system_parts = build_instruction_sections(config)
+    if reasoning := build_reasoning_section(config, app_config):
+        system_parts.append(reasoning)
+    system_message = "\n\n".join(system_parts)
+    return CompiledPrompt(
+        system_message=system_message,
+        prefix_hash=hashlib.sha256(system_message.encode("utf-8")).hexdigest(),
+    )
+
+_compiled_prompts: Dict[str, CompiledPrompt] = {}
+_compiled_prompts_lock = threading.Lock()
+
+def get_compiled_prompt(
+    config: Dict[str, Any], app_config: Optional[Dict[str, Any]] = None
+) -> CompiledPrompt:
+    """Gets the compiled prompt of a config, compiling it on first use.
+
+    Args:
+        config: Dictionary specifying prompt components.
+        app_config: Optional app-wide configuration (e.g., reasoning strategies).
+
+    Returns:
+        The compiled prompt, shared by all callers with an equal config.
+    """
+    strategies = (app_config or {}).get("reasoning_strategies")
+    key = json.dumps([config, strategies], sort_keys=True, default=str)
+    compiled = _compiled_prompts.get(key)
+    if compiled is None:
+        with _compiled_prompts_lock:
+            compiled = _compiled_prompts.get(key)
+            if compiled is None:
+                compiled = _compiled_prompts[key] = compile_prompt(config, app_config)
+    return compiled
+
+_PREFIX_HASH_SCRIPT = """
+import sys, json
+from app_code.prompt_builder import compile_prompt
+config, app_config = json.load(sys.stdin)
+print(compile_prompt(config, app_config).prefix_hash)
+"""
+
+def _reordered(value: Any) -> Any:
+    """Deep copy of a config with the keys of every dict in reverse order."""
+    if isinstance(value, dict):
+        return {key: _reordered(value[key]) for key in reversed(list(value))}
+    if isinstance(value, list):
+        return [_reordered(item) for item in value]
+    return value
+
+def check_prefix_stability(
+    config: Dict[str, Any], app_config: Optional[Dict[str, Any]] = None, restarts: int = 2
+) -> bool:
+    """Checks that a config always compiles to a byte-identical system message.
+
+    The prefix hash is compared across repeated `get_compiled_prompt` calls, a
+    fresh compilation of a copy of the config with its keys in another order, and
+    compilations in `restarts` new interpreters with different hash seeds, which
+    exposes any dependency on set or dict ordering, object ids or time.
+
+    Args:
+        config: Dictionary specifying prompt components.
+        app_config: Optional app-wide configuration (e.g., reasoning strategies).
+        restarts: Number of new interpreters to compile the prompt in.
+
+    Returns:
+        True if every compilation produced the same prefix hash.
+    """
+    hashes = {
+        "cached": get_compiled_prompt(config, app_config).prefix_hash,
+        "cached_again": get_compiled_prompt(config, app_config).prefix_hash,
+        "reordered": compile_prompt(_reordered(config), _reordered(app_config)).prefix_hash,
+    }
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for seed in range(1, restarts + 1):
+        try:
+            hashes[f"restart_{seed}"] = subprocess.run(
+                [sys.executable, "-c", _PREFIX_HASH_SCRIPT],
+                input=json.dumps([config, app_config], default=str),
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=src_dir,
+                env=dict(os.environ, PYTHONHASHSEED=str(seed), PYTHONPATH=src_dir),
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Could not compile the prompt in a new interpreter: {e}")
+    stable = len(set(hashes.values())) == 1
+    if not stable:
+        logger.warning(f"The system prompt prefix is not stable, provider prompt caching will miss: {hashes}")
+    return stable
+
 def print_prompt_preview(prompt: str, max_length: int = 500) -> None:
     """Prints a preview of the constructed prompt for debugging purposes.
 
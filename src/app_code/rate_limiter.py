@@ -0,0 +1,494 @@
+"""
+Per-provider rate limiting with token buckets and adaptive concurrency.
+
+Every request to a provider first takes a token from its requests/sec bucket
+and its estimated prompt and completion tokens from its tokens/min bucket
+(`rate_limits.providers` in config.yaml); once the real token usage is known the
+difference is settled. The number of requests in flight is limited by AIMD
+(additive increase, multiplicative decrease): the limit grows by one per round
+of successful requests and is halved on a 429 or when latency climbs well above
+its recent median, so throughput settles just under the provider's quota. A
+429 also pauses the provider for its Retry-After delay before the request is
+retried, except in a failover chain, where the circuit breaker fails over.
+
+The limiter wraps the LangChain chat client, behind the response cache, and
+works for both `invoke`/`stream` and `ainvoke`/`astream`. Its state is exported
+as `rag_llm_limiter_*` gauges labeled by provider.
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Iterator, Optional
+from adapters.provider_errors import is_rate_limit_error, retry_after_seconds
+from app_code.micro_batching import percentile
+from app_code.telemetry import estimate_tokens, label_key, metrics, prompt_text
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH
+
+_config = None
+
+
+def load_rate_limits_config() -> dict:
+    """Loads the `rate_limits` section of the app config, once."""
+    global _config
+    if _config is None:
+        _config = load_yaml_config(APP_CONFIG_FPATH).get("rate_limits") or {}
+    return _config
+
+
+class TokenBucket:
+    """Token bucket refilled at a constant rate.
+
+    `reserve` never blocks: it takes the tokens, possibly going into debt, and
+    returns how long the caller must wait before using them, so the same bucket
+    serves threads (`time.sleep`) and coroutines (`asyncio.sleep`).
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Largest number of tokens the bucket holds, i.e. the burst size.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` tokens and returns the seconds to wait until they are available."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def settle(self, amount: float) -> None:
+        """Takes (or gives back, if negative) tokens once the real cost of a request is known."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limits the requests in flight, adapting the limit with AIMD.
+
+    Threads and coroutines wait in one FIFO queue, so sync and async callers of
+    the same provider share its limit.
+
+    Args:
+        initial: Starting limit.
+        minimum: Lowest limit.
+        maximum: Highest limit.
+        decrease_factor: Factor the limit is multiplied by on congestion.
+        latency_tolerance: Latency above this multiple of the recent median counts as congestion.
+        min_samples: Latencies recorded before latency is used as a congestion signal.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        min_samples: int = 20,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.min_samples = min_samples
+        self.in_flight = 0
+        self.latencies = deque(maxlen=200)
+        self.decreased_at = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(self.minimum, int(self.limit))
+
+    def _wake(self) -> None:
+        """Hands free slots to the longest waiting callers. Called with the lock held."""
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            # The waiting task gave up before it got the slot
+            self.release()
+        else:
+            future.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def acquire(self) -> None:
+        """Waits for a free slot, blocking the thread."""
+        with self._lock:
+            if not self._waiters and self._has_slot():
+                self.in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self) -> None:
+        """Waits for a free slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._has_slot():
+                self.in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _decrease(self, now: float, reason: str) -> None:
+        # One decrease per round of requests, not one per request of the same burst
+        cooldown = percentile(list(self.latencies), 50) if self.latencies else 1.0
+        if now - self.decreased_at < cooldown:
+            return
+        self.decreased_at = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        logger.debug(f"Concurrency limit decreased to {self.limit:.1f} ({reason}).")
+
+    def on_success(self, latency: float) -> None:
+        """Grows the limit after a successful request, or shrinks it if the latency signals congestion."""
+        with self._lock:
+            now = time.monotonic()
+            congested = (
+                len(self.latencies) >= self.min_samples
+                and latency > self.latency_tolerance * percentile(list(self.latencies), 50)
+            )
+            self.latencies.append(latency)
+            if congested:
+                self._decrease(now, f"latency {latency:.2f}s")
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._wake()
+
+    def on_rate_limit(self) -> None:
+        with self._lock:
+            self._decrease(time.monotonic(), "rate limited")
+
+
+class ProviderLimiter:
+    """The request/sec and tokens/min buckets, concurrency limit and Retry-After pause of one provider.
+
+    Args:
+        name: Provider name, for logs and metrics.
+        requests_per_second: Request rate. None for no limit.
+        tokens_per_minute: Prompt plus completion token rate. None for no limit.
+        burst: Requests that may be sent at once when the bucket is full. Defaults to one second's worth.
+        concurrency: `AdaptiveConcurrencyLimiter` settings.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_second: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        burst: Optional[float] = None,
+        concurrency: Optional[dict] = None,
+    ):
+        self.name = name
+        self.requests = None
+        if requests_per_second:
+            self.requests = TokenBucket(requests_per_second, burst or max(1.0, requests_per_second))
+        self.tokens = None
+        if tokens_per_minute:
+            self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.concurrency = AdaptiveConcurrencyLimiter(**(concurrency or {}))
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """Takes a request and `tokens` from the buckets and returns the seconds to wait before sending it."""
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.reserve(tokens))
+        with self._lock:
+            wait = max(wait, self.paused_until - time.monotonic())
+        if wait > 0:
+            metrics.increment("rag_llm_limiter_wait_seconds_total", wait, provider=self.name)
+        return wait
+
+    def settle(self, tokens: int) -> None:
+        """Corrects the tokens/min bucket by the difference between the real and estimated tokens."""
+        if self.tokens is not None and tokens:
+            self.tokens.settle(tokens)
+
+    def on_rate_limit(self, error: BaseException) -> float:
+        """Pauses the provider for its Retry-After delay and shrinks the concurrency. Returns the delay."""
+        delay = retry_after_seconds(error)
+        delay = 1.0 if delay is None else delay
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        self.concurrency.on_rate_limit()
+        metrics.increment("rag_llm_limiter_429_total", provider=self.name)
+        logger.warning(f"'{self.name}' rate limited the request, pausing it for {delay:.1f}s.")
+        return delay
+
+    def state(self) -> dict[str, float]:
+        state = {
+            "concurrency_limit": self.concurrency.limit,
+            "in_flight": self.concurrency.in_flight,
+            "waiting": self.concurrency.waiting,
+            "paused_seconds": max(0.0, self.paused_until - time.monotonic()),
+        }
+        if self.requests is not None:
+            state["request_tokens"] = self.requests.available()
+        if self.tokens is not None:
+            state["llm_tokens"] = self.tokens.available()
+        return state
+
+
+_limiters: dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider_name: str) -> Optional[ProviderLimiter]:
+    """Get the process-wide limiter of a provider, or None if rate limiting is disabled."""
+    config = load_rate_limits_config()
+    if not config.get("enabled", True):
+        return None
+    if provider_name not in _limiters:
+        with _limiters_lock:
+            if provider_name not in _limiters:
+                provider_config = (config.get("providers") or {}).get(provider_name) or {}
+                concurrency = dict(config.get("adaptive_concurrency") or {})
+                concurrency.update(provider_config.get("concurrency") or {})
+                _limiters[provider_name] = ProviderLimiter(
+                    provider_name,
+                    requests_per_second=provider_config.get("requests_per_second"),
+                    tokens_per_minute=provider_config.get("tokens_per_minute"),
+                    burst=provider_config.get("burst"),
+                    concurrency=concurrency,
+                )
+    return _limiters[provider_name]
+
+
+def collect_limiter_metrics() -> dict[str, dict[tuple, float]]:
+    """Concurrency limit, requests in flight and waiting, and bucket levels, as gauges labeled by provider."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    gauges = {}
+    for limiter in limiters:
+        for key, value in limiter.state().items():
+            gauges.setdefault(f"rag_llm_limiter_{key}", {})[label_key(provider=limiter.name)] = value
+    return gauges
+
+
+metrics.register_collector(collect_limiter_metrics)
+
+
+def usage_tokens(message: Any) -> Optional[int]:
+    """Total tokens a provider reported for a response or stream chunk, if any."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+class RateLimitedChatClient:
+    """Chat client proxy sending each request through a provider limiter.
+
+    Rate-limited (429) requests are retried after the provider's Retry-After
+    delay, up to `max_retries` times. A stream is only retried if it failed
+    before its first chunk. The tokens reserved for a failed attempt are given
+    back to the tokens/min bucket.
+
+    Args:
+        llm_client: The LangChain chat client.
+        limiter: The provider's limiter.
+        max_retries: Retries of a rate-limited request.
+        expected_completion_tokens: Completion tokens reserved per request until the real usage is known.
+    """
+
+    def __init__(
+        self,
+        llm_client,
+        limiter: ProviderLimiter,
+        max_retries: int = 3,
+        expected_completion_tokens: int = 300,
+    ):
+        self.llm_client = llm_client
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.expected_completion_tokens = expected_completion_tokens
+
+    def __getattr__(self, name: str) -> Any:
+        # Model name, temperature, LLM type... of the wrapped client
+        return getattr(self.llm_client, name)
+
+    def estimate(self, prompt: Any) -> int:
+        return estimate_tokens(prompt_text(prompt)) + self.expected_completion_tokens
+
+    def invoke(self, input: Any, **kwargs) -> Any:
+        tokens = self.estimate(input)
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.limiter.reserve(tokens))
+            self.limiter.concurrency.acquire()
+            start_time = time.perf_counter()
+            try:
+                response = self.llm_client.invoke(input, **kwargs)
+            except Exception as e:
+                # The failed attempt used no tokens; give its reservation back
+                self.limiter.settle(-tokens)
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.limiter.on_rate_limit(e)
+                continue
+            finally:
+                self.limiter.concurrency.release()
+            self.limiter.concurrency.on_success(time.perf_counter() - start_time)
+            self.limiter.settle((usage_tokens(response) or tokens) - tokens)
+            return response
+
+    def stream(self, input: Any, **kwargs) -> Iterator[Any]:
+        tokens = self.estimate(input)
+        for attempt in range(self.max_retries + 1):
+            time.sleep(self.limiter.reserve(tokens))
+            self.limiter.concurrency.acquire()
+            start_time = time.perf_counter()
+            streamed, used_tokens = False, 0
+            try:
+                for chunk in self.llm_client.stream(input, **kwargs):
+                    if not streamed:
+                        # The time to first chunk is the latency signal, whatever the answer length
+                        self.limiter.concurrency.on_success(time.perf_counter() - start_time)
+                        streamed = True
+                    used_tokens += usage_tokens(chunk) or 0
+                    yield chunk
+            except Exception as e:
+                if not streamed:
+                    self.limiter.settle(-tokens)
+                if streamed or not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.limiter.on_rate_limit(e)
+                continue
+            finally:
+                self.limiter.concurrency.release()
+            self.limiter.settle((used_tokens or tokens) - tokens)
+            return
+
+    async def ainvoke(self, input: Any, **kwargs) -> Any:
+        tokens = self.estimate(input)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.limiter.reserve(tokens))
+            await self.limiter.concurrency.aacquire()
+            start_time = time.perf_counter()
+            try:
+                response = await self.llm_client.ainvoke(input, **kwargs)
+            except Exception as e:
+                # The failed attempt used no tokens; give its reservation back
+                self.limiter.settle(-tokens)
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.limiter.on_rate_limit(e)
+                continue
+            finally:
+                self.limiter.concurrency.release()
+            self.limiter.concurrency.on_success(time.perf_counter() - start_time)
+            self.limiter.settle((usage_tokens(response) or tokens) - tokens)
+            return response
+
+    async def astream(self, input: Any, **kwargs) -> AsyncIterator[Any]:
+        tokens = self.estimate(input)
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(self.limiter.reserve(tokens))
+            await self.limiter.concurrency.aacquire()
+            start_time = time.perf_counter()
+            streamed, used_tokens = False, 0
+            try:
+                async for chunk in self.llm_client.astream(input, **kwargs):
+                    if not streamed:
+                        self.limiter.concurrency.on_success(time.perf_counter() - start_time)
+                        streamed = True
+                    used_tokens += usage_tokens(chunk) or 0
+                    yield chunk
+            except Exception as e:
+                if not streamed:
+                    self.limiter.settle(-tokens)
+                if streamed or not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.limiter.on_rate_limit(e)
+                continue
+            finally:
+                self.limiter.concurrency.release()
+            self.limiter.settle((used_tokens or tokens) - tokens)
+            return
+
+
+def with_rate_limit(provider_name: str, llm: Any) -> Any:
+    """
+    Send the requests of an LLM client adapter through its provider's limiter.
+
+    Returns:
+        The adapter, of the same class, around a rate-limited chat client, or the
+        adapter itself if rate limiting is disabled
+    """
+    limiter = get_provider_limiter(provider_name)
+    if limiter is None:
+        return llm
+    config = load_rate_limits_config()
+    llm_client = RateLimitedChatClient(
+        llm.llm_client,
+        limiter,
+        max_retries=config.get("max_retries", 3),
+        expected_completion_tokens=config.get("expected_completion_tokens", 300),
+    )
+    return type(llm)(llm_client, provider=llm.provider, model_name=llm.model_name, temperature=llm.temperature)
+
+
+def without_rate_limit_retries(llm: Any) -> Any:
+    """
+    The same rate-limited adapter, raising 429s at once instead of retrying them.
+
+    Used for the clients of a failover chain, whose circuit breakers handle rate
+    limits by failing over to the next provider.
+    """
+    llm_client = llm.llm_client
+    if not isinstance(llm_client, RateLimitedChatClient) or llm_client.max_retries == 0:
+        return llm
+    llm_client = RateLimitedChatClient(
+        llm_client.llm_client,
+        llm_client.limiter,
+        max_retries=0,
+        expected_completion_tokens=llm_client.expected_completion_tokens,
+    )
+    return type(llm)(llm_client, provider=llm.provider, model_name=llm.model_name, temperature=llm.temperature)
@@ -0,0 +1,105 @@
+"""
+Second-stage reranking of retrieved chunks with a local cross-encoder.
+
+Retrieval over-fetches a candidate pool, the cross-encoder scores each
+(query, chunk) pair and only the best few chunks are sent to the LLM. Pair
+scores are cached by (query hash, chunk id), so repeated questions only score
+chunks they have not seen before.
+"""
+
+import threading
+from typing import Optional
+from app_code.retrieval_cache import LRUCache, normalize_query
+from app_code.embedding_service import resolve_device
+from app_code.utils import load_yaml_config, hash_text
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH
+
+
+def load_rerank_config() -> dict:
+    """Loads the `vectordb.rerank` section of the app config."""
+    vectordb_config = load_yaml_config(APP_CONFIG_FPATH).get("vectordb") or {}
+    return vectordb_config.get("rerank") or {}
+
+
+class Reranker:
+    """Scores (query, chunk) pairs with a cross-encoder loaded from a local path.
+
+    Args:
+        model_path: Local directory of a sentence-transformers CrossEncoder model.
+        device: Torch device, or None/"auto" to pick the best available one.
+        batch_size: Number of pairs scored per forward pass.
+        score_cache_size: Maximum number of cached (query, chunk) scores.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        device: Optional[str] = None,
+        batch_size: int = 16,
+        score_cache_size: int = 4096,
+    ):
+        # sentence-transformers is only needed when reranking is enabled
+        from sentence_transformers import CrossEncoder
+
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.device = resolve_device(device)
+        logger.debug(f"Loading cross-encoder from '{model_path}' on {self.device}")
+        self.model = CrossEncoder(model_path, device=self.device)
+        self.score_cache = LRUCache(max_entries=score_cache_size)
+        self._lock = threading.Lock()
+
+    def score(self, query: str, chunk_ids: list[str], documents: list[str]) -> list[float]:
+        """Returns the relevance score of each document to the query."""
+        query_hash = hash_text(normalize_query(query))
+        scores = [self.score_cache.get((query_hash, chunk_id)) for chunk_id in chunk_ids]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            with self._lock:
+                predicted = self.model.predict(
+                    [(query, documents[i]) for i in missing],
+                    batch_size=self.batch_size,
+                    show_progress_bar=False,
+                )
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self.score_cache.put((query_hash, chunk_ids[i]), scores[i])
+        return scores
+
+    def rerank(
+        self, query: str, chunk_ids: list[str], documents: list[str], top_k: int
+    ) -> tuple[list[str], list[str]]:
+        """Returns the ids and documents of the `top_k` best scoring chunks, best first."""
+        if not chunk_ids:
+            return [], []
+        scores = self.score(query, chunk_ids, documents)
+        order = sorted(range(len(chunk_ids)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [chunk_ids[i] for i in order], [documents[i] for i in order]
+
+
+_reranker = None
+_reranker_loaded = False
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """Gets the process-wide reranker, or None if reranking is disabled."""
+    global _reranker, _reranker_loaded
+    if not _reranker_loaded:
+        with _reranker_lock:
+            if not _reranker_loaded:
+                config = load_rerank_config()
+                if config.get("enabled", False):
+                    if config.get("model_path"):
+                        _reranker = Reranker(
+                            model_path=config["model_path"],
+                            device=config.get("device"),
+                            batch_size=config.get("batch_size", 16),
+                            score_cache_size=config.get("score_cache_size", 4096),
+                        )
+                    else:
+                        logger.warning("Reranking is enabled but vectordb.rerank.model_path is not set.")
+                _reranker_loaded = True
+    return _reranker
@@ -0,0 +1,213 @@
+"""
+Persistent cache of LLM responses, stored in SQLite under `outputs/`.
+
+Responses are keyed by a hash of (provider, model, temperature, prompt) and are
+only cached for deterministic temperature-0 calls. The database is shared by all
+processes (REPL, server workers), so an answered question is free for all of them
+until its entry expires or is evicted as least recently used.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Hashable, Optional
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, LLM_RESPONSE_CACHE_DB_FPATH
+
+
+def response_cache_key(provider: str, model_name: str, temperature: float, prompt) -> str:
+    """Hashes the parameters that determine a deterministic response."""
+    payload = json.dumps([provider, model_name, temperature, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """A size-bounded, expiring SQLite key-value store for response texts.
+
+    Args:
+        db_path: SQLite database file.
+        ttl_seconds: Age after which an entry is ignored and deleted, or None to keep entries.
+        max_entries: Entries kept; the least recently used are evicted beyond this.
+        touch_batch_size: Hits whose last use time is buffered before it is written.
+    """
+
+    def __init__(
+        self,
+        db_path: str = LLM_RESPONSE_CACHE_DB_FPATH,
+        ttl_seconds: Optional[float] = None,
+        max_entries: int = 10000,
+        touch_batch_size: int = 64,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_batch_size = touch_batch_size
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._connection = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        # WAL lets several processes read while one writes
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used_at)")
+        self._connection.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response, or None on a miss or a database error."""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self._expired(row[1], now):
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._connection.commit()
+                    row = None
+            except sqlite3.Error as e:
+                self._rollback()
+                logger.warning(f"LLM response cache lookup failed, treating it as a miss: {e}")
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            # Recency is written in batches rather than with a commit per hit
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch_size:
+                self._flush_touched()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self) -> None:
+        """Writes the last use times of recent hits. Called with the lock held."""
+        if not self._touched:
+            return
+        try:
+            self._connection.executemany(
+                "UPDATE responses SET last_used_at = ? WHERE key = ?",
+                [(used_at, key) for key, used_at in self._touched.items()],
+            )
+            self._connection.commit()
+        except sqlite3.Error as e:
+            self._rollback()
+            logger.warning(f"Could not update LLM response cache recency: {e}")
+        self._touched.clear()
+
+    def _rollback(self) -> None:
+        try:
+            self._connection.rollback()
+        except sqlite3.Error:
+            pass
+
+    def put(self, key: str, response: str) -> None:
+        """Stores a response, evicting expired and least recently used entries. Skipped on a database error."""
+        now = time.time()
+        with self._lock:
+            self._flush_touched()
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                if self.ttl_seconds is not None:
+                    self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._connection.execute(
+                    """
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.max_entries,),
+                )
+                self._connection.commit()
+            except sqlite3.Error as e:
+                self._rollback()
+                logger.warning(f"Could not store the LLM response in the cache: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            try:
+                entries, size = self._connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(response)), 0) FROM responses"
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not read LLM response cache stats: {e}")
+                entries, size = 0, 0
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "memory_bytes": size,
+            }
+
+
+_response_cache = None
+_response_cache_loaded = False
+_response_cache_lock = threading.Lock()
+
+
+def load_response_cache_config() -> dict:
+    """Loads the `llm_response_cache` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("llm_response_cache") or {}
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Gets the process-wide response cache, or None if it is disabled."""
+    global _response_cache, _response_cache_loaded
+    if not _response_cache_loaded:
+        with _response_cache_lock:
+            if not _response_cache_loaded:
+                config = load_response_cache_config()
+                if config.get("enabled", True):
+                    try:
+                        _response_cache = ResponseCache(
+                            ttl_seconds=config.get("ttl_seconds"),
+                            max_entries=config.get("max_entries", 10000),
+                        )
+                    except sqlite3.Error as e:
+                        logger.warning(f"LLM response cache disabled, could not open {LLM_RESPONSE_CACHE_DB_FPATH}: {e}")
+                _response_cache_loaded = True
+    return _response_cache
+
+
+def is_cacheable_prompt(prompt) -> bool:
+    """Whether a prompt is a string or a list of (role, content) string pairs."""
+    if isinstance(prompt, str):
+        return True
+    return isinstance(prompt, (list, tuple)) and all(
+        isinstance(message, tuple) and len(message) == 2 and all(isinstance(part, str) for part in message)
+        for message in prompt
+    )
+
+
+def cacheable_key(provider: Hashable, model_name: Hashable, temperature: Optional[float], prompt, kwargs: dict) -> Optional[str]:
+    """Returns the cache key of a call, or None if its response is not deterministic or not cacheable."""
+    if temperature != 0 or kwargs or not is_cacheable_prompt(prompt) or get_response_cache() is None:
+        return None
+    return response_cache_key(str(provider), str(model_name), float(temperature), prompt)
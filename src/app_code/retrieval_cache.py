@@ -0,0 +1,251 @@
+"""
+Two-level cache for the retrieval path.
+
+Level 1 maps normalized query text to its embedding, level 2 maps
+(query embedding, retrieval parameters, collection version) to the retrieved
+documents. Any write to the collection bumps its version, which invalidates
+level 2 without touching the embeddings.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import numpy as np
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, COLLECTION_VERSION_FPATH
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """Roughly estimates the memory held by a cached value, in bytes."""
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + value.nbytes
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """A thread-safe LRU cache with optional TTL, hit/miss counters and size tracking."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.memory_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Returns the cached value for a key, or `default` on a miss or expiry."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[2] is not None and entry[2] < time.monotonic():
+                self._pop(key)
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Caches a value, evicting least recently used entries beyond `max_entries`."""
+        if self.max_entries <= 0:
+            return
+        size = self.sizeof(value)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, size, expires_at)
+            self.memory_bytes += size
+            while len(self._entries) > self.max_entries:
+                self._pop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Drops all entries, keeping the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.memory_bytes = 0
+
+    def _pop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.memory_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters, hit ratio, entry count and estimated memory use."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self.memory_bytes,
+            }
+
+
+_query_embedding_cache = None
+_results_cache = None
+_caches_lock = threading.Lock()
+_local_collection_version = 0
+
+
+def load_cache_config() -> dict:
+    """Loads the `retrieval_cache` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("retrieval_cache") or {}
+
+
+def _get_caches() -> tuple[Optional[LRUCache], Optional[LRUCache]]:
+    """Gets or creates the process-wide query embedding and results caches."""
+    global _query_embedding_cache, _results_cache
+    if _query_embedding_cache is None:
+        with _caches_lock:
+            if _query_embedding_cache is None:
+                config = load_cache_config()
+                enabled = config.get("enabled", True)
+                _results_cache = LRUCache(
+                    max_entries=config.get("results_max_entries", 512) if enabled else 0,
+                    ttl_seconds=config.get("results_ttl_seconds"),
+                )
+                _query_embedding_cache = LRUCache(
+                    max_entries=config.get("query_embedding_max_entries", 1024) if enabled else 0,
+                    ttl_seconds=config.get("query_embedding_ttl_seconds"),
+                )
+    return _query_embedding_cache, _results_cache
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes query text so trivially different questions share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def get_query_embedding(query: str, embed: Callable[[str], list[float]], model_key: Hashable = None) -> list[float]:
+    """Returns the embedding of a query, computing it with `embed` on a cache miss.
+
+    Args:
+        query: The query text.
+        embed: Function embedding a single query string.
+        model_key: Identifies the embedding model, so different models never share entries.
+    """
+    cache, _ = _get_caches()
+    normalized = normalize_query(query)
+    key = (model_key, normalized)
+    embedding = cache.get(key)
+    if embedding is None:
+        embedding = embed(normalized)
+        cache.put(key, embedding)
+    return embedding
+
+
+def get_query_embeddings(
+    queries: list[str], embed_many: Callable[[list[str]], list[list[float]]], model_key: Hashable = None
+) -> list[list[float]]:
+    """Returns the embeddings of many queries, computing the cache misses with one `embed_many` call.
+
+    Args:
+        queries: The query texts.
+        embed_many: Function embedding a list of query strings.
+        model_key: Identifies the embedding model, so different models never share entries.
+    """
+    cache, _ = _get_caches()
+    normalized = [normalize_query(query) for query in queries]
+    embeddings = [cache.get((model_key, query)) for query in normalized]
+    # Each distinct query is embedded once, however often it repeats in the batch
+    missing = list(dict.fromkeys(query for query, embedding in zip(normalized, embeddings) if embedding is None))
+    computed = dict(zip(missing, embed_many(missing))) if missing else {}
+    for query, embedding in computed.items():
+        cache.put((model_key, query), embedding)
+    return [embedding if embedding is not None else computed[query] for query, embedding in zip(normalized, embeddings)]
+
+
+def embedding_digest(embedding) -> str:
+    """Returns a compact, hashable digest of an embedding vector."""
+    return hashlib.blake2b(np.asarray(embedding, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+
+
+def results_cache_key(embedding, *params: Hashable) -> tuple:
+    """Builds the level 2 key from the query embedding, retrieval parameters and collection version."""
+    return (embedding_digest(embedding), *params, collection_version())
+
+
+def get_cached_results(key: tuple) -> Optional[Any]:
+    """Returns cached retrieval results for a key, or None."""
+    _, cache = _get_caches()
+    return cache.get(key)
+
+
+def cache_results(key: tuple, results: Any) -> None:
+    """Caches retrieval results under a key built by `results_cache_key`."""
+    _, cache = _get_caches()
+    cache.put(key, results)
+
+
+def collection_version() -> tuple:
+    """Returns a token that changes whenever the collection is written to.
+
+    Combines an in-process counter with the mtime of the version file that
+    ingestion touches, so writes made by another process are also picked up.
+    """
+    try:
+        file_version = os.stat(COLLECTION_VERSION_FPATH).st_mtime_ns
+    except OSError:
+        file_version = None
+    return (_local_collection_version, file_version)
+
+
+def mark_collection_changed(persist: bool = False) -> None:
+    """Invalidates cached retrieval results after the collection changed.
+
+    Args:
+        persist: Also touch the on-disk version file so other processes notice the change.
+    """
+    global _local_collection_version
+    with _caches_lock:
+        _local_collection_version += 1
+    if _results_cache is not None:
+        _results_cache.clear()
+    if persist:
+        try:
+            os.makedirs(os.path.dirname(COLLECTION_VERSION_FPATH), exist_ok=True)
+            with open(COLLECTION_VERSION_FPATH, "w", encoding="utf-8") as f:
+                f.write(str(time.time_ns()))
+        except OSError as e:
+            logger.warning(f"Could not update collection version file: {e}")
+
+
+def clear_caches() -> None:
+    """Empties both retrieval caches, e.g. to measure uncached retrieval."""
+    for cache in _get_caches():
+        cache.clear()
+
+
+def get_cache_stats() -> dict:
+    """Returns the stats of both retrieval caches."""
+    query_embedding_cache, results_cache = _get_caches()
+    return {
+        "query_embedding": query_embedding_cache.stats(),
+        "results": results_cache.stats(),
+    }
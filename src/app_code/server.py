@@ -0,0 +1,158 @@
+"""
+HTTP serving mode for the RAG assistant.
+
+The collection, embedding model and LLM client are loaded once per worker
+process at startup. Requests are handled concurrently on the event loop using
+the async query pipeline. Run from the `src` directory with:
+
+    python -m app_code.server
+
+Several workers can serve the same `outputs/vector_db`, e.g. behind a load balancer.
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from app_code.initialize_llm import create_llm_client
+from app_code import async_rag
+from app_code.chroma_db_rag import get_rag_collection, retrieval_params
+from app_code.embedding_service import warm_up as warm_up_embeddings
+from app_code.telemetry import metrics
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, PROMPT_CONFIG_FPATH
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    n_results: Optional[int] = Field(None, ge=1)
+    threshold: Optional[float] = Field(None, ge=0.0, le=2.0)
+
+
+class QueryResponse(BaseModel):
+    answer: str
+    elapsed_seconds: float
+
+
+def load_server_config() -> dict:
+    """Loads the `server` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("server") or {}
+
+
+def create_server_llm(app_config: dict):
+    """Creates the async LLM client configured for serving."""
+    server_config = app_config.get("server") or {}
+    provider_name = server_config.get("provider", "groq")
+    model_name = server_config.get("model_name") or app_config.get("default_llm_models", {}).get(provider_name)
+    temperature = server_config.get("temperature", 0.0)
+
+    llm = create_llm_client(provider_name, model_name, temperature, asynchronous=True, app_config=app_config)
+    logger.info(f"Serving with '{provider_name}' LLM, model '{model_name}', temperature {temperature}.")
+    return llm
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app_config = load_yaml_config(APP_CONFIG_FPATH)
+    prompt_config = load_yaml_config(PROMPT_CONFIG_FPATH)
+
+    app.state.ready = False
+    app.state.prompt_config = prompt_config["rag_assistant_prompt"]
+    app.state.vectordb_params = retrieval_params(app_config["vectordb"])
+    app.state.llm = create_server_llm(app_config)
+    await async_rag.run_blocking(warm_up_embeddings, force=True)
+    app.state.ready = await async_rag.run_blocking(get_rag_collection) is not None
+    if not app.state.ready:
+        logger.warning("Collection 'publications' not found. Run ingestion before serving.")
+    try:
+        yield
+    finally:
+        async_rag.shutdown_executor()
+
+
+app = FastAPI(title="RAG-Bot", lifespan=lifespan)
+
+
+def query_params(request: QueryRequest) -> dict:
+    """Merges per-request retrieval overrides with the configured defaults."""
+    params = dict(app.state.vectordb_params)
+    if request.n_results is not None:
+        params["n_results"] = request.n_results
+    if request.threshold is not None:
+        params["threshold"] = request.threshold
+    return params
+
+
+async def ensure_ready() -> None:
+    if not app.state.ready:
+        # The collection may have been ingested since startup; opening it blocks
+        app.state.ready = await async_rag.run_blocking(get_rag_collection) is not None
+    if not app.state.ready:
+        raise HTTPException(status_code=503, detail="Vector database is not ready.")
+
+
+@app.get("/health")
+async def health():
+    """Liveness probe: the process is up."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: the collection, embedding model and LLM client are loaded."""
+    if not app.state.ready:
+        app.state.ready = await async_rag.run_blocking(get_rag_collection) is not None
+    status_code = 200 if app.state.ready else 503
+    return JSONResponse({"ready": app.state.ready}, status_code=status_code)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Stage latency histograms, token counters and cache gauges in the Prometheus text format."""
+    text = await async_rag.run_blocking(metrics.to_prometheus)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(request: QueryRequest):
+    """Answers a question with the full response in one body."""
+    await ensure_ready()
+    start_time = time.perf_counter()
+    answer = await async_rag.respond_to_query(
+        prompt_config=app.state.prompt_config,
+        query=request.query,
+        llm=app.state.llm,
+        **query_params(request),
+    )
+    return QueryResponse(answer=answer, elapsed_seconds=time.perf_counter() - start_time)
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """Answers a question, streaming the response text as it is generated."""
+    await ensure_ready()
+    tokens = async_rag.respond_to_query_stream(
+        prompt_config=app.state.prompt_config,
+        query=request.query,
+        llm=app.state.llm,
+        **query_params(request),
+    )
+    return StreamingResponse(tokens, media_type="text/plain; charset=utf-8")
+
+
+def main():
+    server_config = load_server_config()
+    uvicorn.run(
+        "app_code.server:app",
+        host=server_config.get("host", "127.0.0.1"),
+        port=server_config.get("port", 8000),
+        workers=server_config.get("workers", 1),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Per-stage latency metrics for the query and ingestion paths.
+
+Stages are timed with `query_stage(...)` / `ingest_stage(...)` spans, which feed
+histograms (count, sum, buckets and recent-window percentiles). Counters track
+queries and LLM tokens, and collectors registered by other modules add gauges
+such as cache hit ratios at export time. Metrics can be rendered in the
+Prometheus text format or written as JSON.
+
+An opt-in sampling profiler samples the stack of the thread answering a query
+and dumps the collapsed stacks (flamegraph format) of queries slower than a
+threshold to `outputs/profiles/`.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Union
+from app_code.micro_batching import percentile
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, PROFILES_DIR
+
+QUERY_STAGE_SECONDS = "rag_query_stage_seconds"
+INGEST_STAGE_SECONDS = "rag_ingest_stage_seconds"
+QUERY_SECONDS = "rag_query_seconds"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative bucket counts plus a window of recent samples for percentiles.
+
+    Args:
+        buckets: Upper bounds in seconds, ascending.
+        window: Number of recent samples kept for percentiles.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS, window: int = 2048):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def summary(self) -> dict:
+        recent = list(self.recent)
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": percentile(recent, 50),
+            "p95": percentile(recent, 95),
+            "p99": percentile(recent, 99),
+            "max": max(recent, default=0.0),
+        }
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def label_key(**labels) -> tuple:
+    """Series key of a labeled gauge returned by a collector, e.g. {name: {label_key(provider="groq"): 1.0}}."""
+    return _label_key(labels)
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of histograms, counters and gauge collectors."""
+
+    def __init__(self):
+        self.histograms: dict[str, dict[tuple, Histogram]] = {}
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.collectors: list[Callable[[], dict[str, Union[float, dict[tuple, float]]]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def counter_total(self, name: str, **labels) -> float:
+        """Sum of a counter over all series matching the given labels."""
+        with self._lock:
+            return sum(
+                value
+                for key, value in self.counters.get(name, {}).items()
+                if all(dict(key).get(label) == wanted for label, wanted in labels.items())
+            )
+
+    def register_collector(self, collector: Callable[[], dict[str, Union[float, dict[tuple, float]]]]) -> None:
+        """Registers a function returning {gauge name: value}, called at export time.
+
+        A labeled gauge maps its name to {label_key(...): value} for each of its series.
+        """
+        with self._lock:
+            self.collectors.append(collector)
+
+    def collect_gauges(self) -> dict[str, dict[tuple, float]]:
+        """Gauge name -> {label key: value}, from every collector."""
+        gauges = {}
+        for collector in list(self.collectors):
+            try:
+                for name, value in collector().items():
+                    series = gauges.setdefault(name, {})
+                    if isinstance(value, dict):
+                        series.update(value)
+                    else:
+                        series[()] = value
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector.__name__} failed: {e}")
+        return gauges
+
+    def to_json(self) -> dict:
+        with self._lock:
+            histograms = {
+                name: {_format_labels(key) or "all": histogram.summary() for key, histogram in series.items()}
+                for name, series in self.histograms.items()
+            }
+            counters = {
+                name: {_format_labels(key) or "all": value for key, value in series.items()}
+                for name, series in self.counters.items()
+            }
+        gauges = {
+            name: series[()] if list(series) == [()] else {_format_labels(key) or "all": value for key, value in series.items()}
+            for name, series in self.collect_gauges().items()
+        }
+        return {"histograms": histograms, "counters": counters, "gauges": gauges}
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self.histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.bucket_counts):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+            for name, series in self.counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self.collect_gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+metrics = MetricsRegistry()
+
+_telemetry_config = None
+
+
+def load_telemetry_config() -> dict:
+    """Loads the `telemetry` section of the app config, once per process."""
+    global _telemetry_config
+    if _telemetry_config is None:
+        _telemetry_config = load_yaml_config(APP_CONFIG_FPATH).get("telemetry") or {}
+    return _telemetry_config
+
+
+def telemetry_enabled() -> bool:
+    return load_telemetry_config().get("enabled", True)
+
+
+@contextmanager
+def timed(metric: str, **labels) -> Iterator[None]:
+    """Records the duration of the block in a histogram, even if it raises."""
+    if not telemetry_enabled():
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe(metric, time.perf_counter() - start_time, **labels)
+
+
+def record_stage(stage: str, seconds: float, metric: str = QUERY_STAGE_SECONDS) -> None:
+    """Records a stage duration measured by the caller, e.g. across a stream."""
+    if telemetry_enabled():
+        metrics.observe(metric, seconds, stage=stage)
+
+
+def query_stage(stage: str):
+    """Times one stage of answering a query."""
+    return timed(QUERY_STAGE_SECONDS, stage=stage)
+
+
+def ingest_stage(stage: str):
+    """Times one stage of ingestion."""
+    return timed(INGEST_STAGE_SECONDS, stage=stage)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for when the provider reports no usage."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def prompt_text(prompt) -> str:
+    """The text of a prompt given as a string or as (role, content) messages."""
+    if isinstance(prompt, str):
+        return prompt
+    return "\n\n".join(content for _, content in prompt)
+
+
+def record_llm_tokens(prompt, completion: str, usage: Optional[dict] = None) -> None:
+    """
+    Counts prompt and completion tokens, from the provider's usage metadata if available.
+
+    Prompt tokens the provider served from its prompt prefix cache are also counted
+    as `kind="prompt_cached"`, when the provider reports them.
+    """
+    if not telemetry_enabled():
+        return
+    usage = usage or {}
+    source = "provider" if usage else "estimate"
+    metrics.increment(
+        "rag_llm_tokens_total",
+        usage.get("input_tokens") or estimate_tokens(prompt_text(prompt)),
+        kind="prompt",
+        source=source,
+    )
+    metrics.increment(
+        "rag_llm_tokens_total", usage.get("output_tokens") or estimate_tokens(completion), kind="completion", source=source
+    )
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read")
+    if cached_tokens is not None:
+        metrics.increment("rag_llm_tokens_total", cached_tokens, kind="prompt_cached", source=source)
+
+
+_seen_prompt_prefixes = set()
+
+
+def record_prompt_prefix(prefix_hash: str) -> None:
+    """
+    Counts requests sent with a new or an already sent static prompt prefix.
+
+    With a stable prefix, all but the first request of a process are repeats,
+    which is what lets providers serve the prefix from their prompt cache.
+    """
+    if not telemetry_enabled():
+        return
+    repeat = prefix_hash in _seen_prompt_prefixes
+    _seen_prompt_prefixes.add(prefix_hash)
+    metrics.increment("rag_prompt_prefix_total", prefix="repeat" if repeat else "new")
+
+
+class StackSampler:
+    """Samples the stacks of the threads working on a query at a fixed interval from a background thread.
+
+    Args:
+        thread_id: Ident of a thread to sample from the start, if any.
+        interval_ms: Time between samples.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval_ms: float = 5.0):
+        self.thread_ids = Counter() if thread_id is None else Counter([thread_id])
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def add_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self.thread_ids[thread_id] += 1
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self.thread_ids[thread_id] -= 1
+            if self.thread_ids[thread_id] <= 0:
+                del self.thread_ids[thread_id]
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                thread_ids = list(self.thread_ids)
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self._thread.join()
+        return self.stacks
+
+
+def dump_profile(stacks: Counter, elapsed: float, query: str) -> Optional[str]:
+    """Writes sampled stacks in collapsed format, e.g. for flamegraph.pl or speedscope."""
+    profile_dir = (load_telemetry_config().get("slow_query_profiler") or {}).get("output_dir") or PROFILES_DIR
+    path = os.path.join(profile_dir, f"query_{time.strftime('%Y%m%d_%H%M%S')}_{int(elapsed * 1000)}ms.folded")
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# query: {query!r}\n# elapsed_seconds: {elapsed:.3f}\n")
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+    except OSError as e:
+        logger.warning(f"Could not write query profile: {e}")
+        return None
+    return path
+
+
+@contextmanager
+def query_trace(query: str, profile: bool = True) -> Iterator[Optional[StackSampler]]:
+    """
+    Times a whole query and, if slow query profiling is enabled, samples its stack.
+
+    Profiles are only written for queries over `telemetry.slow_query_profiler.threshold_ms`.
+    Pass `profile=False` where the current thread is not the one doing the work,
+    e.g. on an event loop, and run the work under `sampled_thread` with the
+    yielded sampler instead.
+    """
+    if not telemetry_enabled():
+        yield None
+        return
+    profiler_config = load_telemetry_config().get("slow_query_profiler") or {}
+    sampler = None
+    if profiler_config.get("enabled", False):
+        thread_id = threading.get_ident() if profile else None
+        sampler = StackSampler(thread_id, profiler_config.get("interval_ms", 5)).start()
+    start_time = time.perf_counter()
+    try:
+        yield sampler
+    finally:
+        elapsed = time.perf_counter() - start_time
+        metrics.observe(QUERY_SECONDS, elapsed)
+        metrics.increment("rag_queries_total")
+        if sampler is not None:
+            stacks = sampler.stop()
+            if elapsed * 1000 >= profiler_config.get("threshold_ms", 2000):
+                metrics.increment("rag_slow_queries_total")
+                path = dump_profile(stacks, elapsed, query)
+                if path:
+                    logger.info(f"Slow query ({elapsed:.2f}s), profile written to {path}")
+
+
+@contextmanager
+def sampled_thread(sampler: Optional[StackSampler]) -> Iterator[None]:
+    """Adds the current thread to a query's stack sampler, if any, while it works on the query."""
+    if sampler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    sampler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        sampler.remove_thread(thread_id)
+
+
+def log_stage_summary(metric: str = QUERY_STAGE_SECONDS) -> None:
+    """Logs the latency percentiles of each stage."""
+    for labels, summary in metrics.to_json()["histograms"].get(metric, {}).items():
+        logger.info(
+            f"{labels}: {summary['count']} calls, p50 {summary['p50'] * 1000:.1f}ms, "
+            f"p95 {summary['p95'] * 1000:.1f}ms, p99 {summary['p99'] * 1000:.1f}ms, "
+            f"total {summary['sum']:.2f}s"
+        )
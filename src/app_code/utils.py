@@ -2,9 +2,12 @@ import os
 from dotenv import load_dotenv
 import yaml
 from pathlib import Path
-from typing import Union
+from typing import Any, Iterator, Optional, Union
+from itertools import islice
 import json
+import hashlib
 from paths import ENV_FPATH, SOURCE_DATA_DIR, DATA_DIR
+from app_code.logger import logger
 
 def load_env(api_key_type="GROQ_API_KEY") -> None:
     """Loads environment variables from a .env file and checks for required keys.
@@ -52,8 +55,121 @@ def load_yaml_config(file_path: Union[str, Path]) -> dict:
     except IOError as e:
         raise IOError(f"Error reading YAML file: {e}") from e
 
+def iter_json_array(json_path: Union[str, Path], read_size: int = 1 << 16) -> Iterator[Any]:
+    """Incrementally parses a JSON file containing a top-level array.
+
+    Elements are decoded one at a time from a small rolling buffer, so the whole
+    file is never held in memory.
+
+    Args:
+        json_path: Path to the JSON file.
+        read_size: Number of characters read from the file at a time.
+
+    Yields:
+        Each element of the top-level array.
+
+    Raises:
+        ValueError: If the file does not contain a JSON array.
+        json.JSONDecodeError: If an element is malformed.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_path, "r", encoding="utf-8") as f:
+        buffer = ""
+        eof = False
+
+        def fill(size: int) -> None:
+            nonlocal buffer, eof
+            data = f.read(size)
+            eof = not data
+            buffer += data
+
+        def skip(chars: str) -> None:
+            nonlocal buffer
+            while True:
+                buffer = buffer.lstrip(chars)
+                if buffer or eof:
+                    return
+                fill(read_size)
+
+        skip(" \t\r\n")
+        if not buffer.startswith("["):
+            raise ValueError(f"Expected a JSON array in {json_path}")
+        buffer = buffer[1:]
+
+        while True:
+            skip(" \t\r\n,")
+            if not buffer:
+                raise ValueError(f"Unterminated JSON array in {json_path}")
+            if buffer[0] == "]":
+                return
+
+            # Read progressively larger blocks until a whole element is buffered
+            size = read_size
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer)
+                    # Only trust the value once its delimiter is buffered, otherwise
+                    # it may be truncated (e.g. a number cut at the buffer edge)
+                    rest = buffer[end:].lstrip()
+                    if (rest and rest[0] in ",]") or eof:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill(size)
+                size *= 2
+
+            yield element
+            buffer = buffer[end:]
+
+
+def render_publication_markdown(entry: dict) -> str:
+    """Renders a JSON publication entry as markdown text.
+
+    Args:
+        entry (dict): A JSON publication entry.
+
+    Returns:
+        The publication as markdown.
+    """
+    md_content = f"# {entry.get('title', 'No Title')}---\n\n"
+    md_content += f"**Authors:** {', '.join(author for author in entry.get('authors', []))}\n\n---\n\n"
+    md_content += f"**Tags:** {', '.join(tag for tag in entry.get('tags', []))}\n\n---\n\n"
+    md_content += f"**License:** {entry.get('license', 'No License')}\n\n---\n\n"
+    md_content += f"**Publication Date:** {entry.get('publication_date', 'No Date')}\n\n---\n\n"
+    md_content += f"**Link:** {entry.get('link', 'No Link')}\n\n---\n\n"
+    md_content += entry.get('publication_description', 'No Description')
+    return md_content
+
+
+def iter_json_publications(
+    json_path=os.path.join(SOURCE_DATA_DIR, "project_1_publications.json"),
+    num_entries_to_process: Optional[int] = None,
+    markdown_dir: Optional[str] = None,
+) -> Iterator[tuple[str, str]]:
+    """Streams publications from a JSON file as (publication id, markdown text) pairs.
+
+    Args:
+        json_path (str): Path to the JSON file of publication entries.
+        num_entries_to_process (int): Maximum number of entries to yield. Defaults to all.
+        markdown_dir (str): If set, each entry is also written as a markdown file to this directory.
+
+    Yields:
+        (publication id, markdown text) for each entry.
+    """
+    entries = iter_json_array(json_path)
+    if num_entries_to_process is not None:
+        entries = islice(entries, num_entries_to_process)
+
+    for i, entry in enumerate(entries):
+        publication_id = str(entry.get("id", f"publication_{i+1}"))
+        md_content = render_publication_markdown(entry)
+        if markdown_dir:
+            write_markdown(md_content, markdown_dir, f"{publication_id}.md")
+        yield publication_id, md_content
+
+
 def json_to_markdown(json_path=os.path.join(SOURCE_DATA_DIR, "project_1_publications.json"), output_dir= DATA_DIR, num_entries_to_process=5):
-    # Load JSON
     """
     Converts a JSON file of publication entries to markdown files.
 
@@ -65,16 +181,12 @@ def json_to_markdown(json_path=os.path.join(SOURCE_DATA_DIR, "project_1_publicat
     Returns:
         None
     """
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for i in range(min(num_entries_to_process, len(data))):
-        entry = data[i]
-        output_filename = f"publication_{i+1}.md"
-        create_markdown_from_json(entry, output_dir, output_filename)
+    count = 0
+    for _ in iter_json_publications(json_path, num_entries_to_process, markdown_dir=output_dir):
+        count += 1
+    logger.info(f"Created {count} markdown files in {output_dir}")
 
 def create_markdown_from_json(entry, output_dir, output_filename):
-    # Ensure output directory exists
     """
     Creates a markdown file from a JSON publication entry.
 
@@ -84,28 +196,30 @@ def create_markdown_from_json(entry, output_dir, output_filename):
         output_filename (str): The filename to use for the markdown file.
 
     """
-    os.makedirs(output_dir, exist_ok=True)
     output_filename = f"{entry.get('id', output_filename)}.md"
+    write_markdown(render_publication_markdown(entry), output_dir, output_filename)
 
-    # Create markdown content
-    md_content = f"# {entry.get('title', 'No Title')}---\n\n"
-    md_content += f"**Authors:** {', '.join(author for author in entry.get('authors', []))}\n\n---\n\n"
-    md_content += f"**Tags:** {', '.join(tag for tag in entry.get('tags', []))}\n\n---\n\n"
-    md_content += f"**License:** {entry.get('license', 'No License')}\n\n---\n\n"
-    md_content += f"**Publication Date:** {entry.get('publication_date', 'No Date')}\n\n---\n\n"
-    md_content += f"**Link:** {entry.get('link', 'No Link')}\n\n---\n\n"
-    md_content += entry.get('publication_description', 'No Description')
+def write_markdown(md_content: str, output_dir: str, output_filename: str) -> str:
+    """
+    Writes markdown content to a file, creating the output directory if needed.
 
-    # Write to markdown file
+    Returns:
+        The path of the written file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
     output_path = os.path.join(output_dir, output_filename)
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(md_content)
-    
-    print(f"Created markdown file: {output_path}")
+    logger.debug(f"Created markdown file: {output_path}")
+    return output_path
 
-def load_publication(publication_external_id="0CBAR8U8FakE"):
+def load_publication(publication_external_id="0CBAR8U8FakE", publication_dir: str = DATA_DIR):
     """Loads the publication markdown file.
 
+    Args:
+        publication_external_id (str): Publication id, i.e. the markdown file name without extension.
+        publication_dir (str): Directory containing the markdown files.
+
     Returns:
         Content of the publication as a string.
 
@@ -113,7 +227,7 @@ def load_publication(publication_external_id="0CBAR8U8FakE"):
         FileNotFoundError: If the file does not exist.
         IOError: If there's an error reading the file.
     """
-    publication_fpath = Path(os.path.join(DATA_DIR, f"{publication_external_id}.md"))
+    publication_fpath = Path(os.path.join(publication_dir, f"{publication_external_id}.md"))
 
     # Check if file exists
     if not publication_fpath.exists():
@@ -127,17 +241,36 @@ def load_publication(publication_external_id="0CBAR8U8FakE"):
         raise IOError(f"Error reading publication file: {e}") from e
 
 
+def list_publication_ids(publication_dir: str = DATA_DIR) -> list[str]:
+    """Lists the ids of all publication markdown files in the given directory.
+
+    Returns:
+        Sorted list of publication ids (file names without the .md extension).
+    """
+    if not os.path.isdir(publication_dir):
+        return []
+    return sorted(
+        file_name[: -len(".md")]
+        for file_name in os.listdir(publication_dir)
+        if file_name.endswith(".md")
+    )
+
+
 def load_all_publications(publication_dir: str = DATA_DIR) -> list[str]:
     """Loads all the publication markdown files in the given directory.
 
     Returns:
         List of publication contents.
     """
-    publications = []
-    for pub_id in os.listdir(publication_dir):
-        if pub_id.endswith(".md"):
-            publications.append(load_publication(pub_id.replace(".md", "")))
-    return publications
+    return [
+        load_publication(pub_id, publication_dir)
+        for pub_id in list_publication_ids(publication_dir)
+    ]
+
+
+def hash_text(text: str) -> str:
+    """Returns the hex SHA-256 digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 if __name__ == "__main__":
     json_to_markdown()
\ No newline at end of file
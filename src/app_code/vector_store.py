@@ -0,0 +1,168 @@
+"""
+Vector store backends for the publication chunks.
+
+Ingestion and retrieval talk to a `VectorStore` rather than to Chroma directly.
+The backend is chosen with `vector_store.backend` in config.yaml:
+
+- `chroma`: the persistent Chroma collection in `outputs/vector_db` (HNSW index).
+- `flat`: exact or int8/float16 quantized search over memory-mapped NumPy files,
+  see `flat_vector_store`.
+
+Both return Chroma-style result dicts, so callers do not depend on the backend.
+"""
+
+import os
+from typing import Optional, Protocol, runtime_checkable
+from app_code.db_manager import get_client, get_collection
+from app_code.flat_vector_store import FlatVectorStore
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, FLAT_INDEX_DIR
+
+BACKENDS = ("chroma", "flat")
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """Interface shared by the vector store backends."""
+
+    max_batch_size: int
+
+    def count(self) -> int:
+        """Returns the number of stored chunks."""
+        ...
+
+    def upsert(self, ids: list[str], embeddings, documents: list[str], metadatas: Optional[list[dict]] = None) -> None:
+        """Adds chunks, replacing existing chunks with the same ids."""
+        ...
+
+    def delete(self, ids: list[str]) -> None:
+        """Deletes chunks by id."""
+        ...
+
+    def query(self, query_embeddings, n_results: int = 10, include: tuple[str, ...] = ...) -> dict:
+        """Returns the nearest chunks of each query embedding, with cosine distances."""
+        ...
+
+    def get(
+        self,
+        ids: Optional[list[str]] = None,
+        include: tuple[str, ...] = ...,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> dict:
+        """Returns chunks by id, or a page of all chunks."""
+        ...
+
+    def persist(self) -> None:
+        """Makes all writes durable and visible to other processes."""
+        ...
+
+
+class ChromaVectorStore:
+    """A `VectorStore` over a Chroma collection.
+
+    Args:
+        collection: The Chroma collection, created with cosine distance.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.max_batch_size = get_client().get_max_batch_size()
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(self, ids: list[str], embeddings, documents: list[str], metadatas: Optional[list[dict]] = None) -> None:
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: list[str]) -> None:
+        self.collection.delete(ids=ids)
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        include: tuple[str, ...] = ("documents", "metadatas", "distances"),
+    ) -> dict:
+        return self.collection.query(
+            query_embeddings=query_embeddings, n_results=n_results, include=list(include)
+        )
+
+    def get(
+        self,
+        ids: Optional[list[str]] = None,
+        include: tuple[str, ...] = ("documents", "metadatas"),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> dict:
+        if ids is not None:
+            return self.collection.get(ids=ids, include=list(include))
+        return self.collection.get(include=list(include), limit=limit, offset=offset)
+
+    def persist(self) -> None:
+        # The persistent client writes through on every call
+        pass
+
+
+def load_vector_store_config() -> dict:
+    """Loads the `vector_store` section of the app config."""
+    return load_yaml_config(APP_CONFIG_FPATH).get("vector_store") or {}
+
+
+def get_backend_name() -> str:
+    backend = load_vector_store_config().get("backend", "chroma")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector store backend '{backend}', expected one of {BACKENDS}")
+    return backend
+
+
+def flat_store_dir(collection_name: str) -> str:
+    return os.path.join(FLAT_INDEX_DIR, collection_name)
+
+
+def open_vector_store(collection_name: str = "publications", create: bool = False) -> Optional[VectorStore]:
+    """
+    Open the configured vector store.
+
+    Args:
+        collection_name (str): Name of the collection. Defaults to "publications"
+        create (bool): Open for writing, creating the store if it does not exist
+    Returns:
+        VectorStore: The store, or None if it does not exist and `create` is False
+    """
+    backend = get_backend_name()
+    if backend == "flat":
+        directory = flat_store_dir(collection_name)
+        if not create and not os.path.exists(os.path.join(directory, "meta.json")):
+            logger.warning(f"Flat vector store {collection_name} not found")
+            return None
+        config = load_vector_store_config()
+        logger.debug(f"Opening flat vector store at {directory} ({'read-write' if create else 'read-only'})")
+        return FlatVectorStore(
+            directory,
+            writable=create,
+            quantization=config.get("quantization"),
+            rescore_candidates=config.get("rescore_candidates", 50),
+        )
+
+    if not create:
+        collection = get_collection(collection_name)
+        return ChromaVectorStore(collection) if collection is not None else None
+
+    client = get_client()
+    try:
+        # Try to get existing collection first
+        collection = client.get_collection(name=collection_name)
+        logger.debug(f"Retrieved existing collection: {collection_name}")
+    except Exception:
+        # If collection doesn't exist, create it
+        collection = client.create_collection(
+            name=collection_name,
+            metadata={
+                "hnsw:space": "cosine",
+                "hnsw:batch_size": 10000,
+            },  # Use cosine distance for semantic search
+        )
+        logger.debug(f"Created new collection: {collection_name}")
+    return ChromaVectorStore(collection)
@@ -0,0 +1,151 @@
+"""
+Offline benchmark suite for ingestion, retrieval and end-to-end query latency.
+
+Run from the `src` directory:
+
+    python -m benchmarks --scales 1 4 --queries 50
+
+Each corpus size runs in its own process against a scratch vector database,
+scaled up synthetically from `source/project_1_publications.json`. The LLM is
+replaced by a local stand-in, and the embedding model is loaded from the local
+Hugging Face cache only, so nothing goes over the network. Results are written
+as JSON to `outputs/benchmarks/` for comparing runs before and after a change.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from app_code.prompt_builder import check_prefix_stability
+from app_code.utils import load_yaml_config
+from app_code.logger import logger
+from paths import APP_CONFIG_FPATH, BENCHMARK_RESULTS_DIR, PROMPT_CONFIG_FPATH, ROOT_DIR, SOURCE_DATA_DIR
+
+CONFIG_SECTIONS = (
+    "vectordb",
+    "vector_store",
+    "embeddings",
+    "retrieval_cache",
+    "hybrid_search",
+    "micro_batching",
+    "ingestion",
+)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_scale(args: argparse.Namespace, scale: int) -> dict:
+    """Runs the worker for one corpus size in a scratch outputs directory."""
+    scratch_dir = tempfile.mkdtemp(prefix=f"rag_bot_bench_{scale}x_")
+    output_path = os.path.join(scratch_dir, "result.json")
+    env = dict(
+        os.environ,
+        RAG_BOT_OUTPUTS_DIR=scratch_dir,
+        HF_HUB_OFFLINE="1",
+        TRANSFORMERS_OFFLINE="1",
+        ANONYMIZED_TELEMETRY="False",
+    )
+    # Providers check for their API key when constructed, but only the stand-in LLM is called
+    for api_key in ("OPENAI_API_KEY", "GOOGLE_API_KEY", "GROQ_API_KEY"):
+        env.setdefault(api_key, "offline-benchmark")
+    command = [
+        sys.executable, "-m", "benchmarks.worker",
+        "--json-path", args.json_path,
+        "--scale", str(scale),
+        "--queries", str(args.queries),
+        "--n-results", *map(str, args.n_results),
+        "--suites", *args.suites,
+        "--llm-ttft-ms", str(args.llm_ttft_ms),
+        "--llm-tokens", str(args.llm_tokens),
+        "--llm-token-ms", str(args.llm_token_ms),
+        "--output", output_path,
+    ]
+    logger.info(f"Running benchmarks on a {scale}x corpus...")
+    try:
+        subprocess.run(command, env=env, check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        with open(output_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+def log_run(run: dict) -> None:
+    ingest = run["ingest"]
+    logger.info(
+        f"{run['scale']}x: ingested {ingest['chunks']} chunks at {ingest['chunks_per_sec']:.1f} chunks/sec, "
+        f"peak RSS {ingest['peak_rss_mb']:.0f} MiB"
+    )
+    for name, latencies in run.get("retrieval", {}).items():
+        uncached = latencies["uncached"]
+        logger.info(
+            f"{run['scale']}x retrieval {name}: p50 {uncached['p50_ms']:.1f}ms, "
+            f"p95 {uncached['p95_ms']:.1f}ms, p99 {uncached['p99_ms']:.1f}ms "
+            f"(cached p50 {latencies['cached']['p50_ms']:.2f}ms)"
+        )
+    if "end_to_end" in run:
+        latency = run["end_to_end"]["latency"]
+        logger.info(
+            f"{run['scale']}x end-to-end: p50 {latency['p50_ms']:.1f}ms, "
+            f"p95 {latency['p95_ms']:.1f}ms, p99 {latency['p99_ms']:.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG-Bot benchmarks")
+    parser.add_argument("--json-path", default=os.path.join(SOURCE_DATA_DIR, "project_1_publications.json"))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4], help="Corpus sizes, as copies of the JSON dump")
+    parser.add_argument("--queries", type=int, default=50, help="Timed queries per measurement")
+    parser.add_argument("--n-results", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--suites", nargs="+", choices=["retrieval", "end_to_end"], default=["retrieval", "end_to_end"])
+    parser.add_argument("--llm-ttft-ms", type=float, default=0.0, help="Stand-in LLM time to first token")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="Stand-in LLM tokens per response")
+    parser.add_argument("--llm-token-ms", type=float, default=0.0, help="Stand-in LLM delay between tokens")
+    parser.add_argument("--output", default=None, help="Result file. Defaults to a timestamped file in outputs/benchmarks")
+    args = parser.parse_args()
+
+    app_config = load_yaml_config(APP_CONFIG_FPATH)
+    started_at = datetime.now(timezone.utc)
+    results = {
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {section: app_config.get(section) for section in CONFIG_SECTIONS},
+        # A system prompt prefix that changes between compilations defeats provider prompt caching
+        "prompt_prefix_stable": check_prefix_stability(
+            load_yaml_config(PROMPT_CONFIG_FPATH)["rag_assistant_prompt"]
+        ),
+        "args": vars(args),
+        "runs": [],
+    }
+    for scale in args.scales:
+        run = run_scale(args, scale)
+        log_run(run)
+        results["runs"].append(run)
+
+    output_path = args.output or os.path.join(
+        BENCHMARK_RESULTS_DIR, f"benchmark_{started_at.strftime('%Y%m%dT%H%M%SZ')}_{results['git_commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Benchmark results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
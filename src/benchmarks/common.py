@@ -0,0 +1,95 @@
+"""
+Shared helpers for the offline benchmarks: synthetic corpora, latency summaries,
+memory readings and a local stand-in for the LLM.
+"""
+
+import time
+import resource
+from dataclasses import dataclass
+from typing import Iterator
+from app_code.micro_batching import percentile
+from app_code.utils import iter_json_array, iter_json_publications
+
+
+def latency_summary(samples_seconds: list[float]) -> dict:
+    """Summarizes latency samples in milliseconds."""
+    samples_ms = [sample * 1000 for sample in samples_seconds]
+    return {
+        "count": len(samples_ms),
+        "mean_ms": sum(samples_ms) / len(samples_ms) if samples_ms else 0.0,
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+        "p99_ms": percentile(samples_ms, 99),
+        "max_ms": max(samples_ms, default=0.0),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process so far, in MiB (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_publications(json_path: str, scale: int) -> list[tuple[str, str]]:
+    """
+    Load the publications of a JSON dump and replicate them `scale` times.
+
+    Each copy gets its own id and has its paragraphs rotated, so copies produce
+    distinct chunks and content hashes while keeping realistic text.
+
+    Args:
+        json_path (str): JSON publication dump
+        scale (int): Number of copies of the corpus
+    Returns:
+        list[tuple[str, str]]: (publication id, text) pairs
+    """
+    originals = list(iter_json_publications(json_path))
+    publications = list(originals)
+    for copy in range(1, scale):
+        for publication_id, text in originals:
+            paragraphs = text.split("\n\n")
+            shift = copy % len(paragraphs)
+            rotated = paragraphs[shift:] + paragraphs[:shift]
+            publications.append((f"{publication_id}-synthetic-{copy}", "\n\n".join(rotated)))
+    return publications
+
+
+def benchmark_queries(json_path: str, n_queries: int) -> list[str]:
+    """Builds distinct questions from the publication titles of a JSON dump."""
+    templates = (
+        "What is {} about?",
+        "Summarize the main idea of {}.",
+        "Which tools are used in {}?",
+    )
+    titles = [entry.get("title", "this publication") for entry in iter_json_array(json_path)]
+    queries = [template.format(title) for template in templates for title in titles]
+    return [queries[i % len(queries)] + ("" if i < len(queries) else f" ({i})") for i in range(n_queries)]
+
+
+@dataclass
+class StandInMessage:
+    content: str
+
+
+class StandInChatModel:
+    """A local stand-in for a chat model client, with a fixed simulated generation time.
+
+    Args:
+        time_to_first_token_ms: Delay before the first token.
+        tokens: Number of tokens in each response.
+        time_per_token_ms: Delay between tokens.
+    """
+
+    def __init__(self, time_to_first_token_ms: float = 0.0, tokens: int = 64, time_per_token_ms: float = 0.0):
+        self.time_to_first_token = time_to_first_token_ms / 1000
+        self.tokens = tokens
+        self.time_per_token = time_per_token_ms / 1000
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[StandInMessage]:
+        time.sleep(self.time_to_first_token)
+        for i in range(self.tokens):
+            if i:
+                time.sleep(self.time_per_token)
+            yield StandInMessage(content=f"token{i} ")
+
+    def invoke(self, prompt: str, **kwargs) -> StandInMessage:
+        return StandInMessage(content="".join(chunk.content for chunk in self.stream(prompt)))
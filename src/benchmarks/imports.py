@@ -0,0 +1,110 @@
+"""
+Import-cost report of the application entry points.
+
+Run from the `src` directory:
+
+    python -m benchmarks.imports --top 15
+
+Each entry module is imported in a fresh interpreter with `python -X importtime`,
+so nothing is cached between them. The report lists the total import time of each
+entry point, the top-level packages that cost the most (summing the self time of
+all their modules) and the slowest single modules, to spot a heavy dependency
+being pulled in at startup instead of on first use.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from app_code.logger import logger
+from paths import BENCHMARK_RESULTS_DIR
+
+ENTRY_MODULES = (
+    "main",
+    "app_code.chroma_db_rag",
+    "app_code.chroma_db_ingest",
+    "app_code.server",
+)
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Parses `-X importtime` output into (module, self_us, cumulative_us) records."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        records.append({
+            "module": module.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return records
+
+
+def measure_module(module: str, top: int) -> dict:
+    """Imports a module in a fresh interpreter and summarizes where the import time went."""
+    env = dict(os.environ, ANONYMIZED_TELEMETRY="False")
+    # Providers check for their API key when constructed, the import itself needs none
+    for api_key in ("OPENAI_API_KEY", "GOOGLE_API_KEY", "GROQ_API_KEY"):
+        env.setdefault(api_key, "import-benchmark")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+
+    records = parse_importtime(completed.stderr)
+    total_us = next((r["cumulative_us"] for r in reversed(records) if r["module"] == module), 0)
+    packages = {}
+    for record in records:
+        package = record["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + record["self_us"]
+    slowest_packages = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    slowest_modules = sorted(records, key=lambda r: r["self_us"], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "modules_imported": len(records),
+        "packages": [{"package": name, "self_ms": us / 1000} for name, us in slowest_packages],
+        "modules": [{"module": r["module"], "self_ms": r["self_us"] / 1000} for r in slowest_modules],
+    }
+
+
+def log_report(report: dict) -> None:
+    logger.info(f"{report['module']}: {report['total_ms']:.0f}ms, {report['modules_imported']} modules")
+    for package in report["packages"]:
+        logger.info(f"    {package['self_ms']:8.1f}ms  {package['package']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-cost report of the RAG-Bot entry points")
+    parser.add_argument("--modules", nargs="+", default=list(ENTRY_MODULES), help="Modules to import")
+    parser.add_argument("--top", type=int, default=10, help="Packages and modules listed per entry point")
+    parser.add_argument("--output", default=None, help="Result file. Defaults to a timestamped file in outputs/benchmarks")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    reports = []
+    for module in args.modules:
+        report = measure_module(module, args.top)
+        log_report(report)
+        reports.append(report)
+
+    output_path = args.output or os.path.join(
+        BENCHMARK_RESULTS_DIR, f"imports_{started_at.strftime('%Y%m%dT%H%M%SZ')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({"started_at": started_at.isoformat(), "python": sys.version, "reports": reports}, f, indent=2)
+    logger.info(f"Import report written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Runs the benchmarks for one corpus size in a fresh process.
+
+Started by `python -m benchmarks` with `RAG_BOT_OUTPUTS_DIR` pointing at a
+scratch directory, so the vector database built here never touches
+`outputs/vector_db` and the peak RSS reading covers only this corpus size.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from app_code.chroma_db_ingest import initialize_db, sync_publications
+from app_code.chroma_db_rag import retrieve_relevant_documents, respond_to_query, get_rag_collection
+from app_code.embedding_service import warm_up as warm_up_embeddings
+from app_code.retrieval_cache import clear_caches
+from app_code.telemetry import metrics
+from app_code.utils import load_yaml_config
+from adapters.llm_client_adapter import LLMClientAdapter
+from benchmarks.common import (
+    StandInChatModel,
+    benchmark_queries,
+    latency_summary,
+    peak_rss_mb,
+    synthetic_publications,
+)
+from paths import APP_CONFIG_FPATH, PROMPT_CONFIG_FPATH, VECTOR_DB_DIR
+
+
+def benchmark_ingest(publications: list[tuple[str, str]]) -> dict:
+    """Measures a full ingestion of the corpus into the empty scratch vector database."""
+    start_time = time.perf_counter()
+    warm_up_embeddings(force=True)
+    model_load_seconds = time.perf_counter() - start_time
+
+    # The worker runs in an empty scratch outputs directory
+    collection = initialize_db(persist_directory=VECTOR_DB_DIR)
+    start_time = time.perf_counter()
+    sync_publications(collection, publications=publications)
+    elapsed = time.perf_counter() - start_time
+    chunks = collection.count()
+    return {
+        "publications": len(publications),
+        "chunks": chunks,
+        "seconds": elapsed,
+        "docs_per_sec": len(publications) / elapsed if elapsed else 0.0,
+        "chunks_per_sec": chunks / elapsed if elapsed else 0.0,
+        "model_load_seconds": model_load_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def time_calls(queries: list[str], call, warmup: int = 3) -> dict:
+    """Times `call(query)` for each query with the retrieval caches cleared, so every call does the full work."""
+    for query in queries[:warmup]:
+        call(query)
+    samples = []
+    for query in queries:
+        clear_caches()
+        start_time = time.perf_counter()
+        call(query)
+        samples.append(time.perf_counter() - start_time)
+    return latency_summary(samples)
+
+
+def benchmark_retrieval(queries: list[str], n_results_values: list[int], threshold: float) -> dict:
+    """Measures uncached and cached `retrieve_relevant_documents` latency per `n_results`."""
+    results = {}
+    for n_results in n_results_values:
+        def retrieve(query):
+            return retrieve_relevant_documents(query, n_results=n_results, threshold=threshold)
+
+        uncached = time_calls(queries, retrieve)
+        cached_samples = []
+        for query in queries:
+            retrieve(query)
+            start_time = time.perf_counter()
+            retrieve(query)
+            cached_samples.append(time.perf_counter() - start_time)
+        results[f"n_results={n_results}"] = {"uncached": uncached, "cached": latency_summary(cached_samples)}
+    return results
+
+
+def benchmark_end_to_end(queries: list[str], n_results: int, threshold: float, llm_config: dict) -> dict:
+    """Measures `respond_to_query` latency against the local stand-in LLM."""
+    prompt_config = load_yaml_config(PROMPT_CONFIG_FPATH)["rag_assistant_prompt"]
+    llm = LLMClientAdapter(StandInChatModel(**llm_config))
+
+    def respond(query):
+        return respond_to_query(prompt_config, query, llm, n_results=n_results, threshold=threshold)
+
+    return {"llm": llm_config, "n_results": n_results, "latency": time_calls(queries, respond)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json-path", required=True)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--n-results", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--suites", nargs="+", default=["retrieval", "end_to_end"])
+    parser.add_argument("--llm-ttft-ms", type=float, default=0.0)
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-token-ms", type=float, default=0.0)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    threshold = load_yaml_config(APP_CONFIG_FPATH)["vectordb"].get("threshold", 0.3)
+    publications = synthetic_publications(args.json_path, args.scale)
+    queries = benchmark_queries(args.json_path, args.queries)
+
+    run = {"scale": args.scale, "ingest": benchmark_ingest(publications)}
+    del publications
+    if get_rag_collection() is None:
+        sys.exit("Benchmark collection was not created.")
+    if "retrieval" in args.suites:
+        run["retrieval"] = benchmark_retrieval(queries, args.n_results, threshold)
+    if "end_to_end" in args.suites:
+        llm_config = {
+            "time_to_first_token_ms": args.llm_ttft_ms,
+            "tokens": args.llm_tokens,
+            "time_per_token_ms": args.llm_token_ms,
+        }
+        run["end_to_end"] = benchmark_end_to_end(queries, max(args.n_results), threshold, llm_config)
+    run["peak_rss_mb"] = peak_rss_mb()
+    # Per-stage breakdown of everything timed above, warm-up calls included
+    run["stages"] = metrics.to_json()["histograms"]
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
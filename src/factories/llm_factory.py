@@ -1,25 +1,35 @@
+import importlib
+import threading
 from llm_providers.base import LLMProvider
-from llm_providers.openai_llm import OpenAIChatLLM
-from llm_providers.google_llm import GoogleChatLLM
-from llm_providers.ollama_llm import OllamaChatLLM
-from llm_providers.groq_llm import GroqChatLLM
 
 class LLMFactory:
-    _providers = {
-            "openai": OpenAIChatLLM(),
-            "ollama": OllamaChatLLM(),
-            "google": GoogleChatLLM(),
-            "groq": GroqChatLLM(),
+    # Provider name -> (module, class). A provider's SDK is only imported, and its
+    # API key only checked, when that provider is first selected.
+    _provider_classes = {
+            "openai": ("llm_providers.openai_llm", "OpenAIChatLLM"),
+            "ollama": ("llm_providers.ollama_llm", "OllamaChatLLM"),
+            "google": ("llm_providers.google_llm", "GoogleChatLLM"),
+            "groq": ("llm_providers.groq_llm", "GroqChatLLM"),
             # Future providers can be added here
         }
+    _providers = {}
+    _lock = threading.Lock()
+
     @staticmethod
     def get_llm_provider(provider_name: str) -> LLMProvider:
-        provider = LLMFactory._providers.get(provider_name.lower())
+        provider_name = provider_name.lower()
+        if provider_name not in LLMFactory._provider_classes:
+            raise ValueError(f"Provider '{provider_name}' not supported. Available providers: {', '.join(LLMFactory._provider_classes.keys())}")
 
-        if not provider:
-            raise ValueError(f"Provider '{provider_name}' not supported. Available providers: {', '.join(LLMFactory._providers.keys())}")
-        
+        provider = LLMFactory._providers.get(provider_name)
+        if provider is None:
+            with LLMFactory._lock:
+                provider = LLMFactory._providers.get(provider_name)
+                if provider is None:
+                    module_name, class_name = LLMFactory._provider_classes[provider_name]
+                    provider_class = getattr(importlib.import_module(module_name), class_name)
+                    provider = LLMFactory._providers[provider_name] = provider_class()
         return provider
     @staticmethod
     def get_supported_providers() -> list:
-        return list(LLMFactory._providers.keys())
\ No newline at end of file
+        return list(LLMFactory._provider_classes.keys())
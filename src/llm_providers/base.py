@@ -3,4 +3,8 @@ from typing import Protocol
 class LLMProvider(Protocol):
     def create_llm(self, **kwargs):
         """Create and return a client instance for the LLM provider."""
+        pass
+
+    def create_async_llm(self, **kwargs):
+        """Create and return an async client instance for the LLM provider."""
         pass
\ No newline at end of file
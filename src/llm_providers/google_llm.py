@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from typing import Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
-from adapters.llm_client_adapter import LLMClientAdapter
+from adapters.llm_client_adapter import LLMClientAdapter, AsyncLLMClientAdapter
 from app_code.utils import load_env
 import os
 
@@ -30,5 +30,7 @@ class GoogleChatLLM:
 
         return LLMClientAdapter(client)
 
-
-       
\ No newline at end of file
+    def create_async_llm(self, model_name=None, temperature=0.0, **kwargs) -> AsyncLLMClientAdapter:
+        """Create a client adapter exposing the async `ainvoke`/`astream` API."""
+        llm = self.create_llm(model_name=model_name, temperature=temperature, **kwargs)
+        return AsyncLLMClientAdapter(llm.llm_client)
@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from typing import Optional
 from langchain_groq import ChatGroq
 from pydantic import SecretStr
-from adapters.llm_client_adapter import LLMClientAdapter
+from adapters.llm_client_adapter import LLMClientAdapter, AsyncLLMClientAdapter
 from app_code.utils import load_env
 import os
 
@@ -30,4 +30,9 @@ class GroqChatLLM:
             **kwargs
         )
 
-        return LLMClientAdapter(client)
\ No newline at end of file
+        return LLMClientAdapter(client)
+
+    def create_async_llm(self, model_name=None, temperature=0.0, **kwargs) -> AsyncLLMClientAdapter:
+        """Create a client adapter exposing the async `ainvoke`/`astream` API."""
+        llm = self.create_llm(model_name=model_name, temperature=temperature, **kwargs)
+        return AsyncLLMClientAdapter(llm.llm_client)
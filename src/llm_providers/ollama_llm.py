@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from langchain_community.chat_models import ChatOllama
-from adapters.llm_client_adapter import LLMClientAdapter
+from adapters.llm_client_adapter import LLMClientAdapter, AsyncLLMClientAdapter
 
 
 @dataclass
@@ -17,4 +17,9 @@ class OllamaChatLLM:
             **kwargs
         )
 
-        return LLMClientAdapter(client)
\ No newline at end of file
+        return LLMClientAdapter(client)
+
+    def create_async_llm(self, model_name=None, temperature=0.0, **kwargs) -> AsyncLLMClientAdapter:
+        """Create a client adapter exposing the async `ainvoke`/`astream` API."""
+        llm = self.create_llm(model_name=model_name, temperature=temperature, **kwargs)
+        return AsyncLLMClientAdapter(llm.llm_client)
@@ -2,7 +2,7 @@ from dataclasses import dataclass,field
 from typing import Optional
 from langchain_openai import ChatOpenAI
 from pydantic import SecretStr
-from adapters.llm_client_adapter import LLMClientAdapter
+from adapters.llm_client_adapter import LLMClientAdapter, AsyncLLMClientAdapter
 from app_code.utils import load_env
 import os
 
@@ -21,6 +21,8 @@ class OpenAIChatLLM:
         if self.api_key is None:
             raise ValueError("OpenAI API key is missing. Please set the API key.")
 
+        # Streamed responses only report token usage (and cached prompt tokens) when asked to
+        kwargs.setdefault("stream_usage", True)
         client = ChatOpenAI(
             api_key=SecretStr(self.api_key),
             model=model_name,
@@ -28,4 +30,9 @@ class OpenAIChatLLM:
             **kwargs
         )
 
-        return LLMClientAdapter(client)
\ No newline at end of file
+        return LLMClientAdapter(client)
+
+    def create_async_llm(self, model_name=None, temperature=0.0, **kwargs) -> AsyncLLMClientAdapter:
+        """Create a client adapter exposing the async `ainvoke`/`astream` API."""
+        llm = self.create_llm(model_name=model_name, temperature=temperature, **kwargs)
+        return AsyncLLMClientAdapter(llm.llm_client)
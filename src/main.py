@@ -1,5 +1,5 @@
-from app_code.utils import json_to_markdown as create_md
-from app_code.chroma_db_ingest import main as ingest_data,load_all_publications
+from app_code.utils import list_publication_ids
+from app_code.chroma_db_ingest import main as ingest_data
 from app_code.chroma_db_rag import main as rag_assistant
 from app_code.logger import logger
 from app_code.db_manager import shutdown
@@ -7,6 +7,9 @@ from paths import SOURCE_DATA_DIR
 import os
 import atexit
 
+DEFAULT_JSON_FNAME = "project_1_publications.json"
+DEFAULT_NUM_ENTRIES = 5
+
 # Register shutdown function to run at exit
 atexit.register(shutdown)
 
@@ -14,23 +17,25 @@ def main():
     print("Welcome to the Interactive LLM Terminal!")
     print("Let us first ingest some data.")
     
-    query = input("Do you want to convert a JSON file to markdown files? (y/n) [default: y]: ").strip().lower()
+    query = input("Do you want to ingest a JSON file directly? (y/n) [default: y]: ").strip().lower()
     if query not in ('y', 'yes', ''):
-        if len(load_all_publications()) == 0:
+        if len(list_publication_ids()) == 0:
             logger.error("\033[1;31mPlease ensure that you have required markdown files in the data directory as a data source.\033[0m")
             exit()
         else:
-            logger.info("Skipping JSON to markdown conversion.")
-        return
+            logger.info("Skipping JSON ingestion, syncing the markdown files in the data directory (JSON entries ingested before are kept).")
+        return {}
     # Query 1: JSON file name
-    query1 = input("Enter the json file name to convert to markdown (or press Enter to use default): ").strip()
-    if query1:
-        json_path = os.path.join(SOURCE_DATA_DIR, query1)
-    else:
-        json_path = None  # Let function use its default
+    query1 = input("Enter the json file name to ingest (or press Enter to use default): ").strip()
+    json_path = os.path.join(SOURCE_DATA_DIR, query1 or DEFAULT_JSON_FNAME)
 
     # Query 2: Number of entries
-    query2 = input("Enter number of json entries to process (or press Enter to use default): ").strip()
+    query2 = input(
+        f"Enter number of json entries to process, or 'all' (default: {DEFAULT_NUM_ENTRIES}; entries ingested before are kept): "
+    ).strip().lower()
+    if query2 == "all":
+        # A complete pass also removes the chunks of entries no longer in the file
+        return {"json_path": json_path, "num_entries_to_process": None}
     if query2:
         try:
             num_entries = int(query2)
@@ -43,21 +48,16 @@ def main():
     else:
         num_entries = None  # Let function use its default
 
-    # Call function with appropriate arguments
-    if json_path and num_entries:
-        create_md(json_path=json_path, num_entries_to_process=num_entries)
-    elif json_path:
-        create_md(json_path=json_path)
-    elif num_entries:
-        create_md(num_entries_to_process=num_entries)
-    else:
-        create_md()  # Use all defaults
+    return {
+        "json_path": json_path,
+        "num_entries_to_process": num_entries or DEFAULT_NUM_ENTRIES,
+    }
 
 if __name__ == "__main__":
     try:
-        main()
+        ingest_source = main()
         logger.info("\nData ingestion Started...")
-        ingest_data()
+        ingest_data(**ingest_source)
         logger.info("\nData ingestion completed.")
         rag_assistant()
         logger.info("-" * 100)
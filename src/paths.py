@@ -9,12 +9,21 @@ CODE_DIR = os.path.join(ROOT_DIR, "src", "app_code")
 APP_CONFIG_FPATH = os.path.join(CODE_DIR, "config", "config.yaml")
 PROMPT_CONFIG_FPATH = os.path.join(CODE_DIR, "config", "prompt_config.yaml")
 
-OUTPUTS_DIR = os.path.join(ROOT_DIR, "outputs")
+# Benchmarks point this at a scratch directory to keep their vector db apart
+OUTPUTS_DIR = os.environ.get("RAG_BOT_OUTPUTS_DIR", os.path.join(ROOT_DIR, "outputs"))
 SOURCE_DATA_DIR = os.path.join(ROOT_DIR, "source")
 
 DATA_DIR = os.path.join(ROOT_DIR, "data")
 PUBLICATION_FPATH = os.path.join(DATA_DIR, "publication.md")
 
 VECTOR_DB_DIR = os.path.join(OUTPUTS_DIR, "vector_db")
+INGEST_MANIFEST_FPATH = os.path.join(VECTOR_DB_DIR, "ingest_manifest.json")
+COLLECTION_VERSION_FPATH = os.path.join(VECTOR_DB_DIR, "collection_version")
+BM25_INDEX_FPATH = os.path.join(VECTOR_DB_DIR, "bm25_index.db")
+FLAT_INDEX_DIR = os.path.join(VECTOR_DB_DIR, "flat_index")
 
 CHAT_HISTORY_DB_FPATH = os.path.join(OUTPUTS_DIR, "chat_history.db")
+LLM_RESPONSE_CACHE_DB_FPATH = os.path.join(OUTPUTS_DIR, "llm_response_cache.db")
+BENCHMARK_RESULTS_DIR = os.path.join(OUTPUTS_DIR, "benchmarks")
+METRICS_FPATH = os.path.join(OUTPUTS_DIR, "metrics.json")
+PROFILES_DIR = os.path.join(OUTPUTS_DIR, "profiles")